@@ -0,0 +1,206 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+# /slices/batch.py                                                             #
+# Vectorized simulation of many packets at once                                #
+################################################################################
+"""Vectorized simulation of many located packets at once.
+
+Packets are rows of a structured NumPy array with one int64 column per field in
+netcore.HEADERS, so the switch and port columns hold the location.  Every other
+field also has a boolean column, see present, saying whether the packet has
+that field, so that any int64 is a valid header value.  Predicates
+are evaluated over the whole array as boolean masks, and actions are applied as
+column writes on the rows they select.
+
+Needs NumPy.
+"""
+
+import netcore as nc
+from netcore import HEADERS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def require_numpy():
+    """Raise ImportError if NumPy is missing."""
+    if np is None:
+        raise ImportError('NumPy is needed for batch simulation')
+
+def present(field):
+    """Return the name of the column saying whether packets have field."""
+    return 'has_' + field
+
+def packet_dtype():
+    """Return the structured dtype of a packet array."""
+    require_numpy()
+    return np.dtype([(f, np.int64) for f in HEADERS] +
+                    [(present(f), bool) for f in HEADERS[2:]])
+
+def to_array(located_packets):
+    """Build a packet array from a list of (packet, (switch, port))."""
+    require_numpy()
+    n = len(located_packets)
+    packets = np.empty(n, dtype=packet_dtype())
+    packets['switch'] = np.fromiter((switch for _, (switch, _) in
+                                     located_packets), np.int64, n)
+    packets['port'] = np.fromiter((port for _, (_, port) in located_packets),
+                                  np.int64, n)
+    rows = dict((f, []) for f in HEADERS[2:])
+    values = dict((f, []) for f in HEADERS[2:])
+    for i, (packet, _) in enumerate(located_packets):
+        for f, v in packet.items():
+            rows[f].append(i)
+            values[f].append(v)
+    for f in HEADERS[2:]:
+        packets[f] = 0
+        packets[f][rows[f]] = values[f]
+        packets[present(f)] = False
+        packets[present(f)][rows[f]] = True
+    return packets
+
+def from_array(packets):
+    """Return the list of (packet, (switch, port)) in a packet array."""
+    located = []
+    for row in packets:
+        fields = {}
+        for f in HEADERS[2:]:
+            if row[present(f)]:
+                fields[f] = int(row[f])
+        located.append((nc.Packet(fields), (int(row['switch']),
+                                            int(row['port']))))
+    return located
+
+def predicate_mask(pred, packets):
+    """Return the boolean mask of the rows of packets that pred matches."""
+    if isinstance(pred, nc.Top):
+        return np.ones(len(packets), dtype=bool)
+    elif isinstance(pred, nc.Bottom):
+        return np.zeros(len(packets), dtype=bool)
+    elif isinstance(pred, nc.Header):
+        mask = np.ones(len(packets), dtype=bool)
+        for f, v in pred.fields.iteritems():
+            mask &= packets[f] == v
+            if f not in ('switch', 'port'):
+                mask &= packets[present(f)]
+        return mask
+    elif isinstance(pred, nc.Union):
+        mask = np.zeros(len(packets), dtype=bool)
+        for child in pred.children:
+            mask |= predicate_mask(child, packets)
+        return mask
+    elif isinstance(pred, nc.Intersection):
+        return (predicate_mask(pred.left, packets) &
+                predicate_mask(pred.right, packets))
+    elif isinstance(pred, nc.Difference):
+        return (predicate_mask(pred.left, packets) &
+                ~predicate_mask(pred.right, packets))
+    else:
+        raise Exception('unknown predicate %s' % pred)
+
+def _simulate_policy(policy, packets, mask, outputs, observations):
+    """Apply policy to the rows of packets selected by mask.
+
+    Appends (index array, output packet array, fields written) to outputs,
+    and marks the observed rows in the mask observations[obs].
+    """
+    if not mask.any():
+        return
+    if isinstance(policy, nc.PrimitivePolicy):
+        mask = mask & predicate_mask(policy.predicate, packets)
+        for action in policy.actions:
+            rows = np.flatnonzero(mask & (packets['switch'] == action.switch))
+            if len(rows) == 0:
+                continue
+            for obs in action.obs:
+                if obs not in observations:
+                    observations[obs] = np.zeros(len(packets), dtype=bool)
+                observations[obs][rows] = True
+            for p in action.ports:
+                out = packets[rows]
+                written = ['port']
+                for f, v in action.modify.iteritems():
+                    out[f] = v
+                    written.append(f)
+                    if f not in ('switch', 'port'):
+                        out[present(f)] = True
+                        written.append(present(f))
+                out['port'] = p
+                outputs.append((rows, out, written))
+    elif isinstance(policy, nc.PolicyUnion):
+        for child in policy.children:
+            _simulate_policy(child, packets, mask, outputs, observations)
+    elif isinstance(policy, nc.PolicyRestriction):
+        mask = mask & predicate_mask(policy.predicate, packets)
+        _simulate_policy(policy.policy, packets, mask, outputs, observations)
+    elif isinstance(policy, nc.BottomPolicy):
+        pass
+    else:
+        raise Exception('unknown policy %s' % policy)
+
+def simulate_batch(policy, packets):
+    """Simulate every located packet in packets, as netcore.simulate.
+
+    ARGS:
+        policy:  policy to simulate
+        packets:  packet array, see packet_dtype
+
+    RETURNS:
+        (index, out, observations).  out is a packet array of the resulting
+        located packets, without duplicates, and index[i] is the row of
+        packets that produced out[i].  observations is {obs: sorted array of
+        the rows that incremented obs}.
+    """
+    require_numpy()
+    outputs = []
+    obs_masks = {}
+    mask = np.ones(len(packets), dtype=bool)
+    _simulate_policy(policy, packets, mask, outputs, obs_masks)
+
+    observations = {}
+    for obs, obs_mask in obs_masks.iteritems():
+        observations[obs] = np.flatnonzero(obs_mask)
+    if not outputs:
+        return (np.empty(0, dtype=np.int64),
+                np.empty(0, dtype=packets.dtype), observations)
+    index = np.concatenate([rows for rows, _, _ in outputs])
+    out = np.concatenate([out for _, out, _ in outputs])
+    # netcore.simulate returns sets, so drop outputs repeated for one packet.
+    # An output differs from its input packet only in the fields its action
+    # writes, so only those need comparing.
+    written = set()
+    for _, _, fields in outputs:
+        written.update(fields)
+    written = [f for f in packets.dtype.names if f in written]
+    keyed = np.empty(len(out), dtype=[('index', np.int64)] + [
+                         (f, packets.dtype[f]) for f in written])
+    keyed['index'] = index
+    for f in written:
+        keyed[f] = out[f]
+    _, first = np.unique(keyed, return_index=True)
+    return (index[first], out[first], observations)
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+################################################################################
+# /slices/batch_test.py                                                        #
+# Tests for batch, vectorized packet simulation                                #
+################################################################################
+import random
+import batch
+import netcore as nc
+from netcore import then
+from classifier_test import random_packet, random_policy
+import unittest
+
+@unittest.skipIf(batch.np is None, 'NumPy is not installed')
+class TestBatch(unittest.TestCase):
+    def test_round_trip(self):
+        located = [(nc.Packet({'vlan': 1, 'srcmac': 2}), (1, 2)),
+                   (nc.Packet({}), (3, 4))]
+        self.assertEqual(located, batch.from_array(batch.to_array(located)))
+
+    def test_negative_values(self):
+        located = [(nc.Packet({'vlan': -1}), (1, 2)),
+                   (nc.Packet({}), (1, 2))]
+        packets = batch.to_array(located)
+        self.assertEqual(located, batch.from_array(packets))
+        self.assertEqual([True, False],
+                         list(batch.predicate_mask(nc.Header({'vlan': -1}),
+                                                   packets)))
+        policy = nc.Top() |then| nc.Action(1, [3], {'vlan': -1})
+        index, out, _ = batch.simulate_batch(policy, packets)
+        self.assertEqual([0, 1], list(index))
+        self.assertEqual([(nc.Packet({'vlan': -1}), (1, 3))] * 2,
+                         batch.from_array(out))
+
+    def test_predicate_mask(self):
+        hd = nc.Header
+        packets = batch.to_array([(nc.Packet({'vlan': v}), (1, p))
+                                  for v in range(3) for p in range(3)])
+        preds = [nc.Top(), nc.Bottom(), hd({'vlan': 1}),
+                 hd({'vlan': 1}) + hd({'port': 2}),
+                 hd({'vlan': 1}) & hd({'port': 2}),
+                 hd({'switch': 1}) - hd({'vlan': 2})]
+        for pred in preds:
+            expected = [pred.match(packet, loc)
+                        for packet, loc in batch.from_array(packets)]
+            self.assertEqual(expected,
+                             list(batch.predicate_mask(pred, packets)))
+
+    def test_random_policies(self):
+        rand = random.Random(1)
+        for _ in range(20):
+            policy = random_policy(rand, 30)
+            located = [(random_packet(rand),
+                        (rand.randint(0, 2), rand.randint(0, 2)))
+                       for _ in range(50)]
+            index, out, observations = batch.simulate_batch(
+                policy, batch.to_array(located))
+            out = batch.from_array(out)
+            for i, (packet, loc) in enumerate(located):
+                expected_packets, expected_obs = nc.simulate(policy, packet,
+                                                             loc)
+                packets = [lp for j, lp in zip(index, out) if j == i]
+                self.assertEqual(len(expected_packets), len(packets))
+                self.assertEqual(expected_packets, set(packets))
+                obs = set(o for o, rows in observations.iteritems()
+                          if i in rows)
+                self.assertEqual(expected_obs, obs)
+
+    def test_empty(self):
+        policy = nc.Header({'vlan': 5}) |then| nc.forward(1, 2)
+        located = [(nc.Packet({'vlan': 1}), (1, 1))]
+        index, out, observations = batch.simulate_batch(
+            policy, batch.to_array(located))
+        self.assertEqual(0, len(index))
+        self.assertEqual(0, len(out))
+        self.assertEqual({}, observations)
+
+if __name__ == '__main__':
+    unittest.main()
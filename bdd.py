@@ -0,0 +1,330 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+# /slices/bdd.py                                                               #
+# Decision diagrams for predicates                                             #
+################################################################################
+"""Reduced ordered decision diagrams for netcore predicates.
+
+Headers only test fields for equality, so instead of encoding every field in a
+fixed number of bits, diagrams branch on atoms (field, value), meaning
+field == value, ordered by the field's position in HEADERS and then by value.
+Below the true branch of (field, value) no other atom on field appears, since
+it would be decided already.  Atoms on one field exclude each other, so a node
+is redundant not only when both branches are the same, but whenever the false
+branch already gives the true branch where the atom holds, as in
+'if vlan == 1 then TRUE else (if vlan == 2 then FALSE else TRUE)'.  mk drops
+such nodes.  With these rules, and assuming every field has more values than
+any diagram mentions, each predicate has exactly one diagram, so equality,
+emptiness and overlap are comparisons of node ids.
+
+Nodes are ints.  FALSE and TRUE are the terminals, and the node table is shared
+by the whole module, like netcore's intern table; clear() empties it, and
+scope() forgets the nodes built within a with block.  prune works in a scope
+of its own, so the table does not grow with every policy it prunes.
+"""
+
+import contextlib
+import netcore as nc
+from netcore import HEADERS
+
+FALSE = 0
+TRUE = 1
+
+_FIELD_ORDER = dict((f, i) for i, f in enumerate(HEADERS))
+
+# Node tables: _atoms[u], _lows[u], _highs[u] describe node u, and _unique maps
+# (atom, low, high) back to u.  The first two entries are the terminals.
+_atoms = None
+_lows = None
+_highs = None
+_unique = None
+# Operation caches, {(op, u, v): result}, and {predicate: node}
+_cache = None
+_predicates = None
+
+def clear():
+    """Forget every node.  Nodes built before are no longer valid."""
+    global _atoms, _lows, _highs, _unique, _cache, _predicates
+    _atoms = [None, None]
+    _lows = [None, None]
+    _highs = [None, None]
+    _unique = {}
+    _cache = {}
+    _predicates = {}
+
+clear()
+
+@contextlib.contextmanager
+def scope():
+    """Forget the nodes and cache entries made within the with block.
+
+    Nodes built before the block stay valid, so scopes may nest.  Nodes built
+    within it are no longer valid after it.  clear() must not be called within
+    a scope.
+    """
+    mark = len(_atoms)
+    cache = dict(_cache)
+    predicates = dict(_predicates)
+    try:
+        yield
+    finally:
+        for u in xrange(mark, len(_atoms)):
+            del _unique[(_atoms[u], _lows[u], _highs[u])]
+        del _atoms[mark:]
+        del _lows[mark:]
+        del _highs[mark:]
+        _cache.clear()
+        _cache.update(cache)
+        _predicates.clear()
+        _predicates.update(predicates)
+
+def _atom_key(atom):
+    field, value = atom
+    return (_FIELD_ORDER.get(field, len(HEADERS)), field, value)
+
+def size():
+    """Return the number of nodes in the table, terminals included."""
+    return len(_atoms)
+
+def mk(atom, low, high):
+    """Return the node for 'if atom then high else low'."""
+    if low == high or _cofactor_true(low, atom) == high:
+        return low
+    key = (atom, low, high)
+    u = _unique.get(key)
+    if u is None:
+        u = len(_atoms)
+        _atoms.append(atom)
+        _lows.append(low)
+        _highs.append(high)
+        _unique[key] = u
+    return u
+
+def atom(field, value):
+    """Return the node for field == value."""
+    return mk((field, value), FALSE, TRUE)
+
+def _top_key(u):
+    if u <= TRUE:
+        return None
+    return _atom_key(_atoms[u])
+
+def _cofactor_true(u, atom):
+    """Restrict u to packets where atom holds.
+
+    atom must not be after u's top atom.
+    """
+    field, value = atom
+    while u > TRUE and _atoms[u][0] == field:
+        if _atoms[u][1] == value:
+            return _highs[u]
+        u = _lows[u]
+    return u
+
+def _cofactor_false(u, atom):
+    """Restrict u to packets where atom does not hold.
+
+    atom must not be after u's top atom.
+    """
+    if u > TRUE and _atoms[u] == atom:
+        return _lows[u]
+    return u
+
+def _apply(op, u, v):
+    """Combine u and v with op, one of 'and', 'or' and 'diff'."""
+    if op == 'and':
+        if u == FALSE or v == FALSE:
+            return FALSE
+        elif u == TRUE:
+            return v
+        elif v == TRUE or u == v:
+            return u
+        elif u > v:
+            u, v = v, u
+    elif op == 'or':
+        if u == TRUE or v == TRUE:
+            return TRUE
+        elif u == FALSE:
+            return v
+        elif v == FALSE or u == v:
+            return u
+        elif u > v:
+            u, v = v, u
+    else:
+        if u == FALSE or v == TRUE or u == v:
+            return FALSE
+        elif v == FALSE:
+            return u
+    key = (op, u, v)
+    result = _cache.get(key)
+    if result is not None:
+        return result
+    u_key = _top_key(u)
+    v_key = _top_key(v)
+    if v_key is None or (u_key is not None and u_key <= v_key):
+        top = _atoms[u]
+    else:
+        top = _atoms[v]
+    high = _apply(op, _cofactor_true(u, top), _cofactor_true(v, top))
+    low = _apply(op, _cofactor_false(u, top), _cofactor_false(v, top))
+    result = mk(top, low, high)
+    _cache[key] = result
+    return result
+
+def conj(u, v):
+    """Return the intersection of u and v."""
+    return _apply('and', u, v)
+
+def disj(u, v):
+    """Return the union of u and v."""
+    return _apply('or', u, v)
+
+def diff(u, v):
+    """Return the packets in u but not in v."""
+    return _apply('diff', u, v)
+
+def neg(u):
+    """Return the complement of u."""
+    return diff(TRUE, u)
+
+def from_predicate(pred):
+    """Return the node for a netcore predicate."""
+    u = _predicates.get(pred)
+    if u is not None:
+        return u
+    if isinstance(pred, nc.Top):
+        u = TRUE
+    elif isinstance(pred, nc.Bottom):
+        u = FALSE
+    elif isinstance(pred, nc.Header):
+        u = TRUE
+        for f, v in sorted(pred.fields.items(),
+                           key=lambda item: _atom_key(item), reverse=True):
+            u = mk((f, v), FALSE, u)
+    elif isinstance(pred, nc.Union):
+        u = FALSE
+        for child in pred.children:
+            u = disj(u, from_predicate(child))
+    elif isinstance(pred, nc.Intersection):
+        u = conj(from_predicate(pred.left), from_predicate(pred.right))
+    elif isinstance(pred, nc.Difference):
+        u = diff(from_predicate(pred.left), from_predicate(pred.right))
+    else:
+        raise Exception('unknown predicate %s' % pred)
+    _predicates[pred] = u
+    return u
+
+def to_predicate(u):
+    """Return a netcore predicate for node u, a union of its paths to TRUE."""
+    paths = []
+    def walk(u, fields, excluded):
+        if u == FALSE:
+            return
+        elif u == TRUE:
+            pred = nc.Header(fields)
+            if excluded:
+                pred = pred - nc.nary_union([nc.Header({f: v})
+                                             for f, v in excluded])
+            paths.append(pred)
+        else:
+            field, value = _atoms[u]
+            high_fields = dict(fields)
+            high_fields[field] = value
+            # Exclusions on field are implied once it is fixed
+            walk(_highs[u], high_fields,
+                 [(f, v) for f, v in excluded if f != field])
+            walk(_lows[u], fields, excluded + [(field, value)])
+    walk(u, {}, [])
+    if not paths:
+        return nc.Bottom()
+    return nc.nary_union(paths).reduce()
+
+def is_empty(pred):
+    """Does pred match no packets?"""
+    return from_predicate(pred) == FALSE
+
+def equivalent(p1, p2):
+    """Do p1 and p2 match the same packets?"""
+    return from_predicate(p1) == from_predicate(p2)
+
+def overlaps(p1, p2):
+    """Is there a packet both p1 and p2 match?"""
+    return conj(from_predicate(p1), from_predicate(p2)) != FALSE
+
+def prune(policy, context=TRUE):
+    """Return policy without the parts no packet can reach.
+
+    Drops primitive policies and restrictions whose predicates, together with
+    those of the restrictions around them, match nothing, and drops
+    restrictions that the restrictions around them already imply.  Predicates
+    that match everything within their context become Top.  The nodes built
+    along the way are forgotten afterwards, see scope.
+
+    ARGS:
+        policy:  policy to prune
+        context:  node of the packets that can reach policy
+    """
+    with scope():
+        return _prune(policy, context)
+
+def _prune(policy, context):
+    """Prune policy within context, building nodes in the current scope."""
+    if isinstance(policy, nc.PrimitivePolicy):
+        if len(policy.actions) == 0:
+            return nc.BottomPolicy()
+        u = from_predicate(policy.predicate)
+        matched = conj(context, u)
+        if matched == FALSE:
+            return nc.BottomPolicy()
+        elif matched == context and not isinstance(policy.predicate, nc.Top):
+            return nc.PrimitivePolicy(nc.Top(), policy.actions)
+        else:
+            return policy
+    elif isinstance(policy, nc.PolicyUnion):
+        children = [_prune(child, context) for child in policy.children]
+        children = [c for c in children if not isinstance(c, nc.BottomPolicy)]
+        if len(children) == len(policy.children) and all(
+                c is p for c, p in zip(children, policy.children)):
+            return policy
+        return nc.nary_policy_union(children)
+    elif isinstance(policy, nc.PolicyRestriction):
+        restricted = conj(context, from_predicate(policy.predicate))
+        if restricted == FALSE:
+            return nc.BottomPolicy()
+        inner = _prune(policy.policy, restricted)
+        if isinstance(inner, nc.BottomPolicy):
+            return inner
+        elif restricted == context:
+            return inner
+        elif inner is policy.policy:
+            return policy
+        else:
+            return nc.PolicyRestriction(inner, policy.predicate)
+    elif isinstance(policy, nc.BottomPolicy):
+        return policy
+    else:
+        raise Exception('unknown policy %s' % policy)
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+################################################################################
+# /slices/bdd_test.py                                                          #
+# Tests for bdd, decision diagrams for predicates                              #
+################################################################################
+import itertools
+import random
+import bdd
+import netcore as nc
+import sat
+from netcore import then
+from classifier_test import random_predicate, random_policy
+import unittest
+
+# Every field random_predicate tests, with one value it never uses
+test_fields = ['srcmac', 'dstmac', 'vlan', 'switch', 'port']
+test_values = [0, 1, 2, 3]
+
+def located_packets():
+    for values in itertools.product(test_values, repeat=len(test_fields)):
+        fields = dict(zip(test_fields, values))
+        switch = fields.pop('switch')
+        port = fields.pop('port')
+        yield (nc.Packet(fields), (switch, port))
+
+def truth_table(pred):
+    return tuple(pred.match(packet, loc) for packet, loc in located_packets())
+
+class TestBDD(unittest.TestCase):
+    def setUp(self):
+        bdd.clear()
+
+    def test_terminals(self):
+        self.assertEqual(bdd.TRUE, bdd.from_predicate(nc.Top()))
+        self.assertEqual(bdd.FALSE, bdd.from_predicate(nc.Bottom()))
+        self.assertTrue(bdd.is_empty(nc.Header({'vlan': 1}) &
+                                     nc.Header({'vlan': 2})))
+        self.assertTrue(bdd.is_empty(nc.Header({'vlan': 1}) -
+                                     (nc.Header({'vlan': 1}) +
+                                      nc.Header({'srcmac': 1}))))
+        self.assertFalse(bdd.is_empty(nc.Header({'vlan': 1}) -
+                                      nc.Header({'srcmac': 1})))
+
+    def test_canonical(self):
+        hd = nc.Header
+        self.assertTrue(bdd.equivalent(hd({'vlan': 1, 'srcmac': 2}),
+                                       hd({'srcmac': 2}) & hd({'vlan': 1})))
+        self.assertTrue(bdd.equivalent(
+            hd({'vlan': 1}),
+            (hd({'vlan': 1}) - hd({'srcmac': 1})) +
+            (hd({'vlan': 1}) & hd({'srcmac': 1}))))
+        self.assertFalse(bdd.equivalent(hd({'vlan': 1}), hd({'vlan': 2})))
+        # vlan == 1 is already in the complement of vlan == 2
+        self.assertTrue(bdd.equivalent(hd({'vlan': 1}) +
+                                       (nc.Top() - hd({'vlan': 2})),
+                                       nc.Top() - hd({'vlan': 2})))
+        self.assertTrue(bdd.equivalent(
+            hd({'vlan': 1, 'srcmac': 1}) + (hd({'srcmac': 1}) -
+                                            hd({'vlan': 2})),
+            hd({'srcmac': 1}) - hd({'vlan': 2})))
+
+    def test_random_predicates(self):
+        rand = random.Random(2)
+        preds = [random_predicate(rand) for _ in range(80)]
+        tables = [truth_table(p) for p in preds]
+        nodes = [bdd.from_predicate(p) for p in preds]
+        for i in range(len(preds)):
+            self.assertEqual(not any(tables[i]), nodes[i] == bdd.FALSE)
+            self.assertEqual(tables[i], truth_table(bdd.to_predicate(nodes[i])))
+            for j in range(i):
+                self.assertEqual(tables[i] == tables[j], nodes[i] == nodes[j])
+                overlap = any(a and b for a, b in zip(tables[i], tables[j]))
+                self.assertEqual(overlap, bdd.overlaps(preds[i], preds[j]))
+
+    def test_against_sat(self):
+        def sat_equivalent(p1, p2):
+            # Forward on every switch the predicates test, and one more
+            actions = [nc.Action(s, [1]) for s in range(4)]
+            policy1 = p1 |then| actions
+            policy2 = p2 |then| actions
+            return (sat.equivalent(policy1, policy2) is None and
+                    sat.equivalent(policy2, policy1) is None)
+        rand = random.Random(4)
+        for _ in range(15):
+            p = random_predicate(rand)
+            q = random_predicate(rand)
+            pairs = [(p, q), (p + q, (p - q) + q), (p & q, p - (p - q)),
+                     (p - q, p - (p & q)),
+                     (p + (nc.Top() - q), nc.Top() - (q - p))]
+            for p1, p2 in pairs:
+                self.assertEqual(sat_equivalent(p1, p2),
+                                 bdd.equivalent(p1, p2))
+
+    def test_prune(self):
+        hd = nc.Header
+        policy = ((hd({'vlan': 2}) |then| nc.forward(1, 2)) +
+                  (hd({'vlan': 1}) |then| nc.forward(1, 3))) % hd({'vlan': 1})
+        self.assertEqual((nc.Top() |then| nc.forward(1, 3)) % hd({'vlan': 1}),
+                         bdd.prune(policy))
+        self.assertEqual(nc.BottomPolicy(),
+                         bdd.prune(policy % hd({'vlan': 2})))
+
+    def test_prune_random(self):
+        rand = random.Random(3)
+        for _ in range(10):
+            policy = random_policy(rand, 20)
+            pruned = bdd.prune(policy)
+            self.assertLessEqual(pruned.size(), policy.size())
+            for packet, loc in itertools.islice(located_packets(), 0, None, 7):
+                self.assertEqual(nc.simulate(policy, packet, loc),
+                                 nc.simulate(pruned, packet, loc))
+
+    def test_prune_scope(self):
+        rand = random.Random(4)
+        kept = bdd.from_predicate(nc.Header({'vlan': 1}))
+        size = bdd.size()
+        for _ in range(5):
+            bdd.prune(random_policy(rand, 20))
+            self.assertEqual(size, bdd.size())
+        self.assertEqual(kept, bdd.from_predicate(nc.Header({'vlan': 1})))
+        with bdd.scope():
+            inner = bdd.atom('vlan', 2)
+            with bdd.scope():
+                bdd.atom('vlan', 3)
+            self.assertEqual(size + 1, bdd.size())
+            self.assertEqual(inner, bdd.atom('vlan', 2))
+        self.assertEqual(size, bdd.size())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,7 @@ import netcore as nc
 import examples.policy_gen as pg
 import random
 import sat
+import sat_bv
 import slicing
 import examples.topology_gen as tg
 import verification
@@ -118,6 +119,8 @@ def main():
                         'Print out compilation timing information.')
     parser.add_argument('--vtime', action='store_true', default=False, help=
                         'Print out validation timing information.')
+    parser.add_argument('--bv', action='store_true', default=False, help=
+                        'With --vtime, also time the bit-vector encoding.')
     args = parser.parse_args()
     init = time.time()
     topo = args.topo_gen(args.hosts)
@@ -157,10 +160,19 @@ def main():
         iso_t = time.time()
         print 'Time to check isolation:   %f' % (iso_t - init)
 
+        edge_policy = combined[0][0].edge_policy
         init = time.time()
-        assert sat.compiled_correctly(topo, policy, compiled[0], edge_policy=combined[0][0].edge_policy)
+        assert sat.compiled_correctly(topo, policy, compiled[0],
+                                      edge_policy=edge_policy)
         comp_t = time.time()
         print 'Time to check compilation: %f' % (comp_t - init)
 
+        if args.bv:
+            init = time.time()
+            assert sat_bv.compiled_correctly(topo, policy, compiled[0],
+                                             edge_policy=edge_policy)
+            comp_t = time.time()
+            print 'Time to check compilation (bit-vector): %f' % (comp_t - init)
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,258 @@
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+################################################################################
+# /slices/classifier.py                                                        #
+# Compiled packet classifiers for netcore policies                             #
+################################################################################
+"""Compiled packet classifiers for netcore policies.
+
+Walking a whole policy for every packet, as Policy._get_actions does, is slow.
+A Classifier flattens a policy once into its primitive rules, and builds, for
+each (switch, port) it is asked about, a decision tree over the header fields
+the rules require.  Classifying a packet then walks one tree branch and checks
+only the rules left at its leaf.  Policy.get_actions and netcore.simulate use
+one kept on the policy node, see Policy.classifier.
+"""
+
+import netcore as nc
+
+# Stop splitting the decision tree at this many rules or this depth
+LEAF_SIZE = 4
+MAX_DEPTH = 16
+
+# Stands in for fields a packet does not have
+_MISSING = object()
+
+def requirements(pred):
+    """Return {field: value} that every packet pred matches must have.
+
+    Location fields are included.  Returns None if no packet can match pred.
+    The result is exact, i.e. pred matches exactly the packets with these
+    fields, if is_conjunctive(pred).
+    """
+    if isinstance(pred, nc.Top):
+        return {}
+    elif isinstance(pred, nc.Bottom):
+        return None
+    elif isinstance(pred, nc.Header):
+        return dict(pred.fields)
+    elif isinstance(pred, nc.Intersection):
+        left = requirements(pred.left)
+        right = requirements(pred.right)
+        if left is None or right is None:
+            return None
+        for f, v in right.iteritems():
+            if left.setdefault(f, v) != v:
+                return None
+        return left
+    elif isinstance(pred, nc.Union):
+        # Only what every matching child requires
+        common = None
+        for child in pred.children:
+            child_reqs = requirements(child)
+            if child_reqs is None:
+                continue
+            elif common is None:
+                common = child_reqs
+            else:
+                common = dict((f, v) for f, v in common.iteritems()
+                              if child_reqs.get(f, _MISSING) == v)
+        return common
+    elif isinstance(pred, nc.Difference):
+        return requirements(pred.left)
+    else:
+        raise Exception('unknown predicate %s' % pred)
+
+def is_conjunctive(pred):
+    """Is pred exactly described by its requirements?"""
+    if isinstance(pred, nc.Top) or isinstance(pred, nc.Header):
+        return True
+    elif isinstance(pred, nc.Intersection):
+        return is_conjunctive(pred.left) and is_conjunctive(pred.right)
+    else:
+        return False
+
+class Rule(object):
+    """A primitive policy with its restrictions folded in."""
+    __slots__ = ('index', 'requirements', 'checks', 'actions')
+
+    def __init__(self, index, requirements, checks, actions):
+        """
+        ARGS:
+            index:  position of the rule in the policy
+            requirements:  {field: value} the packet and location must have
+            checks:  predicates the located packet must also match
+            actions:  actions of the rule
+        """
+        self.index = index
+        self.requirements = requirements
+        self.checks = checks
+        self.actions = actions
+
+def flatten(policy):
+    """Return the rules of policy, in the order get_actions visits them.
+
+    Rules that can never match are left out.
+    """
+    rules = []
+    stack = [(policy, [])]
+    while stack:
+        pol, restrictions = stack.pop()
+        if isinstance(pol, nc.PrimitivePolicy):
+            preds = [pol.predicate] + restrictions
+            reqs = {}
+            for pred in preds:
+                pred_reqs = requirements(pred)
+                if pred_reqs is None:
+                    reqs = None
+                    break
+                for f, v in pred_reqs.iteritems():
+                    if reqs.setdefault(f, v) != v:
+                        reqs = None
+                        break
+                if reqs is None:
+                    break
+            if reqs is not None and len(pol.actions) > 0:
+                checks = [p for p in preds if not is_conjunctive(p)]
+                rules.append(Rule(len(rules), reqs, checks, pol.actions))
+        elif isinstance(pol, nc.PolicyUnion):
+            for child in reversed(pol.children):
+                stack.append((child, restrictions))
+        elif isinstance(pol, nc.PolicyRestriction):
+            stack.append((pol.policy, restrictions + [pol.predicate]))
+        elif isinstance(pol, nc.BottomPolicy):
+            pass
+        else:
+            raise Exception('unknown policy %s' % pol)
+    return rules
+
+class Classifier(object):
+    """A policy compiled for fast get_actions and simulate."""
+    def __init__(self, policy):
+        self.rules = flatten(policy)
+        # Index rules by the location fields they require, like
+        # edge_compile.InportIndex
+        self.index = {}
+        for rule in self.rules:
+            reqs = rule.requirements
+            if 'switch' in reqs:
+                key = (reqs['switch'], reqs.get('port'))
+            else:
+                key = None
+            self.index.setdefault(key, []).append(rule)
+        self.trees = {}
+
+    def get_actions(self, packet, (switch, port)):
+        """Get the actions policy._get_actions would.
+
+        A packet missing a field a rule matches on does not match the rule.
+        """
+        tree = self.trees.get((switch, port))
+        if tree is None:
+            tree = self._build_location(switch, port)
+            self.trees[(switch, port)] = tree
+        while isinstance(tree, tuple):
+            field, branches, default = tree
+            tree = branches.get(packet.get(field, _MISSING), default)
+        actions = []
+        for rule, remaining, rule_actions in tree:
+            for f, v in remaining:
+                if packet.get(f, _MISSING) != v:
+                    break
+            else:
+                for pred in rule.checks:
+                    if not pred.match(packet, (switch, port)):
+                        break
+                else:
+                    actions.extend(rule_actions)
+        return actions
+
+    def simulate(self, packet, (switch, port)):
+        """Get resulting located packets, observations, as netcore.simulate."""
+        actions = self.get_actions(packet, (switch, port))
+        observations = set()
+        for a in actions:
+            observations.update(a.obs)
+        packets = set()
+        for a in actions:
+            packets.update(a.modify_packet(packet))
+        return (packets, observations)
+
+    def _build_location(self, switch, port):
+        """Build the decision tree for packets at (switch, port)."""
+        candidates = (self.index.get((switch, port), []) +
+                      self.index.get((switch, None), []) +
+                      self.index.get(None, []))
+        candidates.sort(key=lambda rule: rule.index)
+        entries = []
+        for rule in candidates:
+            reqs = rule.requirements
+            if reqs.get('switch', switch) != switch:
+                continue
+            if reqs.get('port', port) != port:
+                continue
+            actions = [a for a in rule.actions if a.switch == switch]
+            if not actions:
+                continue
+            remaining = dict((f, v) for f, v in reqs.iteritems()
+                             if f != 'switch' and f != 'port')
+            entries.append((rule, remaining, actions))
+        return _build_tree(entries, 0)
+
+def _build_tree(entries, depth):
+    """Build a decision tree over entries of (rule, requirements, actions).
+
+    A tree is either a leaf, a list of (rule, [(field, value)] left to test,
+    actions), or a (field, {value: tree}, default tree) split.  Entries keep
+    the rule order on every branch.
+    """
+    if len(entries) > LEAF_SIZE and depth < MAX_DEPTH:
+        counts = {}
+        for _, reqs, _ in entries:
+            for f in reqs:
+                counts[f] = counts.get(f, 0) + 1
+        if counts:
+            field = max(sorted(counts), key=lambda f: counts[f])
+            if counts[field] > 1:
+                by_value = {}
+                default = []
+                for entry in entries:
+                    rule, reqs, actions = entry
+                    if field in reqs:
+                        rest = dict(reqs)
+                        value = rest.pop(field)
+                        by_value.setdefault(value, []).append(
+                            (rule, rest, actions))
+                    else:
+                        default.append(entry)
+                branches = {}
+                for value, matched in by_value.iteritems():
+                    merged = sorted(matched + default,
+                                    key=lambda entry: entry[0].index)
+                    branches[value] = _build_tree(merged, depth + 1)
+                return (field, branches, _build_tree(default, depth + 1))
+    return [(rule, sorted(reqs.items()), actions)
+            for rule, reqs, actions in entries]
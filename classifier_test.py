@@ -0,0 +1,131 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+################################################################################
+# /slices/classifier_test.py                                                   #
+# Tests for classifier, compiled packet classifiers                            #
+################################################################################
+import copy
+import random
+import classifier
+import netcore as nc
+from netcore import inport, then
+import unittest
+
+def random_packet(rand):
+    return nc.Packet({'srcmac': rand.randint(0, 3),
+                      'dstmac': rand.randint(0, 3),
+                      'vlan': rand.randint(0, 2)})
+
+def random_predicate(rand, depth=0):
+    choice = rand.randint(0, 9 if depth < 2 else 4)
+    if choice == 0:
+        return nc.Top()
+    elif choice == 1:
+        return inport(rand.randint(0, 2), rand.randint(0, 2))
+    elif choice <= 4:
+        fields = {}
+        for f in rand.sample(['srcmac', 'dstmac', 'vlan', 'switch', 'port'],
+                             rand.randint(1, 3)):
+            fields[f] = rand.randint(0, 2)
+        return nc.Header(fields)
+    elif choice <= 6:
+        return (random_predicate(rand, depth + 1) &
+                random_predicate(rand, depth + 1))
+    elif choice <= 8:
+        return (random_predicate(rand, depth + 1) +
+                random_predicate(rand, depth + 1))
+    else:
+        return (random_predicate(rand, depth + 1) -
+                random_predicate(rand, depth + 1))
+
+def random_policy(rand, size):
+    policies = []
+    for i in range(size):
+        actions = [nc.Action(rand.randint(0, 2), [rand.randint(0, 2)],
+                             {'vlan': rand.randint(0, 2)}, [i])]
+        policy = random_predicate(rand) |then| actions
+        if rand.random() < 0.2:
+            policy = policy % random_predicate(rand)
+        policies.append(policy)
+    return nc.nary_policy_union(policies)
+
+class TestClassifier(unittest.TestCase):
+    def test_requirements(self):
+        hd = nc.Header
+        self.assertEqual({}, classifier.requirements(nc.Top()))
+        self.assertIsNone(classifier.requirements(nc.Bottom()))
+        self.assertIsNone(classifier.requirements(hd({'vlan': 1}) &
+                                                  hd({'vlan': 2})))
+        self.assertEqual({'vlan': 1, 'srcmac': 2},
+                         classifier.requirements(hd({'vlan': 1}) &
+                                                 hd({'srcmac': 2})))
+        self.assertEqual({'vlan': 1},
+                         classifier.requirements(hd({'vlan': 1, 'port': 1}) +
+                                                 hd({'vlan': 1, 'port': 2})))
+        self.assertEqual({'vlan': 1},
+                         classifier.requirements(hd({'vlan': 1}) -
+                                                 hd({'srcmac': 2})))
+
+    def test_restrictions(self):
+        policy = ((nc.Header({'vlan': 1}) |then| nc.forward(1, 2)) +
+                  (nc.Top() |then| nc.forward(1, 3)) % nc.Header({'vlan': 2}))
+        cls = classifier.Classifier(policy)
+        for vlan in range(3):
+            packet = nc.Packet({'vlan': vlan})
+            self.assertEqual(policy._get_actions(packet, (1, 1)),
+                             cls.get_actions(packet, (1, 1)))
+        self.assertEqual([], cls.get_actions(nc.Packet({'vlan': 0}), (1, 1)))
+
+    def test_random_policies(self):
+        rand = random.Random(0)
+        for _ in range(20):
+            policy = random_policy(rand, 30)
+            cls = classifier.Classifier(policy)
+            for _ in range(50):
+                packet = random_packet(rand)
+                loc = (rand.randint(0, 2), rand.randint(0, 2))
+                expected = [a for a in policy._get_actions(packet, loc)
+                            if a.switch == loc[0]]
+                self.assertEqual(expected, cls.get_actions(packet, loc))
+                self.assertEqual(expected, policy.get_actions(packet, loc))
+                packets = set()
+                for a in expected:
+                    packets.update(a.modify_packet(packet))
+                obs = set(o for a in expected for o in a.obs)
+                self.assertEqual((packets, obs), cls.simulate(packet, loc))
+                self.assertEqual((packets, obs),
+                                 nc.simulate(policy, packet, loc))
+
+    def test_kept_on_policy(self):
+        policy = nc.Header({'vlan': 1}) |then| nc.forward(1, 2)
+        self.assertIs(policy.classifier(), policy.classifier())
+        copied = copy.deepcopy(policy)
+        self.assertEqual(policy, copied)
+        self.assertIsNone(copied._classifier)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -60,13 +60,15 @@ Finally, we traverse the tree again, mapping virtual nodes and ports to their
 physical counterparts as provided by the slice's mapping.
 """
 
-import copy
 import netcore as nc
 from netcore import then
 import slicing
+import sys
+import util
 import vlan as vl
 
-def transform(combined, assigner=vl.sequential, verbose=False):
+def transform(combined, assigner=vl.sequential, verbose=False, processes=1,
+              chunksize=1):
     """Turn a set of slices sharing a physical topology into a single policy.
     ARGS:
         combined:  set of (slices, policies) (with the same physical topology) to
@@ -74,47 +76,136 @@ def transform(combined, assigner=vl.sequential, verbose=False):
         assigner:  function to use to assign vlans to slices.  Must return a
             {slice: vlan} dictionary, defaults to sequential.
         verbose:  print out progress information
+        processes:  number of processes to compile slices in, see
+            util.fork_map
+        chunksize:  number of slices to hand a process at a time
 
     RETURNS:
         a single Policy encapsulating the shared but isolated behavior of all
         the slices
     """
-    policy_list = compile_slices(combined, assigner=assigner, verbose=verbose)
+    policy_list = compile_slices(combined, assigner=assigner, verbose=verbose,
+                                 processes=processes, chunksize=chunksize)
     return nc.nary_policy_union(policy_list)
 
-def compile_slices(combined, assigner=vl.sequential, verbose=False):
+def compile_slices(combined, assigner=vl.sequential, verbose=False,
+                   processes=1, chunksize=1):
     """Turn a set of slices sharing a physical topology into a list of policies.
 
+    Once vlans are assigned, slices are compiled independently, in processes
+    worker processes.  The result is in the same order as combined.
+
     See transform for more documentation.
     """
     slices = [s for (s, p) in combined]
     vlans = assigner(slices)
-    policy_list = []
-    count = 0
-    for slic, policy in combined:
-        vlan = vlans[slic]
-        # Produce a policy that only accepts packets within our vlan
-        safe_policy = isolated_policy(policy, vlan)
-        safe_policy.get_physical_rep(slic.node_map, slic.port_map)
-        # Produce a separate policy that adds vlan tags to safe incoming packets
-        inport_policy = external_to_vlan_policy(slic, policy, vlan)
-        inport_policy.get_physical_rep(slic.node_map, slic.port_map)
-        # Take their union
-        safe_inport_policy = safe_policy + inport_policy
-
-        # Modify the result to strip the vlan tag from outbound ports
-        # Note that this should be the last step.  If our policy takes an
-        # incoming packet and forwards it directly out, we should not add a vlan
-        # tag.
-        full_policy = internal_strip_vlan_policy(slic, safe_inport_policy)
-
-        policy_list.append(
-            full_policy.get_physical_rep(slic.node_map, slic.port_map).reduce())
+    def compile_one((slic, policy)):
+        result = compile_slice(slic, policy, vlans[slic])
         if verbose:
-            print 'Processed %d slices.' % count
-            count += 1
+            print '.',
+            sys.stdout.flush()
+        return result
+    policy_list = util.fork_map(compile_one, combined, processes, chunksize)
+    if verbose:
+        print 'Processed %d slices.' % len(policy_list)
     return policy_list
 
+def compile_slice(slic, policy, vlan):
+    """Compile one slice's policy to a physical policy using vlan.
+
+    ARGS:
+        slic:  Slice to compile
+        policy:  Policy of slic
+        vlan:  vlan assigned to slic
+
+    RETURNS:
+        the reduced physical policy for slic.
+    """
+    # Produce a policy that only accepts packets within our vlan
+    safe_policy = isolated_policy(policy, vlan)
+    # Produce a separate policy that adds vlan tags to safe incoming packets
+    inport_policy = external_to_vlan_policy(slic, policy, vlan)
+    # Take their union
+    safe_inport_policy = safe_policy + inport_policy
+
+    # Modify the result to strip the vlan tag from outbound ports
+    # Note that this should be the last step.  If our policy takes an
+    # incoming packet and forwards it directly out, we should not add a vlan
+    # tag.
+    full_policy = internal_strip_vlan_policy(slic, safe_inport_policy)
+
+    return full_policy.get_physical_rep(slic.node_map, slic.port_map).reduce()
+
+class Compiler(object):
+    """Incremental compiler for a changing set of slices.
+
+    Keeps each slice's vlan and compiled physical policy, so that adding,
+    removing or editing one slice only compiles the slices that change.
+
+    By default, a new slice gets the lowest vlan no other slice uses, and no
+    other slice's vlan ever changes.  With an assigner, the assigner is rerun
+    over all slices on every change, and the slices whose vlan it changes are
+    recompiled along with the edited one.
+    """
+    def __init__(self, combined=(), assigner=None):
+        """
+        ARGS:
+            combined:  initial (slice, policy) pairs
+            assigner:  function to assign vlans to slices, as in transform, or
+                None to assign lowest free vlans
+        """
+        self.assigner = assigner
+        self.slices = []
+        self.policies = {}
+        self.vlans = {}
+        self.compiled = {}
+        for slic, policy in combined:
+            self.add_slice(slic, policy)
+
+    def add_slice(self, slic, policy):
+        """Add a slice with policy, and compile it."""
+        assert slic not in self.policies
+        self.slices.append(slic)
+        self.policies[slic] = policy
+        if self.assigner is None:
+            self.vlans[slic] = vl.lowest_free(set(self.vlans.values()))
+        self._reassign([slic])
+
+    def remove_slice(self, slic):
+        """Remove a slice and its compiled policy."""
+        self.slices.remove(slic)
+        del self.policies[slic]
+        del self.vlans[slic]
+        del self.compiled[slic]
+        self._reassign([])
+
+    def update_policy(self, slic, policy):
+        """Replace the policy of slic, and recompile it."""
+        assert slic in self.policies
+        self.policies[slic] = policy
+        self._reassign([slic])
+
+    def _reassign(self, changed):
+        """Compile changed and every slice whose vlan the assigner changes."""
+        changed = set(changed)
+        if self.assigner is not None:
+            vlans = self.assigner(self.slices)
+            for slic in self.slices:
+                if self.vlans.get(slic) != vlans[slic]:
+                    changed.add(slic)
+            self.vlans = dict((slic, vlans[slic]) for slic in self.slices)
+        for slic in changed:
+            self.compiled[slic] = compile_slice(slic, self.policies[slic],
+                                                self.vlans[slic])
+
+    def policy_list(self):
+        """Return the compiled policies, in the order slices were added."""
+        return [self.compiled[slic] for slic in self.slices]
+
+    def policy(self):
+        """Return the combined physical policy of all the slices."""
+        return nc.nary_policy_union(self.policy_list())
+
 def isolated_policy(policy, vlan):
     """Produce a policy for slic restricted to its vlan.
 
@@ -140,22 +231,34 @@ def external_predicate((switch, port), predicate):
     """
     return nc.inport(switch, port) & predicate
 
-def modify_vlan(policy, vlan):
-    """Re-write all actions of policy to set vlan to vlan."""
+def modify_vlan(policy, vlan, _actions=None):
+    """Re-write all actions of policy to set vlan to vlan.
+
+    Non-destructive, but shares structure with policy: predicates are reused
+    as they are, and only the actions are rebuilt, each distinct action once.
+    """
+    if _actions is None:
+        _actions = {}
     if isinstance(policy, nc.BottomPolicy):
         # Bottom policy, contains no actions
         return policy
     elif isinstance(policy, nc.PrimitivePolicy):
-        policy = copy.deepcopy(policy)
+        actions = []
         for action in policy.actions:
-            action.modify['vlan'] = vlan
-        return policy
+            new_action = _actions.get(action)
+            if new_action is None:
+                modify = dict(action.modify)
+                modify['vlan'] = vlan
+                new_action = nc.Action(action.switch, action.ports, modify,
+                                       action.obs)
+                _actions[action] = new_action
+            actions.append(new_action)
+        return nc.PrimitivePolicy(policy.predicate, actions)
     elif isinstance(policy, nc.PolicyUnion):
-        left = modify_vlan(policy.left, vlan)
-        right = modify_vlan(policy.right, vlan)
-        return left + right
+        return nc.PolicyUnion(*[modify_vlan(child, vlan, _actions)
+                                for child in policy.children])
     else: # isinstance(policy, nc.PolicyRestriction)
-        new_policy = modify_vlan(policy.policy, vlan)
+        new_policy = modify_vlan(policy.policy, vlan, _actions)
         return new_policy % policy.predicate
 
 def modify_vlan_local(policy, (switch, port), tag, this_port_only=False):
@@ -193,11 +296,9 @@ def modify_vlan_local(policy, (switch, port), tag, this_port_only=False):
                     output_actions.append(action)
         return policy.predicate |then| output_actions
     elif isinstance(policy, nc.PolicyUnion):
-        left = modify_vlan_local(policy.left, (switch, port), tag,
-                                 this_port_only)
-        right = modify_vlan_local(policy.right, (switch, port), tag,
-                                  this_port_only)
-        return left + right
+        return nc.PolicyUnion(*[modify_vlan_local(child, (switch, port), tag,
+                                                  this_port_only)
+                                for child in policy.children])
     elif isinstance(policy, nc.PolicyRestriction):
         new_policy = modify_vlan_local(policy.policy, (switch, port), tag,
                                        this_port_only)
@@ -211,6 +312,74 @@ def strip_vlan(policy, (switch, port)):
     """Re-write all actions of policy to set vlan to 0 on switch, port."""
     return modify_vlan_local(policy, (switch, port), 0)
 
+def modify_vlan_ports(policy, locations, tag, _actions=None):
+    """Re-write all actions of policy to set vlan to tag on every location.
+
+    Equivalent to calling modify_vlan_local(policy, loc, tag) for each loc in
+    locations in turn, but done in a single traversal: each action forwarding
+    to some of the locations is split into one action per such port, in the
+    order of locations, that sets the vlan, followed by one action for the
+    remaining ports, if any, that does not.
+
+    ARGS:
+        policy:  Policy to re-write
+        locations:  iterable of (switch, port) locations
+        tag:  vlan to set
+
+    Non-destructive, returns a new object sharing unchanged subtrees.
+    """
+    if _actions is None:
+        _actions = {}
+        switch_ports = {}
+        for (switch, port) in locations:
+            ports = switch_ports.setdefault(switch, [])
+            if port not in ports:
+                ports.append(port)
+        locations = switch_ports
+    if isinstance(policy, nc.PrimitivePolicy):
+        output_actions = []
+        changed = False
+        for action in policy.actions:
+            new_actions = _actions.get(action)
+            if new_actions is None:
+                ports = locations.get(action.switch, [])
+                bad_ports = [p for p in ports if p in action.ports]
+                if bad_ports:
+                    out_modify = dict(action.modify)
+                    out_modify['vlan'] = tag
+                    new_actions = [nc.Action(action.switch, [p], out_modify,
+                                             action.obs)
+                                   for p in bad_ports]
+                    good_ports = action.ports.difference(bad_ports)
+                    if len(good_ports) > 0:
+                        new_actions.append(nc.Action(action.switch, good_ports,
+                                                     action.modify,
+                                                     action.obs))
+                else:
+                    new_actions = [action]
+                _actions[action] = new_actions
+            if len(new_actions) != 1 or new_actions[0] is not action:
+                changed = True
+            output_actions.extend(new_actions)
+        if not changed:
+            return policy
+        return policy.predicate |then| output_actions
+    elif isinstance(policy, nc.PolicyUnion):
+        return nc.PolicyUnion(*[modify_vlan_ports(child, locations, tag,
+                                                  _actions)
+                                for child in policy.children])
+    elif isinstance(policy, nc.PolicyRestriction):
+        new_policy = modify_vlan_ports(policy.policy, locations, tag, _actions)
+        return new_policy % policy.predicate
+    elif isinstance(policy, nc.BottomPolicy):
+        return policy
+    else:
+        raise Exception("Unexpected policy: %s\n" % policy)
+
+def strip_vlan_ports(policy, locations):
+    """Re-write all actions of policy to set vlan to 0 on every location."""
+    return modify_vlan_ports(policy, locations, 0)
+
 def external_to_vlan_policy(slic, policy, vlan):
     """Produce a policy that moves packets along external ports into the vlan.
 
@@ -247,6 +416,4 @@ def internal_strip_vlan_policy(slic, policy):
     smaller actions where necessary so that the vlan stripping is only done as
     appropriate.
     """
-    for ((switch, port), _) in slic.edge_policy.iteritems():
-        policy = strip_vlan(policy, (switch, port))
-    return policy
+    return strip_vlan_ports(policy, slic.edge_policy.iterkeys())
@@ -29,7 +29,6 @@
 # Tests for compile.py, which implements the slice compiler                    #
 ################################################################################
 import compile as cp
-import copy
 import netcore as nc
 from netcore import Action, inport, Header, then
 import slicing
@@ -56,16 +55,16 @@ big_policy = ((l3 + l4 + l5) % p2) + l2 + l1
 
 def actions_of_policy(policy):
     if isinstance(policy, nc.PrimitivePolicy):
-        return policy.actions
+        return list(policy.actions)
     elif isinstance(policy, nc.PolicyUnion):
-        return actions_of_policy(policy.left) + actions_of_policy(policy.right)
+        return sum([actions_of_policy(c) for c in policy.children], [])
     else: # isinstance(policy, nc.PolicyRestriction)
         return actions_of_policy(policy.policy)
 
 def action_to_microactions(action):
     switch = action.switch
     modify = action.modify
-    return [Action(switch, [p], copy.copy(modify)) for p in action.ports]
+    return [Action(switch, [p], modify) for p in action.ports]
 
 def flatten(l):
     """An opaque way to flatten a list."""
@@ -77,14 +76,24 @@ class TestCompile(unittest.TestCase):
         for action in actions_of_policy(modified):
             self.assertDictContainsSubset({'vlan': -1}, action.modify)
 
+    def test_modify_vlan_shares_predicates(self):
+        modified = cp.modify_vlan(big_policy, -1)
+        self.assertIs(big_policy.children[0].predicate,
+                      modified.children[0].predicate)
+        self.assertIs(big_policy.children[0].policy.children[0].predicate,
+                      modified.children[0].policy.children[0].predicate)
+        # The original policy is untouched
+        self.assertItemsEqual([a1, a2, a3, a4, a5],
+                              actions_of_policy(big_policy))
+
     def test_strip_vlan(self):
         # Test by expanding to actions that only handle one port at a time, and
         # verifying from there.
         micro = flatten([action_to_microactions(a)
                          for a in actions_of_policy(big_policy)])
-        for action in micro:
-            if action.switch == 3 and action.ports == [3]:
-                action.modify['vlan'] = 0
+        for i, action in enumerate(micro):
+            if action.switch == 3 and action.ports == frozenset([3]):
+                micro[i] = Action(3, [3], dict(action.modify, vlan=0))
         modified = cp.strip_vlan(big_policy, (3, 3))
 
         modified_micro = flatten([action_to_microactions(a)
@@ -92,5 +101,16 @@ class TestCompile(unittest.TestCase):
 
         self.assertItemsEqual(micro, modified_micro)
 
+    def test_strip_vlan_ports(self):
+        locations = [(3, 3), (3, 5), (1, 2), (2, 2), (3, 4), (3, 9)]
+        expected = big_policy
+        for loc in locations:
+            expected = cp.strip_vlan(expected, loc)
+        self.assertEqual(expected, cp.strip_vlan_ports(big_policy, locations))
+        self.assertEqual(actions_of_policy(expected),
+                         actions_of_policy(cp.strip_vlan_ports(big_policy,
+                                                               locations)))
+        self.assertIs(l1, cp.strip_vlan_ports(l1, [(3, 3)]))
+
 if __name__ == '__main__':
     unittest.main()
@@ -38,13 +38,17 @@
 #              let us prune the tree using the existing reduction steps.
 
 from compile import external_predicate, modify_vlan_local
+import bdd
 import copy
 import netcore as nc
+import sys
+import util
 import vlan as vl
 
 VLAN0 = nc.Header({'vlan': 0})
 
-def transform(topo, slices, assigner=vl.edge_optimal, verbose=False):
+def transform(topo, slices, assigner=vl.edge_optimal, verbose=False,
+              processes=1, chunksize=1, prune=False):
     """Turn a set of slices sharing a physical topology into a single policy.
     ARGS:
         slices:  set of (slices, policies) (with the same physical topology) to
@@ -52,22 +56,31 @@ def transform(topo, slices, assigner=vl.edge_optimal, verbose=False):
         assigner:  function to use to assign vlans to slices.  Must return a
             {slice: vlan} dictionary, defaults to sequential.
         verbose:  print out progress information
+        processes:  number of processes to compile slices in, see
+            util.fork_map
+        chunksize:  number of slices to hand a process at a time
+        prune:  remove the parts of each slice's policy no packet can reach,
+            see bdd.prune
 
     RETURNS:
         a single Policy encapsulating the shared but isolated behavior of all
         the slices
     """
-    policy_list = compile_slices(topo, slices, assigner, verbose)
+    policy_list = compile_slices(topo, slices, assigner, verbose, processes,
+                                 chunksize, prune)
     return nc.nary_policy_union(policy_list)
 
-def compile_slices(topo, slices, assigner=vl.edge_optimal, verbose=False):
+def compile_slices(topo, slices, assigner=vl.edge_optimal, verbose=False,
+                   processes=1, chunksize=1, prune=False):
     """Turn a set of slices sharing a physical topology into a list of policies.
 
+    Once vlans are assigned, slices are compiled independently, in processes
+    worker processes.  The result is in the same order as slices.
+
     See transform for more documentation.
     """
     slice_only = [s for (s, p) in slices]
     if verbose:
-        import sys
         print 'Assigning slice vlans...',
     vlans = assigner(topo, slice_only, verbose=verbose)
     slice_lookup = get_slice_lookup(vlans)
@@ -76,25 +89,110 @@ def compile_slices(topo, slices, assigner=vl.edge_optimal, verbose=False):
         for i in range(len(slice_lookup)):
             print '%d: %s' % (i, slice_lookup[slice_only[i]])
         print 'Compiling slices...',
-    policy_list = []
-    count = 0
-    for slic, policy in slices:
-        vlan_dict = symmetric_edge(slice_lookup[slic])
-        internal_p = internal_policy(slic.l_topo, policy, vlan_dict)
-        external_p = external_policy(slic, policy, vlan_dict)
-        policies = [p.get_physical_rep(slic.node_map, slic.port_map)
-                    for p in internal_p + external_p]
-        policies = [p for p in policies if not isinstance(p, nc.BottomPolicy)]
-        policy_list.append(nc.nary_policy_union(policies))
+    def compile_one((slic, policy)):
+        result = compile_slice(slic, policy, slice_lookup[slic], prune)
         if verbose:
-            count += 1
             print '.',
             sys.stdout.flush()
+        return result
+    policy_list = util.fork_map(compile_one, slices, processes, chunksize)
     if verbose:
         print 'done.'
         print '%d policies generated.' % len(policy_list)
     return policy_list
 
+def compile_slice(slic, policy, vlan, prune=False):
+    """Compile one slice's policy to a physical policy.
+
+    ARGS:
+        slic:  Slice to compile
+        policy:  Policy of slic
+        vlan:  {edge: tag} for the edges of slic, in one direction
+        prune:  remove the parts of the policy no packet can reach
+
+    RETURNS:
+        the physical policy for slic.
+    """
+    vlan_dict = symmetric_edge(vlan)
+    internal_p = internal_policy(slic.l_topo, policy, vlan_dict)
+    external_p = external_policy(slic, policy, vlan_dict)
+    policies = [p.get_physical_rep(slic.node_map, slic.port_map)
+                for p in internal_p + external_p]
+    if prune:
+        policies = [bdd.prune(p) for p in policies]
+    policies = [p for p in policies if not isinstance(p, nc.BottomPolicy)]
+    return nc.nary_policy_union(policies)
+
+class EdgeCompiler(object):
+    """Incremental edge compiler for a changing set of slices.
+
+    Keeps each edge's {slice: tag} assignment and each slice's compiled
+    physical policy.  A new slice gets, on each edge it uses, the lowest tag no
+    other slice uses on that edge, so adding, removing or editing a slice never
+    changes another slice's tags, and only that slice is compiled.
+    """
+    def __init__(self, topo, combined=()):
+        """
+        ARGS:
+            topo:  physical topology the slices share
+            combined:  initial (slice, policy) pairs
+        """
+        self.topo = topo
+        # Each undirected edge, from either direction to the direction used as
+        # its key, as in vl.edge_optimal
+        self.canonical = {}
+        for (source, sink) in util.edges_of_topo(topo, undirected=True):
+            self.canonical[(source, sink)] = (source, sink)
+            self.canonical[(sink, source)] = (source, sink)
+        self.slices = []
+        self.policies = {}
+        self.edge_vlans = {}
+        self.slice_vlans = {}
+        self.compiled = {}
+        for slic, policy in combined:
+            self.add_slice(slic, policy)
+
+    def add_slice(self, slic, policy):
+        """Add a slice with policy, assign its edge tags and compile it."""
+        assert slic not in self.policies
+        self.slices.append(slic)
+        self.policies[slic] = policy
+        vlans = {}
+        for edge in vl.slice_edges(slic):
+            edge = self.canonical.get(edge)
+            if edge is not None and edge not in vlans:
+                tags = self.edge_vlans.setdefault(edge, {})
+                vlans[edge] = vl.lowest_free(set(tags.values()), limit=None)
+                tags[slic] = vlans[edge]
+        self.slice_vlans[slic] = vlans
+        self._compile(slic)
+
+    def remove_slice(self, slic):
+        """Remove a slice, freeing its edge tags."""
+        self.slices.remove(slic)
+        del self.policies[slic]
+        for edge in self.slice_vlans.pop(slic):
+            del self.edge_vlans[edge][slic]
+        del self.compiled[slic]
+
+    def update_policy(self, slic, policy):
+        """Replace the policy of slic, and recompile it."""
+        assert slic in self.policies
+        self.policies[slic] = policy
+        self._compile(slic)
+
+    def _compile(self, slic):
+        self.compiled[slic] = compile_slice(slic, self.policies[slic],
+                                            self.slice_vlans[slic])
+
+    def policy_list(self):
+        """Return the compiled policies, in the order slices were added."""
+        return [self.compiled[slic] for slic in self.slices]
+
+    def policy(self):
+        """Return the combined physical policy of all the slices."""
+        return nc.nary_policy_union(self.policy_list())
+
 def edge_of_port(topo, (switch, port)):
     """Return the edge that port traverses in topo.
 
@@ -123,6 +221,71 @@ def get_slice_lookup(edge_lookup):
             output[slic][edge] = tag
     return output
 
+class InportIndex(object):
+    """The primitive rules of a policy, indexed by where they can match.
+
+    restrict((switch, port), predicate) is equivalent to
+    (policy % predicate).reduce() for a predicate that only matches on
+    (switch, port), but only restricts the rules that can match there, instead
+    of walking the whole policy.  Rules that cannot match there are left out
+    even where reduce() would not have proven them empty.
+    """
+    def __init__(self, policy):
+        # [(primitive policy, [restriction predicates, outermost first])]
+        self.rules = []
+        self._flatten(policy, [])
+        # (switch, port) -> rule indices; port is None for rules that can match
+        # on any port of the switch.  Rules that can match anywhere go in
+        # anywhere.
+        self.index = {}
+        self.anywhere = []
+        for i, (prim, restrictions) in enumerate(self.rules):
+            locations = util.locations_of_predicate(prim.predicate)
+            for r in restrictions:
+                locations = util.intersect_locations(
+                    locations, util.locations_of_predicate(r))
+            if locations is None:
+                self.anywhere.append(i)
+            else:
+                for loc in locations:
+                    self.index.setdefault(loc, []).append(i)
+
+    def _flatten(self, policy, restrictions):
+        if isinstance(policy, nc.PrimitivePolicy):
+            self.rules.append((policy, restrictions))
+        elif isinstance(policy, nc.PolicyUnion):
+            for child in policy.children:
+                self._flatten(child, restrictions)
+        elif isinstance(policy, nc.PolicyRestriction):
+            self._flatten(policy.policy, restrictions + [policy.predicate])
+        elif isinstance(policy, nc.BottomPolicy):
+            pass
+        else:
+            raise Exception("Unexpected policy: %s\n" % policy)
+
+    def candidates(self, (switch, port)):
+        """Return the indices of the rules that may match on (switch, port)."""
+        indices = set(self.anywhere)
+        indices.update(self.index.get((switch, port), []))
+        indices.update(self.index.get((switch, None), []))
+        return sorted(indices)
+
+    def restrict(self, (switch, port), predicate):
+        """Return (policy % predicate).reduce(), for predicate only matching on
+        (switch, port)."""
+        policies = []
+        for i in self.candidates((switch, port)):
+            prim, restrictions = self.rules[i]
+            # Build the same predicate PolicyRestriction.restrict would
+            rule_predicate = predicate
+            for r in restrictions:
+                rule_predicate = r & rule_predicate
+            restricted = nc.PrimitivePolicy(prim.predicate & rule_predicate,
+                                            prim.actions).reduce()
+            if not restricted.is_bottom():
+                policies.append(restricted)
+        return nc.nary_policy_union(policies)
+
 # TODO(astory): don't set the vlan tag if it's already what we want it to be.
 # But do this carefully.  We still need to completely remove forwards to ports
 # that aren't under consideration at the moment.
@@ -147,10 +310,14 @@ def internal_policy(topo, policy, symm_vlan):
 #    print policy
 #    print '----'
     policies = []
+    index = InportIndex(policy)
     # incoming edge to s1.  Note that we only get internal edges
     for ((s1, p1), (s2, p2)), tag in symm_vlan.items():
         if s1 in topo.node:
             pred = (nc.inport(s1, p1) & nc.Header({'vlan': tag})).reduce()
+            # The restriction only depends on the incoming edge, so share it
+            # between all the outgoing edges.
+            restricted = index.restrict((s1, p1), pred)
             # For each outgoing edge from s1, set vlan to what's appropriate
             for (p_out, dst) in topo.node[s1]['port'].items():
                 if ((s1, p_out), dst) in symm_vlan:
@@ -159,7 +326,7 @@ def internal_policy(topo, policy, symm_vlan):
                     target_vlan = 0
 #                print '%s:%s on %s -> %s on %s' % (s1, p1, tag, p_out, target_vlan)
 #                print 'restrict with %s' % pred
-                new_policy = (policy % pred).reduce()
+                new_policy = restricted
 #                print new_policy
                 new_policy = modify_vlan_local(new_policy, (s1, p_out),
                                                target_vlan, this_port_only=True)
@@ -190,6 +357,7 @@ def external_policy(slic, policy, symm_vlan):
         but only if they satisfy the slice's isolation predicates.
     """
     policies = []
+    index = InportIndex(policy)
     for (s, p), pred in slic.edge_policy.items():
         if edge_of_port(slic.l_topo, (s, p)) in symm_vlan:
             # symm_vlan contains all the internal edges to the slice.
@@ -200,10 +368,11 @@ def external_policy(slic, policy, symm_vlan):
         else:
             # An external edge
             ext_pred = external_predicate((s, p), pred) & VLAN0
+            restricted = index.restrict((s, p), ext_pred)
             for (p_out, dst) in slic.l_topo.node[s]['port'].items():
                 if ((s, p_out), dst) in symm_vlan: # it's an internal edge
                     target_vlan = symm_vlan[((s, p_out), dst)]
-                    new_policy = (policy % ext_pred).reduce()
+                    new_policy = restricted
                     # modify_vlan_local does not create any new reduceables
                     new_policy = modify_vlan_local(new_policy, (s, p_out),
                                                    target_vlan,
@@ -212,7 +381,7 @@ def external_policy(slic, policy, symm_vlan):
                     if new_policy != nc.BottomPolicy():
                         policies.append(new_policy)
                 else: # outgoing, set it to 0
-                    new_policy = (policy % ext_pred).reduce()
+                    new_policy = restricted
                     new_policy = modify_vlan_local(new_policy, (s, p_out),
                                                    0, this_port_only=True)
                     new_policy = new_policy.reduce()
@@ -29,10 +29,15 @@
 # Tests for edge_compile.py, which implements the slice compiler               #
 ################################################################################
 
+import bdd
 import compile_test as ct
 import examples.triangle as tri
+from examples import policy_gen
 import edge_compile as ec
+import netcore as nc
+from netcore import then
 import unittest
+import util
 
 topo, slices = tri.get_slices()
 
@@ -87,5 +92,89 @@ class TestEdgeCompile(unittest.TestCase):
             for s, t in slices.items():
                 self.assertEqual(t, out[s][e])
 
+class TestInportIndex(unittest.TestCase):
+    def test_locations(self):
+        self.assertIsNone(util.locations_of_predicate(nc.Top()))
+        self.assertEqual(set(), util.locations_of_predicate(nc.Bottom()))
+        self.assertEqual(set([(1, 2), (3, None)]),
+                         util.locations_of_predicate(
+                             nc.inport(1, 2) + nc.Header({'switch': 3})))
+        self.assertEqual(set([(3, 4)]),
+                         util.locations_of_predicate(
+                             nc.Header({'switch': 3}) &
+                             (nc.inport(3, 4) + nc.inport(1, 4))))
+        self.assertEqual(set([(3, 4)]),
+                         util.locations_of_predicate(
+                             nc.inport(3, 4) - nc.Header({'srcmac': 1})))
+        self.assertIsNone(util.locations_of_predicate(nc.Header({'port': 1})))
+
+    def test_restrict(self):
+        policy = (ct.big_policy +
+                  (nc.Header({'srcmac': 5}) |then| nc.forward(2, 2)) +
+                  (nc.Top() |then| nc.forward(3, 1)) % nc.Header({'switch': 3}))
+        index = ec.InportIndex(policy)
+        for loc in [(1, 0), (1, 1), (2, 1), (2, 3), (3, 3), (4, 4)]:
+            pred = (nc.inport(*loc) & nc.Header({'vlan': 7})).reduce()
+            self.assertEqual((policy % pred).reduce(),
+                             index.restrict(loc, pred))
+
+    def test_candidates(self):
+        index = ec.InportIndex(ct.big_policy)
+        self.assertEqual([], index.candidates((3, 3)))
+        self.assertEqual([4], index.candidates((1, 0)))
+
+class TestEdgeCompiler(unittest.TestCase):
+    def setUp(self):
+        self.combined = [(s, policy_gen.flood_observe(s.l_topo))
+                         for s in slices]
+
+    def assertTagsDistinct(self, compiler):
+        for edge, tags in compiler.edge_vlans.items():
+            self.assertEqual(len(tags), len(set(tags.values())))
+
+    def test_compile(self):
+        compiler = ec.EdgeCompiler(topo, self.combined)
+        self.assertTagsDistinct(compiler)
+        expected = [ec.compile_slice(s, p, compiler.slice_vlans[s])
+                    for s, p in self.combined]
+        self.assertEqual(expected, compiler.policy_list())
+
+    def test_remove_add(self):
+        compiler = ec.EdgeCompiler(topo, self.combined)
+        first, policy = self.combined[0]
+        vlans = dict(compiler.slice_vlans)
+        others = [compiler.compiled[s] for s, _ in self.combined[1:]]
+
+        compiler.remove_slice(first)
+        self.assertNotIn(first, compiler.slices)
+        for edge, tags in compiler.edge_vlans.items():
+            self.assertNotIn(first, tags)
+        # Nothing else was touched
+        for (s, _), compiled in zip(self.combined[1:], others):
+            self.assertEqual(vlans[s], compiler.slice_vlans[s])
+            self.assertIs(compiled, compiler.compiled[s])
+
+        # Re-adding reuses the freed tags
+        compiler.add_slice(first, policy)
+        self.assertEqual(vlans[first], compiler.slice_vlans[first])
+        self.assertTagsDistinct(compiler)
+
+    def test_pruned_compile(self):
+        # Pruning leaves no decision diagram nodes behind
+        bdd.clear()
+        compiler = ec.EdgeCompiler(topo, self.combined)
+        for s, p in self.combined:
+            ec.compile_slice(s, p, compiler.slice_vlans[s], prune=True)
+        self.assertEqual(2, bdd.size())
+
+    def test_update_policy(self):
+        compiler = ec.EdgeCompiler(topo, self.combined)
+        first, _ = self.combined[0]
+        others = [compiler.compiled[s] for s, _ in self.combined[1:]]
+        compiler.update_policy(first, nc.BottomPolicy())
+        self.assertEqual(nc.BottomPolicy(), compiler.compiled[first])
+        for (s, _), compiled in zip(self.combined[1:], others):
+            self.assertIs(compiled, compiler.compiled[s])
+
 if __name__ == '__main__':
     unittest.main()
@@ -50,13 +50,15 @@ To print out finer-grained progress information on tests, set VERBOSE_TESTS.
 """
 
 from examples import topology_gen, policy_gen
-import sat, nxtopo, slicing
+import isolation, sat, sat_bv, sat_split, nxtopo, slicing
 import compile as cp
 import edge_compile as ec
 import networkx as nx
 import netcore as nc
 from netcore import then
 import os
+import util
+import vlan as vl
 import unittest
 from test_util import linear, linear_all_ports, linear_hosts
 from test_util import k10_nodes, k10, k4_nodes, k4, k4hosts
@@ -107,6 +109,43 @@ class TestCompile(unittest.TestCase):
         self.assertTrue(sat.compiled_correctly(topo, policies[0], compiled[0]))
         self.assertTrue(sat.compiled_correctly(topo, policies[1], compiled[1]))
 
+    def testParallelCompile(self):
+        topo, combined = k4hosts()
+        serial = cp.compile_slices(combined)
+        parallel = cp.compile_slices(combined, processes=2)
+        self.assertEqual(serial, parallel)
+        chunked = cp.compile_slices(combined, processes=3, chunksize=2)
+        self.assertEqual(serial, chunked)
+
+    def testIncrementalCompile(self):
+        topo, combined = k4hosts()
+        compiler = cp.Compiler(combined)
+        self.assertEqual(cp.compile_slices(combined), compiler.policy_list())
+
+        (s0, p0), (s1, p1) = combined[:2]
+        compiler.remove_slice(s0)
+        compiler.update_policy(s1, nc.BottomPolicy())
+        compiler.add_slice(s0, p0)
+        # s0 gets its old vlan back, and is now compiled last
+        self.assertEqual(1, compiler.vlans[s0])
+        self.assertEqual(2, compiler.vlans[s1])
+        self.assertEqual(cp.compile_slice(s0, p0, 1), compiler.policy_list()[-1])
+        self.assertEqual(nc.BottomPolicy(), compiler.policy_list()[0])
+
+        policies = [p for _, p in combined]
+        compiled = [compiler.compiled[s] for s, _ in combined]
+        self.assertIsNone(sat.shared_io(topo, compiled[0], compiled[2]))
+        self.assertTrue(sat.compiled_correctly(topo, policies[0], compiled[0]))
+
+    def testIncrementalAssigner(self):
+        topo, combined = k4hosts()
+        compiler = cp.Compiler(combined, assigner=vl.sequential)
+        self.assertEqual(cp.compile_slices(combined), compiler.policy_list())
+        # Removing the first slice renumbers every other slice
+        compiler.remove_slice(combined[0][0])
+        self.assertEqual(cp.compile_slices(combined[1:]),
+                         compiler.policy_list())
+
 class TestEdgeCompile(unittest.TestCase):
     def testBasicCompile(self):
         topo, policies = linear((0, 1, 2, 3), (0, 1, 2, 3))
@@ -165,6 +204,21 @@ class TestEdgeCompile(unittest.TestCase):
         self.assertIsNone(sat.one_per_edge(topo, compiled))
         self.assertTrue(sat.compiled_correctly(topo, policy, compiled))
 
+    def testIncrementalCompile(self):
+        topo, combined = k4hosts()
+        compiler = ec.EdgeCompiler(topo, combined)
+        policies = [p for _, p in combined]
+        compiled = compiler.policy_list()
+        for i, j in [(0, 1), (1, 2), (0, 3)]:
+            self.assertIsNone(sat.shared_io(topo, compiled[i], compiled[j]))
+        self.assertTrue(sat.compiled_correctly(topo, policies[0], compiled[0]))
+
+        compiler.remove_slice(combined[1][0])
+        compiler.add_slice(*combined[1])
+        compiled = [compiler.compiled[s] for s, _ in combined]
+        self.assertIsNone(sat.shared_io(topo, compiled[0], compiled[1]))
+        self.assertTrue(sat.compiled_correctly(topo, policies[1], compiled[1]))
+
     def testHostsCompile(self):
         topo, combined = linear_hosts((0, 1, 2, 3), (0, 1, 2, 3))
         policies = [p for _, p in combined]
@@ -174,6 +228,37 @@ class TestEdgeCompile(unittest.TestCase):
         self.assertTrue(sat.compiled_correctly(topo, policies[0], compiled[0]))
         self.assertTrue(sat.compiled_correctly(topo, policies[1], compiled[1]))
 
+    def testParallelCompile(self):
+        topo, combined = k4hosts()
+        serial = ec.compile_slices(topo, combined)
+        parallel = ec.compile_slices(topo, combined, processes=2)
+        self.assertEqual(serial, parallel)
+        chunked = ec.compile_slices(topo, combined, processes=3, chunksize=2)
+        self.assertEqual(serial, chunked)
+
+    def testBitVectorCheck(self):
+        topo, combined = k4hosts()
+        policies = [p for _, p in combined]
+        edge_policy = combined[0][0].edge_policy
+        for compiled in [cp.compile_slices(combined),
+                         ec.compile_slices(topo, combined)]:
+            self.assertTrue(sat_bv.compiled_correctly(topo, policies[0],
+                                                      compiled[0],
+                                                      edge_policy=edge_policy))
+            self.assertFalse(sat_bv.compiled_correctly(topo, policies[1],
+                                                       compiled[0]))
+
+    def testPrunedCompile(self):
+        topo, combined = k4hosts()
+        policies = [p for _, p in combined]
+        compiled = ec.compile_slices(topo, combined)
+        pruned = ec.compile_slices(topo, combined, prune=True)
+        for i in range(len(combined)):
+            self.assertLessEqual(pruned[i].size(), compiled[i].size())
+            self.assertIsNone(sat.equivalent(compiled[i], pruned[i]))
+            self.assertIsNone(sat.equivalent(pruned[i], compiled[i]))
+        self.assertIsNone(sat.shared_io(topo, pruned[0], pruned[1]))
+
 class TestSeparation(unittest.TestCase):
     def testInputDisjoint(self):
         p1 = nc.Header({'switch': 0, 'port': 1, 'vlan': 0}) |then|\
@@ -218,6 +303,82 @@ class TestSeparation(unittest.TestCase):
         self.assertIsNotNone(sat.shared_outputs(compiled[1], compiled[0]))
         self.assertFalse(sat.separate(topo, compiled[0], compiled[1]))
 
+    def testSession(self):
+        topo, combined = linear_hosts((0, 1, 2, 3), (0, 1, 2, 3))
+        policies = [p for _, p in combined]
+        compiled = ec.compile_slices(topo, combined)
+        session = sat.Session(topo)
+        for p1, p2 in [(policies[0], policies[1]), (compiled[0], compiled[1]),
+                       (compiled[1], compiled[0]), (compiled[0], policies[0])]:
+            self.assertEqual(sat.shared_io(topo, p1, p2) is None,
+                             session.shared_io(p1, p2) is None)
+            self.assertEqual(sat.shared_inputs(p1, p2) is None,
+                             session.shared_inputs(p1, p2) is None)
+            self.assertEqual(sat.shared_outputs(p1, p2) is None,
+                             session.shared_outputs(p1, p2) is None)
+            self.assertEqual(sat.separate(topo, p1, p2),
+                             session.separate(p1, p2))
+        self.assertEqual(4, len(session.encodings))
+
+    def testSessionPairs(self):
+        topo, policies = linear((0, 1, 2, 3), (0, 1, 2, 3), (0, 1, 2, 3))
+        slices = [slicing.ident_map_slice(topo, {}) for p in policies]
+        compiled = cp.compile_slices(zip(slices, policies))
+        self.assertEqual([], sat.Session(topo).unseparated(compiled))
+        self.assertEqual([(0, 1), (0, 2), (1, 2)],
+                         sat.Session(topo).unseparated(policies))
+
+    def testSplitQueries(self):
+        topo, combined = linear_hosts((0, 1, 2, 3), (0, 1, 2, 3))
+        policies = [p for _, p in combined]
+        compiled = ec.compile_slices(topo, combined)
+        for p1, p2 in [(policies[0], policies[1]), (compiled[0], compiled[1]),
+                       (compiled[1], compiled[0])]:
+            self.assertEqual(sat.shared_io(topo, p1, p2) is None,
+                             sat_split.shared_io(topo, p1, p2) is None)
+            self.assertEqual(sat.shared_inputs(p1, p2) is None,
+                             sat_split.shared_inputs(p1, p2) is None)
+            self.assertEqual(sat.shared_outputs(p1, p2) is None,
+                             sat_split.shared_outputs(p1, p2) is None)
+        edge_policy = combined[0][0].edge_policy
+        self.assertTrue(sat_split.compiled_correctly(topo, policies[0],
+                                                     compiled[0],
+                                                     edge_policy=edge_policy,
+                                                     processes=2))
+        self.assertFalse(sat_split.compiled_correctly(topo, policies[1],
+                                                      compiled[0],
+                                                      processes=2))
+        self.assertIsNone(sat_split.one_per_edge(topo, compiled[0]))
+
+    def testAllPairs(self):
+        topo, policies = linear((0, 1, 2, 3), (0, 1, 2, 3), (0, 1, 2, 3))
+        slices = [slicing.ident_map_slice(topo, {}) for p in policies]
+        compiled = cp.compile_slices(zip(slices, policies))
+        report = isolation.check_all(topo, compiled, processes=2)
+        self.assertTrue(report.isolated())
+        self.assertEqual(set([(0, 1), (0, 2), (1, 2)]), set(report.times))
+        self.assertEqual([[None, True, True], [True, None, True],
+                          [True, True, None]], report.matrix)
+
+        report = isolation.check_all(topo, policies, processes=1,
+                                     stop_early=True)
+        self.assertEqual([(0, 1)], report.violations)
+        self.assertEqual([(0, 1)], report.times.keys())
+        self.assertIsNone(report.matrix[1][2])
+
+    def testOverlappingPools(self):
+        # The first generator closes while the second is still running
+        first = util.fork_imap(lambda x: x * 2, range(4), processes=2)
+        index, result = first.next()
+        self.assertEqual(index * 2, result)
+        second = util.fork_imap(lambda x: x * 3, range(4), processes=2)
+        results = [second.next()]
+        first.close()
+        results.extend(second)
+        self.assertEqual(set((i, i * 3) for i in range(4)), set(results))
+        # Only the workers ever hold their pool's work
+        self.assertIsNone(util._fork_work)
+
     def testEdgePredicates(self):
         topo, combined = linear_hosts((0, 1, 2, 3), (0, 1, 2, 3))
         for key in combined[0][0].edge_policy:
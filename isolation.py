@@ -0,0 +1,141 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+# /slices/isolation.py                                                         #
+# Parallel all-pairs isolation checking                                        #
+################################################################################
+"""Check every pair of compiled slices for isolation, in parallel.
+
+Takes the policies from compile.compile_slices or edge_compile.compile_slices
+and checks each pair with sat.separate and sat.unshared_portals.  Pairs are
+checked in forked worker processes, and results come back as they finish.
+Workers do not get fresh z3 contexts: each works on its own copy of this
+process's memory, z3's main context included, as it was when the pool was
+forked.
+"""
+
+import time
+import sat
+import util
+
+def check_pair(topo, policy1, policy2, portals=True):
+    """Return whether two compiled slice policies are isolated.
+
+    ARGS:
+        topo:  physical topology
+        policy1, policy2:  compiled slice policies
+        portals:  also require sat.unshared_portals
+    """
+    if not sat.separate(topo, policy1, policy2):
+        return False
+    if portals and not sat.unshared_portals(topo, policy1, policy2):
+        return False
+    return True
+
+def iter_pairs(topo, policies, processes=None, chunksize=1, portals=True,
+               stop_early=False):
+    """Yield (i, j, isolated, seconds) for each pair i < j, as they finish.
+
+    ARGS:
+        topo:  physical topology
+        policies:  compiled slice policies
+        processes:  number of worker processes, None for one per CPU, see
+            util.fork_map
+        chunksize:  number of pairs to hand a worker at a time
+        portals:  also require sat.unshared_portals
+        stop_early:  stop after the first pair that is not isolated
+    """
+    pairs = [(i, j) for i in range(len(policies))
+                    for j in range(i + 1, len(policies))]
+    def check((i, j)):
+        start = time.time()
+        isolated = check_pair(topo, policies[i], policies[j], portals)
+        return (isolated, time.time() - start)
+    results = util.fork_imap(check, pairs, processes, chunksize)
+    try:
+        for index, (isolated, seconds) in results:
+            i, j = pairs[index]
+            yield (i, j, isolated, seconds)
+            if stop_early and not isolated:
+                break
+    finally:
+        results.close()
+
+class Report(object):
+    """Results of checking pairs of slices.
+
+    matrix:  matrix[i][j] is whether slices i and j are isolated, or None if
+        the pair was not checked.  The diagonal is None.
+    times:  {(i, j): seconds to check}, i < j
+    violations:  sorted list of pairs (i, j), i < j, that are not isolated
+    """
+    def __init__(self, n):
+        self.matrix = [[None] * n for _ in range(n)]
+        self.times = {}
+        self.violations = []
+
+    def add(self, i, j, isolated, seconds):
+        self.matrix[i][j] = isolated
+        self.matrix[j][i] = isolated
+        self.times[(i, j)] = seconds
+        if not isolated:
+            self.violations.append((i, j))
+            self.violations.sort()
+
+    def isolated(self):
+        """Were all checked pairs isolated?"""
+        return len(self.violations) == 0
+
+    def __str__(self):
+        rows = []
+        for i, row in enumerate(self.matrix):
+            cells = []
+            for isolated in row:
+                if isolated is None:
+                    cells.append('-')
+                elif isolated:
+                    cells.append('.')
+                else:
+                    cells.append('X')
+            rows.append('%3d %s' % (i, ' '.join(cells)))
+        return '\n'.join(rows)
+
+def check_all(topo, policies, processes=None, chunksize=1, portals=True,
+              stop_early=False, verbose=False):
+    """Check every pair of policies, and return a Report.
+
+    See iter_pairs for the arguments.  With verbose, prints each pair as it
+    finishes.
+    """
+    report = Report(len(policies))
+    for i, j, isolated, seconds in iter_pairs(topo, policies, processes,
+                                              chunksize, portals, stop_early):
+        if verbose:
+            print '%d, %d: %s (%f s)' % (i, j,
+                                         'isolated' if isolated else 'VIOLATED',
+                                         seconds)
+        report.add(i, j, isolated, seconds)
+    return report
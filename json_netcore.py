@@ -56,11 +56,10 @@ class NetcoreEncoder(json.JSONEncoder):
             return {'type': 'Bottom'}
         elif isinstance(p, nc.Header):
             return {'type': 'Header',
-                    'fields': p.fields}
+                    'fields': dict(p.fields)}
         elif isinstance(p, nc.Union):
             return {'type': 'Union',
-                    'left': self.predicate(p.left),
-                    'right': self.predicate(p.right)}
+                    'children': [self.predicate(c) for c in p.children]}
         elif isinstance(p, nc.Intersection):
             return {'type': 'Intersection',
                     'left': self.predicate(p.left),
@@ -76,7 +75,7 @@ class NetcoreEncoder(json.JSONEncoder):
         return {'type': 'Action',
                 'switch': a.switch,
                 'ports': list(a.ports),
-                'modify': a.modify,
+                'modify': dict(a.modify),
                 'obs': list(a.obs)}
 
     def policy(self, p):
@@ -88,8 +87,7 @@ class NetcoreEncoder(json.JSONEncoder):
                     'actions': [self.action(a) for a in p.actions]}
         elif isinstance(p, nc.PolicyUnion):
             return {'type': 'PolicyUnion',
-                    'left': self.policy(p.left),
-                    'right': self.policy(p.right)}
+                    'children': [self.policy(c) for c in p.children]}
         elif isinstance(p, nc.PolicyRestriction):
             return {'type': 'PolicyRestriction',
                     'policy': self.policy(p.policy),
@@ -117,6 +115,9 @@ class NetcoreDecoder(json.JSONDecoder):
             elif typ == 'Header':
                 return nc.Header(d['fields'])
             elif typ == 'Union':
+                # Binary unions are from before unions were n-ary
+                if 'children' in d:
+                    return nc.Union(*d['children'])
                 return nc.Union(d['left'], d['right'])
             elif typ == 'Intersection':
                 return nc.Intersection(d['left'], d['right'])
@@ -134,6 +135,8 @@ class NetcoreDecoder(json.JSONDecoder):
             elif typ == 'PrimitivePolicy':
                 return nc.PrimitivePolicy(d['predicate'], d['actions'])
             elif typ == 'PolicyUnion':
+                if 'children' in d:
+                    return nc.PolicyUnion(*d['children'])
                 return nc.PolicyUnion(d['left'], d['right'])
             elif typ == 'PolicyRestriction':
                 return nc.PolicyRestriction(d['policy'], d['predicate'])
@@ -55,7 +55,7 @@ Observation ob ::= *
 Predicate d    ::= Top
                  | Bottom
                  | Header({f: v})
-   d1 + d2       | Union(d1, d2)
+   d1 + d2       | Union(d1, d2, ..., dn)
    d1 & d2       | Intersection(d1, d2)
    d1 - d2       | Difference(d1, d2)
                
@@ -63,12 +63,15 @@ Action a       ::= Action(s, p Set, {f: v}, ob Set)
                
 Policy p       ::= BottomPolicy
    d |then| a    | PrimitivePolicy(d, a)
-   p1 + p2       | PolicyUnion(p1, p2)
+   p1 + p2       | PolicyUnion(p1, p2, ..., pn)
    p % d         | PolicyRestriction(p, d)
 
 PolicyRestriction objects are never found in policies that have been reduced by
 policy.reduce().
 
+Unions are n-ary and flat: a union never has a union of the same kind as a
+direct child, so the depth of a policy does not grow with the number of rules.
+
 Note that * types must be integers for SAT verification to work, and must be
 JSON-serializable (composed of strings (incl. unicode), integers, longs, floats,
 booleans, None, lists, dictionaries, and tuples) for policies including them to
@@ -76,7 +79,7 @@ serialize to JSON.
 """
 
 from abc import ABCMeta, abstractmethod
-import copy
+import weakref
 
 # Two constants, one for quick lookups, one to have a canonical ordering.
 HEADERS = ['switch',
@@ -92,17 +95,37 @@ HEADERS = ['switch',
            'dstport']
 HEADER_FIELDS = set (HEADERS)
 
+# Hash-consing state.  While interning is on, constructing a node that is
+# structurally equal to a live node returns the live node instead.
+_interning = False
+_intern_table = weakref.WeakValueDictionary()
+
+def set_interning(enabled):
+    """Turn hash-consing of predicates, policies and actions on or off.
+
+    While interning is on, structurally equal nodes are one shared object, so
+    policies become DAGs rather than trees, equality between interned nodes is
+    an identity check and their hashes are computed once.  Shared nodes must
+    never be mutated.  Nodes built while interning is off are unaffected, and
+    still compare structurally with interned ones.
+
+    Commutative nodes (Union, Intersection, PolicyUnion) are interned up to the
+    order of their operands, so Union(a, b) may return an existing Union(b, a).
+
+    RETURNS:
+        the previous setting.
+    """
+    global _interning
+    previous = _interning
+    _interning = bool(enabled)
+    return previous
+
 def simulate(policy, packet, (switch, port)):
-    """Get resulting located packets, observations."""
-    actions = policy.get_actions(packet, (switch, port))
-    actions = [a for a in actions if a.switch == switch]
-    observations = set()
-    for a in actions:
-        observations.update(a.obs)
-    packets = set()
-    for a in actions:
-        packets.update(a.modify_packet(packet))
-    return (packets, observations)
+    """Get resulting located packets, observations.
+
+    Uses the policy's classifier, see Policy.classifier.
+    """
+    return policy.classifier().simulate(packet, (switch, port))
 
 class Infix:
     """Class to define infix operators like |so|."""
@@ -119,6 +142,177 @@ class Infix:
     def __call__(self, value1, value2):
         return self.function(value1, value2)
 
+class HashConsMeta(ABCMeta):
+    """Metaclass for netcore nodes that hash-conses them while interning."""
+    def __call__(cls, *args, **kwargs):
+        node = super(HashConsMeta, cls).__call__(*args, **kwargs)
+        if not _interning:
+            return node
+        key = (cls, node._key())
+        canonical = _intern_table.get(key)
+        if canonical is None:
+            node._hash = hash(key)
+            node._interned = True
+            _intern_table[key] = node
+            canonical = node
+        return canonical
+
+class FieldMap(object):
+    """An immutable, hashable mapping from header fields to values.
+
+    Stored as a tuple of (field, value) pairs sorted by field, so equal maps
+    have equal representations.  Supports the read-only part of the dict
+    interface, and compares equal to dicts with the same items.  Use
+    dict(field_map) to get a mutable copy.
+    """
+    __slots__ = ('_items',)
+
+    def __init__(self, fields=()):
+        """
+        ARGS:
+            fields: dictionary, FieldMap or iterable of (field, value) pairs
+        """
+        if isinstance(fields, FieldMap):
+            self._items = fields._items
+        else:
+            if hasattr(fields, 'iteritems'):
+                fields = fields.iteritems()
+            self._items = tuple(sorted(fields, key=lambda (f, v): f))
+
+    def __getitem__(self, field):
+        for f, v in self._items:
+            if f == field:
+                return v
+        raise KeyError(field)
+
+    def get(self, field, default=None):
+        for f, v in self._items:
+            if f == field:
+                return v
+        return default
+
+    def __contains__(self, field):
+        for f, _ in self._items:
+            if f == field:
+                return True
+        return False
+
+    def __iter__(self):
+        return (f for f, _ in self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def keys(self):
+        return [f for f, _ in self._items]
+
+    def values(self):
+        return [v for _, v in self._items]
+
+    def items(self):
+        return list(self._items)
+
+    def iterkeys(self):
+        return iter(self)
+
+    def iteritems(self):
+        return iter(self._items)
+
+    def __eq__(self, other):
+        if isinstance(other, FieldMap):
+            return self._items == other._items
+        elif isinstance(other, dict):
+            return dict(self._items) == other
+        else:
+            return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash(self._items)
+
+    def __str__(self):
+        return str(dict(self._items))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __reduce__(self):
+        return (FieldMap, (self._items,))
+
+    # Immutable, so copies can share
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+def _bag(items):
+    """Return a hashable multiset of items, for order-insensitive keys."""
+    counts = {}
+    for item in items:
+        counts[item] = counts.get(item, 0) + 1
+    return frozenset(counts.iteritems())
+
+class Node(object):
+    """Top-level abstract class for predicates, policies and actions.
+
+    Nodes are immutable, and compare and hash structurally through _key().
+    Every node class declares __slots__, so nodes carry no __dict__; subclasses
+    must declare __slots__ too, or they lose the saving.
+    """
+    __metaclass__ = HashConsMeta
+    __slots__ = ('_hash', '_interned', '_reduced', '__weakref__')
+
+    def __new__(cls, *args, **kwargs):
+        node = super(Node, cls).__new__(cls)
+        node._hash = None
+        node._interned = False
+        node._reduced = None
+        return node
+
+    @abstractmethod
+    def _key(self):
+        """Return a hashable tuple that is equal exactly for equal nodes."""
+        pass
+
+    @abstractmethod
+    def _args(self):
+        """Return the constructor arguments that rebuild this node."""
+        pass
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        elif self.__class__ is not other.__class__:
+            return False
+        elif self._interned and other._interned:
+            # Equal interned nodes are the same object.
+            return False
+        elif (self._hash is not None and other._hash is not None and
+                self._hash != other._hash):
+            return False
+        else:
+            return self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((self.__class__, self._key()))
+        return self._hash
+
+    def __reduce__(self):
+        # Copies and unpickled nodes are rebuilt through the constructor, so
+        # they recompute their own cached values, and are interned if interning
+        # is on.
+        return (self.__class__, self._args())
+
 class PhysicalException(Exception):
     """Exceptions during logical-to-physical mapping."""
     pass
@@ -130,6 +324,9 @@ class Packet:
 
     def __getitem__(self, key):
         return self._fields[key]
+
+    def get(self, key, default=None):
+        return self._fields.get(key, default)
     
     def items(self):
         return self._fields.items()
@@ -140,9 +337,9 @@ class Packet:
     def __eq__(self, other):
         return self._fields == other._fields
 
-class Predicate:
+class Predicate(Node):
     """Top-level abstract class for predicates."""
-    __metaclass__ = ABCMeta
+    __slots__ = ()
 
     @abstractmethod
     def get_physical_predicate(self, switch_map, port_map):
@@ -173,16 +370,25 @@ class Predicate:
     def __repr__(self):
         return self.__str__()
 
-    @abstractmethod
-    def __eq__(self, other):
-        pass
+    def reduce(self):
+        """Return an equivalent node with redundencies removed.
 
-    def __ne__(self, other):
-        return not self == other
+        The result is cached on the node and shared with every caller, which
+        is safe since nodes are immutable.  Reducing this node again, reducing
+        another reference to a shared subtree, or reducing the result itself,
+        costs nothing.
+        """
+        if self._reduced is None:
+            result = self._reduce()
+            # A reduced node is its own reduced form
+            if result._reduced is None:
+                result._reduced = result
+            self._reduced = result
+        return self._reduced
 
     @abstractmethod
-    def reduce(self):
-        """Return a copy with removed redundencies."""
+    def _reduce(self):
+        """Compute the reduced form of this node, uncached."""
         pass
 
     def is_bottom(self):
@@ -202,6 +408,8 @@ class Predicate:
 # Should these just be one class that holds a boolean?
 class Top(Predicate):
     """The always-true predicate."""
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -214,17 +422,22 @@ class Top(Predicate):
     def size(self):
         return 1
 
-    def reduce(self):
+    def _reduce(self):
         return Top()
 
     def __str__(self):
         return "Top"
 
-    def __eq__(self, other):
-        return isinstance(other, Top)
+    def _key(self):
+        return ()
+
+    def _args(self):
+        return ()
 
 class Bottom(Predicate):
     """The always-false predicate."""
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -240,14 +453,17 @@ class Bottom(Predicate):
     def size(self):
         return 1
 
-    def reduce(self):
+    def _reduce(self):
         return Bottom()
 
     def __str__(self):
         return "Bottom"
 
-    def __eq__(self, other):
-        return isinstance(other, Bottom)
+    def _key(self):
+        return ()
+
+    def _args(self):
+        return ()
 
 def inport(switch, ports):
     """Construct a predicate accepting packets on one or a list of ports."""
@@ -273,7 +489,7 @@ def intersect_headers(h1, h2):
     independently.
     """
 
-    f1 = copy.copy(h1.fields)
+    f1 = dict(h1.fields)
     f2 = h2.fields
     for f, p2 in f2.items():
         if f in f1:
@@ -292,6 +508,8 @@ class Header(Predicate):
     Matches a header against a wildcard.  Note that "header" fields also include
     switch and port fields.  See header_fields for a complete list
     """
+    __slots__ = ('fields',)
+
     def __init__(self, fields):
         """
         ARGS:
@@ -299,19 +517,24 @@ class Header(Predicate):
 
         field: header field to match pattern against
         pattern: value to match.
+
+        fields is stored as an immutable FieldMap.
         """
-        self.fields = fields
+        self.fields = FieldMap(fields)
 
     def __str__(self):
         return "Header: %s" % str(self.fields)
 
-    def __eq__(self, other):
-        return (isinstance(other, Header) and self.fields == other.fields)
+    def _key(self):
+        return (self.fields,)
+
+    def _args(self):
+        return (self.fields,)
 
     def size(self):
         return 1
 
-    def reduce(self):
+    def _reduce(self):
         return Header(self.fields)
 
     def get_physical_predicate(self, switch_map, port_map):
@@ -369,43 +592,68 @@ class Header(Predicate):
 
 # Compound predicates
 class Union(Predicate):
-    """A predicate representing the union of two predicates."""
-    def __init__(self, left, right):
+    """A predicate representing the union of any number of predicates.
+
+    Nested unions are spliced into their parent on construction, so the union
+    of n predicates is a single node with n children.
+    """
+    __slots__ = ('children', '_right')
+
+    def __init__(self, *predicates):
         """
         ARGS:
-            left: first predicate to union
-            right: second predicate to union
+            predicates: predicates to union
         """
-        self.left = left
-        self.right = right
+        children = []
+        for predicate in predicates:
+            if isinstance(predicate, Union):
+                children.extend(predicate.children)
+            else:
+                children.append(predicate)
+        self.children = tuple(children)
+        self._right = None
+
+    @property
+    def left(self):
+        """First child, for code that treats unions as binary."""
+        return self.children[0]
+
+    @property
+    def right(self):
+        """Union of all but the first child, for code that treats unions as
+        binary.
+
+        Built on first use and kept, but walking a union through left and
+        right still builds a node per child; iterate over children instead.
+        """
+        if self._right is None:
+            self._right = nary_union(self.children[1:])
+        return self._right
 
     def __str__(self):
-        left_s = str(self.left)
-        right_s = str(self.right)
-        left_lines  = ['|' + s for s in left_s.split('\n')]
-        right_lines = ['|' + s for s in right_s.split('\n')]
-        return "\n".join(["Union"] + left_lines + right_lines)
+        lines = ["Union"]
+        for child in self.children:
+            lines.extend(['|' + s for s in str(child).split('\n')])
+        return "\n".join(lines)
 
-    def __eq__(self, other):
-        return (isinstance(other, Union) and
-                ((self.left == other.left and self.right == other.right) or
-                 (self.right == other.left and self.left == other.right)))
+    def _key(self):
+        return (_bag(self.children),)
 
-    def size(self):
-        return 1 + self.left.size() + self.right.size()
+    def _args(self):
+        return self.children
 
-    # TODO(astory): top-reduction over subcomponents
-    def reduce(self):
-        r_left = self.left.reduce()
-        r_right = self.right.reduce()
-        if isinstance(r_left, Top) or isinstance(r_right, Top):
-            return Top()
-        elif r_left.is_bottom():
-            return r_right
-        elif r_right.is_bottom():
-            return r_left
-        else:
-            return r_left + r_right
+    def size(self):
+        return 1 + sum([child.size() for child in self.children])
+
+    def _reduce(self):
+        r_children = []
+        for child in self.children:
+            r_child = child.reduce()
+            if isinstance(r_child, Top):
+                return Top()
+            elif not r_child.is_bottom():
+                r_children.append(r_child)
+        return nary_union(r_children)
 
     def get_physical_predicate(self, switch_map, port_map):
         """ Creates a copy of this Predicate in which all logical
@@ -425,15 +673,19 @@ class Union(Predicate):
         ports and switches have been mapped to their physical
         counterparts
         """
-        l_pred = self.left.get_physical_predicate(switch_map, port_map)
-        r_pred = self.right.get_physical_predicate(switch_map, port_map)
-        return Union(l_pred, r_pred)
+        return Union(*[child.get_physical_predicate(switch_map, port_map)
+                       for child in self.children])
 
     def match(self, packet, loc):
-        return self.left.match(packet, loc) or self.right.match(packet, loc)
+        for child in self.children:
+            if child.match(packet, loc):
+                return True
+        return False
 
 class Intersection(Predicate):
     """A predicate representing the intersection of two predicates."""
+    __slots__ = ('left', 'right')
+
     def __init__(self, left, right):
         """
         ARGS:
@@ -453,15 +705,16 @@ class Intersection(Predicate):
     def __repr__(self):
         return self.__str__()
 
-    def __eq__(self, other):
-        return (isinstance(other, Intersection) and
-                ((self.left == other.left and self.right == other.right) or
-                 (self.right == other.left and self.left == other.right)))
+    def _key(self):
+        return (_bag([self.left, self.right]),)
+
+    def _args(self):
+        return (self.left, self.right)
 
     def size(self):
         return 1 + self.left.size() + self.right.size()
 
-    def reduce(self):
+    def _reduce(self):
         r_left = self.left.reduce()
         r_right = self.right.reduce()
         if r_left.is_bottom() or r_right.is_bottom():
@@ -479,13 +732,11 @@ class Intersection(Predicate):
             return intersect_headers(r_left, r_right)
         # This transformation does not increase the depth
         elif isinstance(r_left, Union) and isinstance(r_right, Header):
-            u_left = (r_left.left & r_right).reduce()
-            u_right = (r_left.right & r_right).reduce()
-            return (u_left + u_right).reduce()
+            return nary_union([(child & r_right).reduce()
+                               for child in r_left.children]).reduce()
         elif isinstance(r_right, Union) and isinstance(r_left, Header):
-            u_left = (r_right.left & r_left).reduce()
-            u_right = (r_right.right & r_left).reduce()
-            return (u_left + u_right).reduce()
+            return nary_union([(child & r_left).reduce()
+                               for child in r_right.children]).reduce()
         # If one side of the intersection is also an intersection, but didn't
         # reduce, we might get it to reduce by moving the other predicate over
         # to it, and it doesn't increase depth
@@ -498,8 +749,6 @@ class Intersection(Predicate):
             i_right = (r_right.right & r_left).reduce()
             return (i_left & i_right).reduce()
         # Don't do union-union because that gets too combinatorically messy
-        # Note that nary unions are produced with n-1 unions, so this should
-        # traverse down them.
         elif isinstance(r_left, Difference) and isinstance(r_right, Header):
             d_left = (r_left.left & r_right).reduce()
             return (d_left - r_left.right).reduce()
@@ -536,6 +785,8 @@ class Intersection(Predicate):
 
 class Difference(Predicate):
     """A predicate representing the difference of two predicates."""
+    __slots__ = ('left', 'right')
+
     def __init__(self, left, right):
         """
         ARGS:
@@ -555,14 +806,16 @@ class Difference(Predicate):
     def __repr__(self):
         return self.__str__()
 
-    def __eq__(self, other):
-        return (isinstance(other, Difference) and
-                self.left == other.left and self.right == other.right)
+    def _key(self):
+        return (self.left, self.right)
+
+    def _args(self):
+        return (self.left, self.right)
 
     def size(self):
         return 1 + self.left.size() + self.right.size()
 
-    def reduce(self):
+    def _reduce(self):
         r_left = self.left.reduce()
         r_right = self.right.reduce()
         if r_left.is_bottom() or isinstance(r_right, Top):
@@ -630,9 +883,10 @@ def nary_union(predicates):
     """Return a union of all predicates in predicates."""
     if len(predicates) == 0:
         return Bottom()
+    elif len(predicates) == 1:
+        return predicates[0]
     else:
-        base = predicates[0]
-        return sum(predicates[1:], base)
+        return Union(*predicates)
 
 def nary_intersection(predicates):
     """Return a intersection of all predicates in predicates."""
@@ -653,9 +907,11 @@ def forward(switch, ports):
         ports = [ports]
     return Action(switch, ports=ports)
 
-class Action:
+class Action(Node):
     """Description of a forwarding action, with possible modification."""
-    def __init__(self, switch, ports=set(), modify=dict(), obs=set()):
+    __slots__ = ('switch', 'ports', 'modify', 'obs')
+
+    def __init__(self, switch, ports=(), modify=None, obs=()):
         """
         ARGS:
             switch: switch on which the ports live.
@@ -663,11 +919,13 @@ class Action:
             modify: dictionary of header fields to values, fields that are set
                 will overwrite the packet's fields
             obs: counters to increment when this action fires.
+
+        ports and obs are stored as frozensets, and modify as a FieldMap.
         """
         self.switch = switch
-        self.ports = ports
-        self.modify = modify
-        self.obs = obs
+        self.ports = frozenset(ports)
+        self.modify = FieldMap(modify or ())
+        self.obs = frozenset(obs)
 
     def __str__(self):
         return "%s: %s -%s-> %s" % (self.switch, self.modify,
@@ -676,11 +934,11 @@ class Action:
     def __repr__(self):
         return self.__str__()
 
-    def __eq__(self, other):
-        return (isinstance(other, Action) and
-            self.switch == other.switch and
-            self.ports == other.ports and
-            self.modify == other.modify)
+    def _key(self):
+        return (self.switch, self.ports, self.modify, self.obs)
+
+    def _args(self):
+        return (self.switch, self.ports, self.modify, self.obs)
 
     def modify_packet(self, packet):
         """Modify packet with this action's modify pattern.
@@ -706,9 +964,14 @@ class Action:
         p_ports = [port_map[(self.switch, p)][1] for p in self.ports]
         return Action(switch_map[self.switch], p_ports, self.modify, self.obs)
 
-class Policy:
+class Policy(Node):
     """Top-level abstract description of a static network program."""
-    __metaclass__ = ABCMeta
+    __slots__ = ('_classifier',)
+
+    def __new__(cls, *args, **kwargs):
+        node = super(Policy, cls).__new__(cls, *args, **kwargs)
+        node._classifier = None
+        return node
 
     @abstractmethod
     def get_physical_rep(self, switch_map, port_map):
@@ -735,23 +998,53 @@ class Policy:
         return self.__str__()
 
     @abstractmethod
-    def __eq__(self, other):
+    def size(self):
         pass
 
-    def __ne__(self, other):
-        return not self == other
+    def get_actions(self, packet, loc):
+        """Get set of actions this policy generates for a located packet.
 
-    @abstractmethod
-    def size(self):
-        pass
+        Looked up in the policy's classifier, see classifier().  A packet
+        missing a field a rule matches on does not match the rule.
+        """
+        return self.classifier().get_actions(packet, loc)
+
+    def classifier(self):
+        """Return a classifier.Classifier for this policy.
+
+        Compiled on first use and kept on the node, which is safe since nodes
+        are immutable, so every later get_actions and simulate on this policy
+        walks one decision tree branch instead of the whole policy.
+        """
+        if self._classifier is None:
+            # Import here because classifier imports this module
+            import classifier
+            self._classifier = classifier.Classifier(self)
+        return self._classifier
 
     @abstractmethod
-    def get_actions(self, packet, loc):
-        """Get set of actions this policy generates for a located packet."""
+    def _get_actions(self, packet, loc):
+        """Get the actions of get_actions by walking the policy, uncached."""
         pass
 
     def reduce(self):
-        """Return copy with removed redundencies."""
+        """Return an equivalent node with redundencies removed.
+
+        The result is cached on the node and shared with every caller, which
+        is safe since nodes are immutable.  Reducing this node again, reducing
+        another reference to a shared subtree, or reducing the result itself,
+        costs nothing.
+        """
+        if self._reduced is None:
+            result = self._reduce()
+            # A reduced node is its own reduced form
+            if result._reduced is None:
+                result._reduced = result
+            self._reduced = result
+        return self._reduced
+
+    def _reduce(self):
+        """Compute the reduced form of this node, uncached."""
         return self.__class__()
 
     def is_bottom(self):
@@ -769,13 +1062,15 @@ class Policy:
 
 class BottomPolicy(Policy):
     """Policy that drops everything."""
+    __slots__ = ()
+
     def __init__(self):
         pass
 
     def get_physical_rep(self, switch_map, port_map):
         return self
 
-    def get_actions(self, packet, loc):
+    def _get_actions(self, packet, loc):
         return []
 
     def is_bottom(self):
@@ -787,8 +1082,11 @@ class BottomPolicy(Policy):
     def __str__(self):
         return "BottomPolicy"
 
-    def __eq__(self, other):
-        return isinstance(other, BottomPolicy)
+    def _key(self):
+        return ()
+
+    def _args(self):
+        return ()
 
     def size(self):
         return 1
@@ -808,6 +1106,8 @@ then = Infix(make_policy)
 
 class PrimitivePolicy(Policy):
     """Policy for mapping a single predicate to a list of actions."""
+    __slots__ = ('predicate', 'actions')
+
     def __init__(self, predicate, actions):
         """
         ARGS:
@@ -818,23 +1118,26 @@ class PrimitivePolicy(Policy):
                 forwarding out any given ports, before applying the next
                 action.  In this way, a PrimitivePolicy may result in multiple
                 packets.  Note that actions may be the empty list.
+
+        actions is stored as a tuple.
         """
         self.predicate = predicate
-        self.actions = actions
+        self.actions = tuple(actions)
 
     def __str__(self):
         return "PrimitivePolicy\n|%s\n|%s" % (self.predicate, self.actions)
 
-    def __eq__(self, other):
-        return isinstance(other, PrimitivePolicy) and \
-            self.predicate == other.predicate and \
-            self.actions == other.actions
+    def _key(self):
+        return (self.predicate, self.actions)
+
+    def _args(self):
+        return (self.predicate, self.actions)
 
     # TODO(astory): do actions have a size?
     def size(self):
         return self.predicate.size() + 1
 
-    def reduce(self):
+    def _reduce(self):
         if len(self.actions) == 0:
             return BottomPolicy()
         r_pred = self.predicate.reduce()
@@ -871,7 +1174,7 @@ class PrimitivePolicy(Policy):
                  for action in self.actions]
         return PrimitivePolicy(p_pred, p_act)
 
-    def get_actions(self, packet, loc):
+    def _get_actions(self, packet, loc):
         if self.predicate.match(packet, loc):
             switch = loc[0]
             return [a for a in self.actions if a.switch == switch]
@@ -879,45 +1182,67 @@ class PrimitivePolicy(Policy):
             return []
 
 class PolicyUnion(Policy):
-    """The union of two policies."""
-    def __init__(self, left, right):
+    """The union of any number of policies.
+
+    Nested unions are spliced into their parent on construction, so the union
+    of n policies is a single node with n children.
+    """
+    __slots__ = ('children', '_right')
+
+    def __init__(self, *policies):
         """
         ARGS:
-            left: first policy to union
-            right: second policy to union
+            policies: policies to union
         """
-        self.left = left
-        self.right = right
+        children = []
+        for policy in policies:
+            if isinstance(policy, PolicyUnion):
+                children.extend(policy.children)
+            else:
+                children.append(policy)
+        self.children = tuple(children)
+        self._right = None
+
+    @property
+    def left(self):
+        """First child, for code that treats unions as binary."""
+        return self.children[0]
+
+    @property
+    def right(self):
+        """Union of all but the first child, for code that treats unions as
+        binary.
+
+        Built on first use and kept, but walking a union through left and
+        right still builds a node per child; iterate over children instead.
+        """
+        if self._right is None:
+            self._right = nary_policy_union(self.children[1:])
+        return self._right
 
     def __str__(self):
-        left_s = str(self.left)
-        right_s = str(self.right)
-        left_lines  = ['|' + s for s in left_s.split('\n')]
-        right_lines = ['|' + s for s in right_s.split('\n')]
-        return "\n".join(["PolicyUnion"] + left_lines + right_lines)
+        lines = ["PolicyUnion"]
+        for child in self.children:
+            lines.extend(['|' + s for s in str(child).split('\n')])
+        return "\n".join(lines)
 
-    def __eq__(self, other):
-        return (isinstance(other, PolicyUnion) and
-                ((self.left == other.left and self.right == other.right) or
-                 (self.right == other.left and self.left == other.right)))
+    def _key(self):
+        return (_bag(self.children),)
+
+    def _args(self):
+        return self.children
 
     def size(self):
-        return 1 + self.left.size() + self.right.size()
+        return 1 + sum([child.size() for child in self.children])
 
-    def reduce(self):
-        r_left = self.left.reduce()
-        r_right = self.right.reduce()
-        if r_left.is_bottom():
-            return r_right
-        elif r_right.is_bottom():
-            return r_left
-        else:
-            return r_left + r_right
+    def _reduce(self):
+        r_children = [child.reduce() for child in self.children]
+        return nary_policy_union([r_child for r_child in r_children
+                                  if not r_child.is_bottom()])
 
     def restrict(self, predicate):
-        r_left = self.left.restrict(predicate)
-        r_right = self.right.restrict(predicate)
-        return r_left + r_right
+        return PolicyUnion(*[child.restrict(predicate)
+                             for child in self.children])
 
     def get_physical_rep(self, switch_map, port_map):
         """ Creates a copy of this object in which all logical
@@ -937,22 +1262,23 @@ class PolicyUnion(Policy):
         ports and switches have been mapped to their physical
         counterparts
         """
-        l_pol = self.left.get_physical_rep(switch_map, port_map)
-        r_pol = self.right.get_physical_rep(switch_map, port_map)
-        return PolicyUnion(l_pol, r_pol)
+        return PolicyUnion(*[child.get_physical_rep(switch_map, port_map)
+                             for child in self.children])
 
-    def get_actions(self, packet, loc):
-        left = self.left.get_actions(packet, loc)
-        left.extend(self.right.get_actions(packet, loc))
-        return left
+    def _get_actions(self, packet, loc):
+        actions = []
+        for child in self.children:
+            actions.extend(child._get_actions(packet, loc))
+        return actions
 
 def nary_policy_union(policies):
     """Take the union of many policies."""
     if len(policies) == 0:
         return BottomPolicy()
+    elif len(policies) == 1:
+        return policies[0]
     else:
-        base = policies[0]
-        return sum(policies[1:], base)
+        return PolicyUnion(*policies)
 
 class PolicyRestriction(Policy):
     """A policy restricted by a predicate.
@@ -960,6 +1286,8 @@ class PolicyRestriction(Policy):
     Note that a reduced policy NEVER contains restrictions since they are
     transformed into intersections.
     """
+    __slots__ = ('policy', 'predicate')
+
     def __init__(self, policy, predicate):
         """
         ARGS:
@@ -976,14 +1304,16 @@ class PolicyRestriction(Policy):
         right_lines = ['|' + s for s in right_s.split('\n')]
         return "\n".join(["PolicyRestriction"] + left_lines + right_lines)
 
-    def __eq__(self, other):
-        return (isinstance(other, PolicyRestriction) and
-                self.policy == other.policy and self.predicate == other.predicate)
+    def _key(self):
+        return (self.policy, self.predicate)
+
+    def _args(self):
+        return (self.policy, self.predicate)
 
     def size(self):
         return 1 + self.policy.size() + self.predicate.size()
 
-    def reduce(self):
+    def _reduce(self):
         r_pred = self.predicate.reduce()
         return self.policy.restrict(r_pred).reduce()
 
@@ -1012,8 +1342,8 @@ class PolicyRestriction(Policy):
     def restrict(self, predicate):
         return self.policy.restrict(self.predicate & predicate)
 
-    def get_actions(self, packet, loc):
+    def _get_actions(self, packet, loc):
         if self.predicate.match(packet, loc):
-            return self.policy.get_actions(packet, loc)
+            return self.policy._get_actions(packet, loc)
         else:
             return []
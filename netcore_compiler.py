@@ -49,14 +49,14 @@ The following restrictions on NetCore are currently in place:
 # Predicate ::= Top
 #            |  Bottom
 #            |  Header field pattern
-#            |  Union pred1 pred2
+#            |  Union pred1 pred2 ... predn
 #            |  Intersection pred1 pred2
 #            |  Difference pred1 pred2
 #
 # Action    ::= Action switch port modification
 #
 # Policy    ::= PrimitivePolicy predicate [action]
-#            |  PolicyUnion policy1 policy2
+#            |  PolicyUnion policy1 policy2 ... policyn
 #            |  PolicyRestriction policy predicate
 #
 
@@ -248,7 +248,8 @@ def compile_predicate(switch, p):
     elif isinstance(p, netcore.Header):
         return compile_predicate_header(switch, p)
     elif isinstance(p, netcore.Union):
-        return compile_binary_predicate(switch, p, compile_bones_union)
+        return reduce(compile_bones_union,
+                      [compile_predicate(switch, c) for c in p.children])
     elif isinstance(p, netcore.Intersection):
         return compile_binary_predicate(switch, p, compile_bones_intersection)
     elif isinstance(p, netcore.Difference):
@@ -307,7 +308,7 @@ def compile_actions(actions):
     # of each action.
     # i.e. it is safe to do
     #   (VLAN = 1, Forward 1), (VLAN = 1 IP = 2, Forward 2)
-    actions.sort(cmp=pattern_cmp, key=(lambda action: action.modify))
+    actions.sort(cmp=pattern_cmp, key=(lambda action: dict(action.modify)))
 
     # Flatten the list of Action objects
     action_lists = [compile_action(action) for action in actions]
@@ -338,13 +339,13 @@ def action_union(a1, a2):
         switch = a1.switch if a1.switch else a2.switch
         ports = list(a1.ports)
         ports.extend(a2.ports)
-        return netcore.Action(switch, ports, a1.modify.copy())
+        return netcore.Action(switch, ports, dict(a1.modify))
     elif len(a1.ports) == 0 and a1.modify != a2.modify:
         assert(a1.switch is None or a2.switch is None or a1.switch == a2.switch)
         switch = a1.switch if a1.switch else a2.switch
         ports = list(a1.ports)
         ports.extend(a2.ports)
-        return netcore.Action(switch, ports, a2.modify.copy())
+        return netcore.Action(switch, ports, dict(a2.modify))
     else:
         raise ConstraintException("Unsupported union of two Actions.")
 
@@ -366,7 +367,7 @@ def compile_policy_primitive(switch, p):
     bones = []
     for b in predBones:
         if b.action == True:
-            bones.append(Bone(b.pattern, p.actions))
+            bones.append(Bone(b.pattern, list(p.actions)))
         elif b.action == False:
             bones.append(Bone(b.pattern, []))
         else:
@@ -375,9 +376,8 @@ def compile_policy_primitive(switch, p):
 
 def compile_policy_union(switch, p):
     assert(isinstance(p, netcore.PolicyUnion))
-    bonesLeft = compile_policy(switch, p.left)
-    bonesRight = compile_policy(switch, p.right)
-    return bones_cross_product(bonesLeft, bonesRight, actions_union)
+    return reduce(lambda b1, b2: bones_cross_product(b1, b2, actions_union),
+                  [compile_policy(switch, c) for c in p.children])
 
 def compile_policy_restriction(switch, p):
     assert(isinstance(p, netcore.PolicyRestriction))
@@ -442,13 +442,9 @@ def prune_predicate(switch, pred):
             return netcore.Bottom()
         return pred
     elif isinstance(pred, netcore.Union):
-        p1 = prune_predicate(switch, pred.left)
-        p2 = prune_predicate(switch, pred.right)
-        if isinstance(p1, netcore.Bottom):
-            return p2
-        elif isinstance(p2, netcore.Bottom):
-            return p1
-        return netcore.Union(p1, p2)
+        children = [prune_predicate(switch, c) for c in pred.children]
+        return netcore.nary_union([c for c in children
+                                   if not isinstance(c, netcore.Bottom)])
     elif isinstance(pred, netcore.Intersection):
         p1 = prune_predicate(switch, pred.left)
         p2 = prune_predicate(switch, pred.right)
@@ -476,13 +472,9 @@ def prune_policy(switch, pol):
             return netcore.BottomPolicy()
         return netcore.PrimitivePolicy(pred, pol.actions)
     elif isinstance(pol, netcore.PolicyUnion):
-        p1 = prune_policy(switch, pol.left)
-        p2 = prune_policy(switch, pol.right)
-        if isinstance(p1, netcore.BottomPolicy):
-            return p2
-        elif isinstance(p2, netcore.BottomPolicy):
-            return p1
-        return netcore.PolicyUnion(p1, p2)
+        children = [prune_policy(switch, c) for c in pol.children]
+        return netcore.nary_policy_union(
+            [c for c in children if not isinstance(c, netcore.BottomPolicy)])
     elif isinstance(pol, netcore.PolicyRestriction):
         p1 = prune_policy(switch, pol.policy)
         pred = prune_predicate(switch, pol.predicate)
@@ -29,6 +29,7 @@
 # Tests for netcore, datastructures for predicates and policies                #
 ################################################################################
 import copy
+import pickle
 import netcore as nc
 from netcore import inport, then
 import unittest
@@ -214,6 +215,26 @@ class TestPredicate(unittest.TestCase):
         self.assertTrue(union.match(blank_packet, (3,3)))
         self.assertFalse(union.match(blank_packet, (-1,-1)))
 
+    def test_union_flat(self):
+        loc1 = nc.inport(1, 1)
+        loc2 = nc.inport(2, 2)
+        loc3 = nc.inport(3, 3)
+
+        self.assertEqual((loc1, loc2, loc3), ((loc1 + loc2) + loc3).children)
+        self.assertEqual((loc1, loc2, loc3), (loc1 + (loc2 + loc3)).children)
+        self.assertIs(loc1, nc.nary_union([loc1]))
+        self.assertEqual(nc.Bottom(), nc.nary_union([]))
+
+    def test_deep_union(self):
+        locs = [nc.inport(n, n) for n in range(5000)]
+        union = nc.Bottom()
+        for loc in locs:
+            union = union + loc
+        self.assertEqual(5001, len(union.children))
+        self.assertEqual(nc.nary_union(locs), union.reduce())
+        self.assertTrue(union.match(blank_packet, (4999, 4999)))
+        self.assertFalse(union.match(blank_packet, (5000, 5000)))
+
     def test_nary_intersection(self):
         field1 = nc.Header({'srcmac': 1})
         field2 = nc.Header({'dstmac': 2})
@@ -229,6 +250,32 @@ class TestPredicate(unittest.TestCase):
         self.assertFalse(inter.match(
             nc.Packet({'srcmac':2, 'dstmac':2, 'ethtype':-3}), (1,1)))
 
+    def test_reduce_cached(self):
+        union = nc.nary_union([reduceable, reduceable2, nc.Bottom()])
+        reduced = union.reduce()
+        self.assertEqual(red_target + red_target2, reduced)
+        self.assertIs(reduced, union.reduce())
+        # A reduced node is its own reduced form
+        self.assertIs(reduced, reduced.reduce())
+        policy = (union |then| nc.forward(1, 2)) + nc.BottomPolicy()
+        self.assertIs(policy.reduce(), policy.reduce().reduce())
+        # Shared subtrees are only reduced once
+        self.assertIs(reduceable.reduce(), (reduceable + nc.Top()).left.reduce())
+
+    def test_union_right_kept(self):
+        union = nc.nary_union([reduceable, reduceable2, nc.Top()])
+        self.assertIs(union.right, union.right)
+        self.assertEqual(reduceable2 + nc.Top(), union.right)
+        policy = nc.nary_policy_union([nc.Top() |then| nc.forward(1, p)
+                                       for p in range(3)])
+        self.assertIs(policy.right, policy.right)
+
+    def test_reduce_cache_not_copied(self):
+        reduceable.reduce()
+        duplicate = copy.deepcopy(reduceable)
+        self.assertIsNot(reduceable.reduce(), duplicate.reduce())
+        self.assertEqual(reduceable.reduce(), duplicate.reduce())
+
 class TestAction(unittest.TestCase):
     def test_modify_returns_new_packet(self):
         action = nc.Action(1, ports=[1], modify={})
@@ -286,5 +333,106 @@ class TestPolicy(unittest.TestCase):
         policy = header |then| actions
         self.assertItemsEqual(actions, policy.get_actions(full_packet, (1,2)))
 
+    def test_deep_policy_union(self):
+        policies = [nc.inport(n, n) |then| nc.Action(n, ports=[n])
+                    for n in range(5000)]
+        union = nc.BottomPolicy()
+        for policy in policies:
+            union = union + policy
+        self.assertEqual(5001, len(union.children))
+        self.assertEqual(nc.nary_policy_union(policies), union.reduce())
+        self.assertEqual([nc.Action(4999, ports=[4999])],
+                         union.get_actions(blank_packet, (4999, 4999)))
+
+class TestCompact(unittest.TestCase):
+    def test_no_dict(self):
+        nodes = [nc.Top(), nc.Bottom(), exact_header, reduceable,
+                 reduceable + exact_header, reduceable - exact_header,
+                 nc.Action(1, ports=[2], modify={'vlan': 1}, obs=[3]),
+                 nc.BottomPolicy(), exact_header |then| nc.forward(1, 2),
+                 (exact_header |then| nc.forward(1, 2)) + nc.BottomPolicy(),
+                 (exact_header |then| nc.forward(1, 2)) % reduceable]
+        for node in nodes:
+            self.assertFalse(hasattr(node, '__dict__'), node)
+            hash(node)
+
+    def test_immutable_fields(self):
+        header = nc.Header({'srcmac': 1, 'dstmac': 2})
+        self.assertEqual({'srcmac': 1, 'dstmac': 2}, header.fields)
+        self.assertEqual(['dstmac', 'srcmac'], header.fields.keys())
+        def set_vlan():
+            header.fields['vlan'] = 1
+        self.assertRaises(TypeError, set_vlan)
+
+        action = nc.Action(1, ports=[2, 2, 3], modify={'vlan': 1}, obs=[4])
+        self.assertEqual(frozenset([2, 3]), action.ports)
+        self.assertEqual(frozenset([4]), action.obs)
+        self.assertEqual({'vlan': 1}, action.modify)
+        self.assertEqual(1, action.modify['vlan'])
+        self.assertNotIn('srcmac', action.modify)
+
+    def test_default_not_shared(self):
+        a1 = nc.Action(1)
+        a2 = nc.Action(1)
+        self.assertEqual({}, a1.modify)
+        self.assertEqual(frozenset(), a1.ports)
+        self.assertEqual(a1, a2)
+
+    def test_pickle(self):
+        policy = ((reduceable |then| nc.Action(1, [2], {'vlan': 3}, [4])) +
+                  (nc.inport(1, [1, 2]) |then| []))
+        self.assertEqual(policy, pickle.loads(pickle.dumps(policy)))
+        self.assertEqual(policy, pickle.loads(pickle.dumps(policy, 2)))
+
+class TestInterning(unittest.TestCase):
+    def setUp(self):
+        self.previous = nc.set_interning(True)
+
+    def tearDown(self):
+        nc.set_interning(self.previous)
+
+    def test_shared(self):
+        self.assertIs(nc.Header({'srcmac': 1}), nc.Header({'srcmac': 1}))
+        self.assertIs(nc.Top(), nc.Top())
+        self.assertIsNot(nc.Header({'srcmac': 1}), nc.Header({'srcmac': 2}))
+        h1 = nc.Header({'srcmac': 1})
+        h2 = nc.Header({'dstmac': 2})
+        self.assertIs(h1 + h2, h1 + h2)
+        # Commutative nodes are shared regardless of operand order
+        self.assertIs(h1 + h2, h2 + h1)
+        self.assertIs(h1 & h2, h2 & h1)
+        self.assertIsNot(h1 - h2, h2 - h1)
+
+    def test_policies_shared(self):
+        p1 = nc.inport(1, 2) |then| nc.forward(1, 3)
+        p2 = nc.inport(1, 2) |then| nc.forward(1, 3)
+        self.assertIs(p1, p2)
+        self.assertIs(p1.actions[0], p2.actions[0])
+        self.assertIs(p1 + nc.BottomPolicy(), nc.BottomPolicy() + p2)
+
+    def test_observations_distinguish_actions(self):
+        a1 = nc.Action(1, ports=[2], obs=[1])
+        a2 = nc.Action(1, ports=[2], obs=[2])
+        self.assertIsNot(a1, a2)
+        self.assertNotEqual(a1, a2)
+
+    def test_reduce_shares(self):
+        reduced = (nc.Header({'srcmac': 1}) & nc.Header({'dstmac': 2})).reduce()
+        self.assertIs(nc.Header({'srcmac': 1, 'dstmac': 2}), reduced)
+
+    def test_mixed_equality(self):
+        nc.set_interning(False)
+        plain = nc.Header({'srcmac': 1}) + nc.Header({'dstmac': 2})
+        nc.set_interning(True)
+        interned = nc.Header({'dstmac': 2}) + nc.Header({'srcmac': 1})
+        self.assertEqual(plain, interned)
+        self.assertEqual(hash(plain), hash(interned))
+        self.assertIsNot(plain, interned)
+
+    def test_copies_interned(self):
+        policy = nc.inport(1, 2) |then| nc.forward(1, 3)
+        self.assertIs(policy, copy.deepcopy(policy))
+        self.assertIs(policy, pickle.loads(pickle.dumps(policy)))
+
 if __name__ == '__main__':
     unittest.main()
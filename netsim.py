@@ -0,0 +1,172 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+# /slices/netsim.py                                                            #
+# Multi-hop network simulation                                                 #
+################################################################################
+"""Simulate packets hop by hop across a topology.
+
+netcore.simulate moves a packet one hop, at one switch.  A Simulator injects
+packets at hosts or ports and follows them across the links of an NXTopo, as
+recorded in node['port'], until they reach a host, leave the network or are
+dropped.  Policies must be in terms of the topology's ports, so for sliced
+networks use the physical policy from compile.transform.
+"""
+
+import collections
+import networkx as nx
+import classifier
+
+# Hops a packet may take before it is considered expired
+DEFAULT_TTL = 64
+
+class Result(object):
+    """Outcome of a simulation.
+
+    delivered:  {host: set of packets that reached it}
+    exits:  set of located packets sent out ports without a link
+    dropped:  set of located packets the policy sent nowhere
+    expired:  set of located packets still in flight when the TTL ran out
+    observations:  set of observations made along the way
+    loops:  list of forwarding loops, each a list of located packets
+    """
+    def __init__(self):
+        self.delivered = {}
+        self.exits = set()
+        self.dropped = set()
+        self.expired = set()
+        self.observations = set()
+        self.loops = []
+
+    def hosts(self):
+        """Return the set of hosts a packet reached."""
+        return set(h for h, packets in self.delivered.iteritems() if packets)
+
+class Simulator(object):
+    """Follows located packets through a topology under a policy."""
+    def __init__(self, topo, policy, ttl=DEFAULT_TTL):
+        """
+        ARGS:
+            topo:  NXTopo (or any graph with the 'port' and 'isSwitch' node
+                attributes of one)
+            policy:  policy in terms of the ports of topo
+            ttl:  maximum hops to follow a packet for
+        """
+        self.topo = topo
+        self.classifier = classifier.Classifier(policy)
+        self.ttl = ttl
+
+    def host_location(self, host):
+        """Return the (switch, port) at which packets from host arrive."""
+        ports = self.topo.node[host]['port']
+        if len(ports) != 1:
+            raise Exception('host %s has %d links, expected one'
+                            % (host, len(ports)))
+        return ports.values()[0]
+
+    def inject(self, host, packet):
+        """Simulate packet sent by host."""
+        return self.run([(packet, self.host_location(host))])
+
+    def run(self, located_packets, hops=None):
+        """Simulate located packets until none are left in the network.
+
+        Each located packet carries its own hop count, and expires once it has
+        taken ttl hops.  A located packet is only processed again if it is
+        reached in fewer hops than before, so the simulation ends even if the
+        policy forwards packets in a loop.  Loops are found afterwards as the
+        cycles among the located packets.
+
+        ARGS:
+            located_packets:  iterable of (packet, (switch, port))
+            hops:  {located packet: hops it has already taken}, for packets
+                that are injected partway through their path; others start
+                at 0
+        """
+        if hops is None:
+            hops = {}
+        result = Result()
+        successors = {}
+        # {located packet: fewest hops it has been reached in}
+        taken = {}
+        worklist = collections.deque()
+        for lp in located_packets:
+            lp_hops = hops.get(lp, 0)
+            if lp not in taken or lp_hops < taken[lp]:
+                taken[lp] = lp_hops
+                successors.setdefault(lp, [])
+                worklist.append((lp, lp_hops))
+        while worklist:
+            lp, lp_hops = worklist.popleft()
+            if lp_hops > taken[lp]:
+                # Reached again in fewer hops since it was queued
+                continue
+            if lp_hops >= self.ttl:
+                result.expired.add(lp)
+                continue
+            result.expired.discard(lp)
+            packet, loc = lp
+            outputs, observations = self.classifier.simulate(packet, loc)
+            result.observations.update(observations)
+            if not outputs:
+                result.dropped.add(lp)
+            for out_packet, (switch, port) in outputs:
+                link = self.topo.node[switch]['port'].get(port)
+                if link is None:
+                    result.exits.add((out_packet, (switch, port)))
+                    continue
+                neighbor, neighbor_port = link
+                if not self.topo.node[neighbor]['isSwitch']:
+                    result.delivered.setdefault(neighbor, set()).add(
+                        out_packet)
+                    continue
+                next_lp = (out_packet, (neighbor, neighbor_port))
+                if next_lp not in successors[lp]:
+                    successors[lp].append(next_lp)
+                if next_lp not in taken or lp_hops + 1 < taken[next_lp]:
+                    taken[next_lp] = lp_hops + 1
+                    successors.setdefault(next_lp, [])
+                    worklist.append((next_lp, lp_hops + 1))
+        result.loops = find_loops(successors)
+        return result
+
+def find_loops(successors):
+    """Return the cycles in a {node: [successor]} graph, as lists of nodes."""
+    graph = nx.DiGraph()
+    for node, nexts in successors.iteritems():
+        graph.add_node(node)
+        for n in nexts:
+            graph.add_edge(node, n)
+    loops = []
+    for component in nx.strongly_connected_components(graph):
+        component = list(component)
+        if len(component) > 1 or graph.has_edge(component[0], component[0]):
+            loops.append(component)
+    return loops
+
+def reachable(topo, policy, host, packet, ttl=DEFAULT_TTL):
+    """Return the set of hosts packet can reach when sent by host."""
+    return Simulator(topo, policy, ttl).inject(host, packet).hosts()
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+################################################################################
+# /slices/netsim_test.py                                                       #
+# Tests for netsim, multi-hop network simulation                               #
+################################################################################
+import networkx as nx
+import netsim
+import netcore as nc
+from netcore import inport, then
+import unittest
+
+def line():
+    """Switches 1 - 2 - 3, with host 11 on switch 1 and host 13 on switch 3.
+
+    Ports are numbered by the neighbor's id, and hosts use port 0.
+    """
+    topo = nx.Graph()
+    for s in [1, 2, 3]:
+        topo.add_node(s, isSwitch=True, port={})
+    for h in [11, 13]:
+        topo.add_node(h, isSwitch=False, port={})
+    for a, b in [(1, 2), (2, 3), (11, 1), (13, 3)]:
+        a_port = 0 if a > 10 else b
+        topo.node[a]['port'][a_port] = (b, a)
+        topo.node[b]['port'][a] = (a, a_port)
+    return topo
+
+def forward(switch, in_port, out_port, obs=()):
+    return inport(switch, in_port) |then| nc.Action(switch, [out_port],
+                                                     obs=obs)
+
+class TestSimulator(unittest.TestCase):
+    def test_deliver(self):
+        topo = line()
+        policy = nc.nary_policy_union([forward(1, 11, 2, ['a']),
+                                       forward(2, 1, 3),
+                                       forward(3, 2, 13, ['b'])])
+        packet = nc.Packet({'vlan': 0})
+        result = netsim.Simulator(topo, policy).inject(11, packet)
+        self.assertEqual({13: set([packet])}, result.delivered)
+        self.assertEqual(set(['a', 'b']), result.observations)
+        self.assertEqual([], result.loops)
+        self.assertEqual(set([13]), netsim.reachable(topo, policy, 11, packet))
+
+    def test_drop_and_exit(self):
+        topo = line()
+        policy = (forward(1, 11, 2) + forward(2, 1, 7))
+        packet = nc.Packet({'vlan': 0})
+        result = netsim.Simulator(topo, policy).inject(11, packet)
+        self.assertEqual({}, result.delivered)
+        self.assertEqual(set([(packet, (2, 7))]), result.exits)
+
+        policy = forward(1, 11, 2)
+        result = netsim.Simulator(topo, policy).inject(11, packet)
+        self.assertEqual(set([(packet, (2, 1))]), result.dropped)
+
+    def test_modify(self):
+        topo = line()
+        tagged = nc.Packet({'vlan': 1})
+        policy = nc.nary_policy_union([
+                   inport(1, 11) |then| nc.Action(1, [2], {'vlan': 1}),
+                   (inport(2, 1) & nc.Header({'vlan': 1})) |then|
+                       nc.Action(2, [3], {'vlan': 0}),
+                   forward(3, 2, 13)])
+        result = netsim.Simulator(topo, policy).inject(
+                     11, nc.Packet({'vlan': 0}))
+        self.assertEqual(set([13]), result.hosts())
+        result = netsim.Simulator(topo, policy, ttl=1).inject(
+                     11, nc.Packet({'vlan': 0}))
+        self.assertEqual(set([(tagged, (2, 1))]), result.expired)
+
+    def test_loop(self):
+        topo = line()
+        policy = nc.nary_policy_union([forward(1, 11, 2), forward(2, 1, 3),
+                                       forward(3, 2, 2), forward(2, 3, 1),
+                                       forward(1, 2, 2)])
+        packet = nc.Packet({'vlan': 0})
+        result = netsim.Simulator(topo, policy).inject(11, packet)
+        self.assertEqual(1, len(result.loops))
+        self.assertEqual(set([(packet, (2, 1)), (packet, (3, 2)),
+                              (packet, (2, 3)), (packet, (1, 2))]),
+                         set(result.loops[0]))
+        self.assertEqual(set(), result.expired)
+
+    def test_ttl(self):
+        topo = line()
+        policy = nc.nary_policy_union([forward(1, 11, 2), forward(2, 1, 3),
+                                       forward(3, 2, 13)])
+        packet = nc.Packet({'vlan': 0})
+        result = netsim.Simulator(topo, policy, ttl=2).inject(11, packet)
+        self.assertEqual({}, result.delivered)
+        self.assertEqual(set([(packet, (3, 2))]), result.expired)
+
+    def test_staggered_ttl(self):
+        topo = line()
+        policy = nc.nary_policy_union([forward(1, 11, 2), forward(2, 1, 3),
+                                       forward(3, 2, 13)])
+        first = nc.Packet({'vlan': 0})
+        late = nc.Packet({'vlan': 1})
+        simulator = netsim.Simulator(topo, policy, ttl=3)
+        # Each packet is counted from its own start, not by how far the
+        # other packets have got
+        result = simulator.run([(first, (1, 11)), (late, (2, 1))],
+                               hops={(late, (2, 1)): 1})
+        self.assertEqual({13: set([first, late])}, result.delivered)
+        self.assertEqual(set(), result.expired)
+        result = simulator.run([(first, (1, 11)), (late, (2, 1))],
+                               hops={(late, (2, 1)): 2})
+        self.assertEqual({13: set([first])}, result.delivered)
+        self.assertEqual(set([(late, (3, 2))]), result.expired)
+        # A packet that expired is followed again when it is reached in
+        # fewer hops
+        result = simulator.run([(first, (3, 2)), (first, (1, 11))],
+                               hops={(first, (3, 2)): 3})
+        self.assertEqual({13: set([first])}, result.delivered)
+        self.assertEqual(set(), result.expired)
+
+if __name__ == '__main__':
+    unittest.main()
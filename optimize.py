@@ -28,14 +28,33 @@
 # /slices/optimize.py                                                          #
 # VLAN reduction optimizations                                                 #
 ################################################################################
-"""Tools to calculate the minimium assignment of vlans to slices."""
+"""Tools to calculate the minimium assignment of vlans to slices.
 
-import Numberjack as nj
-import MiniSat
+assign_vlans and assign_n_vlans need Numberjack and its MiniSat backend.
+assign_vlans_anytime does not, unless asked to use them.
+"""
+
+import random
+import time
+import util
+import vlan as vl
+
+# Numberjack is hard to install, so only the functions that use it need it
+try:
+    import Numberjack as nj
+    import MiniSat
+except ImportError:
+    nj = None
+    MiniSat = None
 
 MAX_VLAN = 255
 MIN_VLAN = 1
 
+def require_numberjack():
+    """Raise ImportError if Numberjack or MiniSat is missing."""
+    if nj is None or MiniSat is None:
+        raise ImportError('Numberjack and MiniSat are needed for this solver')
+
 def assign_vlans(slices, conflicts):
     """Assign vlans to slices minimizing the number of tags used.
 
@@ -47,10 +66,103 @@ def assign_vlans(slices, conflicts):
     RETURNS:
         {slice: vlan_tag}
 
-    At present, uses the one-vlan-per-slice method via graph coloring.  For
-    efficiency, we force vlan numbers to be at most len(slices), since
-    n-coloring a graph with n vertices is guaranteed to be possible.
+    At present, uses the one-vlan-per-slice method via graph coloring.  The
+    model is kept small and free of symmetric solutions:
+
+    * vlans are bounded by the number a DSatur coloring uses, and if that
+      is the size of the clique below, the DSatur coloring is returned as is,
+      without needing Numberjack
+    * the slices of a clique in the conflict graph are fixed to 1, 2, ...
+    * value precedence: with slices in order (clique first, then by DSatur
+      color), each slice's vlan is at most one more than the largest before
+      it, tracked by running maximum variables, so renamings of a coloring are
+      excluded
+    * the number of tags used is then just the last running maximum, which is
+      minimised
+
+    _model_admits states the same constraints in plain Python, so that the
+    tests can check, without Numberjack, that they keep an optimal coloring.
+
+    assign_vlans_basic is the previous encoding, for comparison.
     """
+    if len(slices) == 0:
+        return {}
+    greedy, clique, order, max_vlan = _model_order(slices, conflicts)
+    if len(clique) > max_vlan:
+        return None
+    elif len(clique) == max(greedy.values()):
+        # The greedy coloring is already optimal
+        return dict((s, c + MIN_VLAN - 1) for s, c in greedy.items())
+    require_numberjack()
+
+    vlan_vars = nj.VarArray(len(order), MIN_VLAN, max_vlan)
+    vlans = dict(zip(order, vlan_vars))
+    # running_max[i] is the largest vlan among the first i + 1 slices
+    running_max = nj.VarArray(len(order), MIN_VLAN, max_vlan)
+    constraints = []
+    for (s1, s2) in conflicts:
+        constraints.append(vlans[s1] != vlans[s2])
+    for i, slic in enumerate(clique):
+        constraints.append(vlans[slic] == MIN_VLAN + i)
+    constraints.append(running_max[0] == vlan_vars[0])
+    for i in range(1, len(order)):
+        constraints.append(vlan_vars[i] <= running_max[i - 1] + 1)
+        constraints.append(running_max[i] ==
+                           nj.Max([running_max[i - 1], vlan_vars[i]]))
+    constraints.append(nj.Minimise(running_max[len(order) - 1]))
+    model = nj.Model(constraints)
+    solver = MiniSat.Solver(model)
+    if solver.solve():
+        return dict([(k, v.get_value()) for k, v in vlans.items()])
+    else:
+        return None
+
+def _model_order(slices, conflicts):
+    """Return (greedy, clique, order, max_vlan) for the assign_vlans model.
+
+    greedy is a DSatur coloring, clique a clique of the conflict graph, order
+    the slices in the order of the value precedence constraints, and max_vlan
+    the largest vlan the model allows.
+    """
+    greedy, _ = vl.color_graph(slices, conflicts)
+    max_vlan = min(MAX_VLAN, max(greedy.values()))
+    adjacency = dict((s, set()) for s in slices)
+    for (s1, s2) in conflicts:
+        adjacency[s1].add(s2)
+        adjacency[s2].add(s1)
+    clique = vl.greedy_clique(slices, adjacency)
+    in_clique = set(clique)
+    rest = sorted([s for s in slices if s not in in_clique],
+                  key=lambda s: (greedy[s], -len(adjacency[s])))
+    return greedy, clique, clique + rest, max_vlan
+
+def _model_admits(conflicts, clique, order, max_vlan, vlans):
+    """Does {slice: vlan} satisfy the constraints of the assign_vlans model?
+
+    The same constraints as the Numberjack model, in plain Python, so they can
+    be checked without Numberjack.  Keep the two in step.
+    """
+    if any(not MIN_VLAN <= vlans[s] <= max_vlan for s in order):
+        return False
+    if any(vlans[s1] == vlans[s2] for (s1, s2) in conflicts):
+        return False
+    if any(vlans[s] != MIN_VLAN + i for i, s in enumerate(clique)):
+        return False
+    running_max = vlans[order[0]]
+    for s in order[1:]:
+        if vlans[s] > running_max + 1:
+            return False
+        running_max = max(running_max, vlans[s])
+    return True
+
+def assign_vlans_basic(slices, conflicts):
+    """Assign vlans to slices minimizing the number of tags used.
+
+    The original encoding of assign_vlans: every vlan up to len(slices) is
+    allowed for every slice, and the objective sums, for each vlan, whether
+    any slice uses it.  Kept to benchmark against.
+    """
+    require_numberjack()
     max_vlan = min(MAX_VLAN, len(slices))
     vlan_vars = nj.VarArray(len(slices), MIN_VLAN, max_vlan)
     vlans = dict(zip(slices, vlan_vars))
@@ -78,10 +190,79 @@ def assign_vlans(slices, conflicts):
     else:
         return None
 
-def assign_n_vlans(n, slices, conflicts):
-    """Assign at most n vlans to slices, or return None.
+def conflict_components(slices, conflicts):
+    """Split slices into the connected components of the conflict graph.
 
-    Does not try to optimize, just tries to meet the constraint."""
+    RETURNS:
+        [(component slices, component conflicts)], with slices and conflicts
+        in their original relative order
+    """
+    # Union-find over slice indices
+    index = dict((s, i) for i, s in enumerate(slices))
+    parent = range(len(slices))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for (s1, s2) in conflicts:
+        r1 = find(index[s1])
+        r2 = find(index[s2])
+        if r1 != r2:
+            parent[max(r1, r2)] = min(r1, r2)
+    components = {}
+    roots = []
+    for i, slic in enumerate(slices):
+        root = find(i)
+        if root not in components:
+            components[root] = ([], [])
+            roots.append(root)
+        components[root][0].append(slic)
+    for (s1, s2) in conflicts:
+        components[find(index[s1])][1].append((s1, s2))
+    return [components[root] for root in roots]
+
+def assign_vlans_by_component(slices, conflicts, assigner=None, processes=1):
+    """Assign vlans to each connected component of the conflicts separately.
+
+    Slices in different components never conflict, so they can reuse the same
+    vlans, and the number of vlans used is the largest number any component
+    needs.  Slices without conflicts get MIN_VLAN without calling assigner.
+
+    ARGS:
+        slices:  a list of slices
+        conflicts:  pairs of slices that must get different vlans
+        assigner:  function of (slices, conflicts) returning {slice: vlan} or
+            None, defaults to assign_vlans
+        processes:  number of processes to solve components in, see
+            util.fork_map
+
+    RETURNS:
+        {slice: vlan}, or None if the assigner fails on some component
+    """
+    if assigner is None:
+        assigner = assign_vlans
+    components = conflict_components(slices, conflicts)
+    solved = dict((c[0][0], MIN_VLAN) for c in components if not c[1])
+    components = [c for c in components if c[1]]
+    # Largest first, so workers finish together
+    components.sort(key=lambda c: -len(c[0]))
+    def solve((component, component_conflicts)):
+        # Return vlans in component order, since the slices themselves would
+        # come back from another process as copies
+        vlans = assigner(component, component_conflicts)
+        if vlans is None:
+            return None
+        return [vlans[s] for s in component]
+    results = util.fork_map(solve, components, processes)
+    for (component, _), vlans in zip(components, results):
+        if vlans is None:
+            return None
+        solved.update(zip(component, vlans))
+    return solved
+
+def _n_vlans_model(n, slices, conflicts):
+    """Return (model, {slice: variable}) for assigning at most n vlans."""
     max_vlan = min(MAX_VLAN, n)
     vlan_vars = nj.VarArray(len(slices), MIN_VLAN, max_vlan)
     vlans = dict(zip(slices, vlan_vars))
@@ -89,13 +270,163 @@ def assign_n_vlans(n, slices, conflicts):
     # Build color constraints
     for (s1, s2) in conflicts:
         constraints.append(vlans[s1] != vlans[s2])
-    model = nj.Model(constraints)
+    return nj.Model(constraints), vlans
+
+def assign_n_vlans(n, slices, conflicts):
+    """Assign at most n vlans to slices, or return None.
+
+    Does not try to optimize, just tries to meet the constraint."""
+    require_numberjack()
+    model, vlans = _n_vlans_model(n, slices, conflicts)
     solver = MiniSat.Solver(model)
     if solver.solve():
         return dict([(k, v.get_value()) for k, v in vlans.items()])
     else:
         return None
 
+def assign_vlans_anytime(slices, conflicts, budget, engine='tabu',
+                         max_backtracks=1000, seed=0):
+    """Assign vlans to slices, using few tags, within a time budget.
+
+    Starts from a DSatur coloring (see vlan.color_graph), then repeatedly tries
+    to find a coloring with one tag fewer until the budget runs out or the
+    coloring is proven optimal, and returns the best coloring found.
+
+    ARGS:
+        slices:  a list of slices
+        conflicts:  pairs of slices that must get different vlans
+        budget:  wall-clock seconds to spend improving the first coloring
+        engine:  'tabu' for TabuCol local search, or 'numberjack' to solve the
+            assign_n_vlans model with MiniSat under a time limit, which can
+            also prove a tag count impossible
+        max_backtracks:  backtracking budget for the first coloring
+        seed:  random seed for the local search
+
+    RETURNS:
+        ({slice: vlan}, lower_bound) where lower_bound is a proven lower bound
+        on the number of vlans needed.  The assignment is optimal if it uses
+        lower_bound vlans.
+
+    Raises vlan.VlanException if the best coloring found needs tags above
+    MAX_VLAN.
+    """
+    deadline = time.time() + budget
+    colors, lower_bound = vl.color_graph(slices, conflicts, max_backtracks)
+    used = max(colors.values()) if colors else 0
+    if engine == 'numberjack':
+        require_numberjack()
+    elif engine != 'tabu':
+        raise ValueError('unknown engine %s' % engine)
+    rng = random.Random(seed)
+    while used > lower_bound and time.time() < deadline:
+        if engine == 'tabu':
+            better = _tabucol(slices, conflicts, colors, used - 1, deadline,
+                              rng)
+        else:
+            if deadline - time.time() < 1:
+                # MiniSat cannot stop any sooner than in a second
+                break
+            better, impossible = _numberjack_k(slices, conflicts, used - 1,
+                                               deadline - time.time())
+            if impossible:
+                lower_bound = used
+        if better is None:
+            break
+        colors = better
+        used = max(colors.values())
+    if used + MIN_VLAN - 1 > MAX_VLAN:
+        raise vl.VlanException('Could not assign vlan tags - %d needed' % used)
+    return (dict((s, c + MIN_VLAN - 1) for s, c in colors.items()),
+            lower_bound)
+
+def _numberjack_k(slices, conflicts, k, seconds):
+    """Look for a k-coloring with MiniSat for at most seconds.
+
+    RETURNS: ({slice: color} or None, whether k colors are proven impossible)
+    """
+    model, vlans = _n_vlans_model(k, slices, conflicts)
+    solver = MiniSat.Solver(model)
+    # MiniSat takes whole seconds, so callers stop with less than one left
+    solver.setTimeLimit(int(seconds))
+    if solver.solve():
+        return (dict([(s, v.get_value() - MIN_VLAN + 1)
+                      for s, v in vlans.items()]), False)
+    else:
+        return None, solver.is_unsat()
+
+def _tabucol(nodes, conflicts, colors, k, deadline, rng, check_every=100):
+    """TabuCol local search for a coloring of nodes with colors 1..k.
+
+    Starts from colors, moving nodes colored above k to their least
+    conflicting color, then repeatedly recolors a conflicting node, avoiding
+    recently undone moves, until there are no conflicts or the deadline.
+
+    RETURNS: {node: color} or None
+    """
+    n = len(nodes)
+    index = dict((node, i) for i, node in enumerate(nodes))
+    adjacency = [set() for _ in nodes]
+    for (n1, n2) in conflicts:
+        if n1 != n2:
+            adjacency[index[n1]].add(index[n2])
+            adjacency[index[n2]].add(index[n1])
+    adjacency = [list(a) for a in adjacency]
+
+    color = [colors[node] - 1 for node in nodes]
+    # gamma[v][c] is the number of neighbors of v colored c
+    gamma = [[0] * (k + 1) for _ in nodes]
+    for v in range(n):
+        for u in adjacency[v]:
+            gamma[v][color[u]] += 1
+    for v in range(n):
+        if color[v] >= k:
+            best = min(range(k), key=lambda c: gamma[v][c])
+            for u in adjacency[v]:
+                gamma[u][color[v]] -= 1
+                gamma[u][best] += 1
+            color[v] = best
+    # Conflicting edges are counted from both ends
+    total = sum(gamma[v][color[v]] for v in range(n)) / 2
+
+    # tabu[v][c] is the iteration until which moving v back to c is forbidden
+    tabu = [[0] * k for _ in nodes]
+    best_total = total
+    iteration = 0
+    while total > 0:
+        iteration += 1
+        if iteration % check_every == 0 and time.time() >= deadline:
+            return None
+        best_delta = None
+        moves = []
+        for v in range(n):
+            current = gamma[v][color[v]]
+            if current == 0:
+                continue
+            for c in range(k):
+                if c == color[v]:
+                    continue
+                delta = gamma[v][c] - current
+                if (tabu[v][c] > iteration and
+                        total + delta >= best_total):
+                    continue
+                if best_delta is None or delta < best_delta:
+                    best_delta = delta
+                    moves = [(v, c)]
+                elif delta == best_delta:
+                    moves.append((v, c))
+        if not moves:
+            continue
+        v, c = rng.choice(moves)
+        old = color[v]
+        for u in adjacency[v]:
+            gamma[u][old] -= 1
+            gamma[u][c] += 1
+        color[v] = c
+        total += best_delta
+        tabu[v][old] = iteration + int(0.6 * total) + rng.randint(1, 10)
+        best_total = min(best_total, total)
+    return dict((node, color[i] + 1) for i, node in enumerate(nodes))
+
 def main():
     slices = [1, 2, 3, 4]
     # Graph is 3 colorable
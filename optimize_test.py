@@ -0,0 +1,166 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+################################################################################
+# /slices/optimize_test.py                                                     #
+# Tests for optimize.py, which assigns vlans to slices                         #
+################################################################################
+
+import itertools
+import optimize
+import random
+import time
+import unittest
+import vlan
+
+def random_graph(n, m, seed):
+    rng = random.Random(seed)
+    conflicts = set()
+    while len(conflicts) < m:
+        i, j = rng.randrange(n), rng.randrange(n)
+        if i < j:
+            conflicts.add((i, j))
+    return range(n), sorted(conflicts)
+
+class TestComponents(unittest.TestCase):
+    def test_components(self):
+        slices = range(7)
+        conflicts = [(0, 3), (4, 5), (3, 6), (5, 1)]
+        self.assertEqual([([0, 3, 6], [(0, 3), (3, 6)]),
+                          ([1, 4, 5], [(4, 5), (5, 1)]),
+                          ([2], [])],
+                         optimize.conflict_components(slices, conflicts))
+
+    def test_by_component(self):
+        # Two triangles, and a slice without conflicts
+        slices = range(7)
+        conflicts = [(0, 1), (1, 2), (0, 2), (3, 4), (4, 5), (3, 5)]
+        assigner = lambda s, c: optimize.assign_vlans_anytime(s, c, 1)[0]
+        for processes in [1, 2]:
+            vlans = optimize.assign_vlans_by_component(slices, conflicts,
+                                                       assigner, processes)
+            self.assertItemsEqual(slices, vlans.keys())
+            for (s1, s2) in conflicts:
+                self.assertNotEqual(vlans[s1], vlans[s2])
+            self.assertEqual(3, len(set(vlans.values())))
+            self.assertEqual(optimize.MIN_VLAN, vlans[6])
+
+    def test_failed_component(self):
+        self.assertIsNone(optimize.assign_vlans_by_component(
+            [1, 2], [(1, 2)], lambda s, c: None))
+
+def chromatic_number(nodes, conflicts):
+    for k in itertools.count(1):
+        for colors in itertools.product(range(k), repeat=len(nodes)):
+            coloring = dict(zip(nodes, colors))
+            if all(coloring[n1] != coloring[n2] for (n1, n2) in conflicts):
+                return k
+
+class TestModel(unittest.TestCase):
+    def test_model_keeps_an_optimum(self):
+        # Enumerate the assignments the assign_vlans model allows on small
+        # graphs: the symmetry breaking must leave an optimal one, and
+        # nothing that is not a coloring.
+        def cycle(n):
+            return [(i, (i + 1) % n) for i in range(n)]
+        # Odd cycles and a wheel, whose cliques are smaller than an optimum
+        graphs = [(range(5), cycle(5)), (range(7), cycle(7)),
+                  (range(6), cycle(5) + [(i, 5) for i in range(5)])]
+        graphs += [random_graph(7, 12, seed) for seed in range(60)]
+        tested = 0
+        for slices, conflicts in graphs:
+            greedy, clique, order, max_vlan = optimize._model_order(
+                slices, conflicts)
+            if len(clique) == max(greedy.values()):
+                # assign_vlans returns greedy without the model
+                continue
+            tested += 1
+            best = None
+            values = range(optimize.MIN_VLAN, max_vlan + 1)
+            for vlans in itertools.product(values, repeat=len(order)):
+                vlans = dict(zip(order, vlans))
+                if optimize._model_admits(conflicts, clique, order, max_vlan,
+                                          vlans):
+                    for (s1, s2) in conflicts:
+                        self.assertNotEqual(vlans[s1], vlans[s2])
+                    used = len(set(vlans.values()))
+                    if best is None or used < best:
+                        best = used
+            self.assertEqual(chromatic_number(slices, conflicts), best)
+        self.assertTrue(tested >= 5)
+
+class TestAnytime(unittest.TestCase):
+    def assertAssignment(self, slices, conflicts, vlans):
+        self.assertItemsEqual(slices, vlans.keys())
+        for (s1, s2) in conflicts:
+            self.assertNotEqual(vlans[s1], vlans[s2])
+        for v in vlans.values():
+            self.assertTrue(optimize.MIN_VLAN <= v <= optimize.MAX_VLAN)
+
+    def test_small(self):
+        slices = [1, 2, 3, 4]
+        conflicts = [(1, 2), (1, 3), (1, 4), (2, 3), (3, 4)]
+        vlans, lower_bound = optimize.assign_vlans_anytime(slices, conflicts,
+                                                           1)
+        self.assertAssignment(slices, conflicts, vlans)
+        self.assertEqual(3, len(set(vlans.values())))
+        self.assertEqual(3, lower_bound)
+
+    def test_budget(self):
+        slices, conflicts = random_graph(200, 2000, 0)
+        vlans, lower_bound = optimize.assign_vlans_anytime(slices, conflicts,
+                                                           0)
+        self.assertAssignment(slices, conflicts, vlans)
+        self.assertTrue(lower_bound <= len(set(vlans.values())))
+
+    def test_deadline(self):
+        slices, conflicts = random_graph(300, 6000, 2)
+        start = time.time()
+        vlans, _ = optimize.assign_vlans_anytime(slices, conflicts, 0.5)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertAssignment(slices, conflicts, vlans)
+
+    def test_tabu_improves(self):
+        slices, conflicts = random_graph(150, 1500, 1)
+        first, _ = optimize.assign_vlans_anytime(slices, conflicts, 0)
+        vlans, lower_bound = optimize.assign_vlans_anytime(slices, conflicts,
+                                                           2)
+        self.assertAssignment(slices, conflicts, vlans)
+        self.assertTrue(len(set(vlans.values())) <= len(set(first.values())))
+        self.assertTrue(lower_bound <= len(set(vlans.values())))
+
+    def test_too_many_vlans(self):
+        slices = range(optimize.MAX_VLAN + 1)
+        conflicts = [(s1, s2) for s1 in slices for s2 in slices if s1 < s2]
+        self.assertRaises(vlan.VlanException, optimize.assign_vlans_anytime,
+                          slices, conflicts, 0)
+
+    def test_unknown_engine(self):
+        self.assertRaises(ValueError, optimize.assign_vlans_anytime,
+                          [1, 2], [(1, 2)], 1, engine='magic')
+
+if __name__ == '__main__':
+    unittest.main()
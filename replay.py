@@ -0,0 +1,207 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+# /slices/replay.py                                                            #
+# Streaming replay of packet traces                                            #
+################################################################################
+"""Replay packet traces through a policy and its physical counterpart.
+
+Traces are read lazily, as generators of (packet, (switch, port)), from CSV
+files with a header row naming the fields, or from binary files of
+little-endian int64 records.  A binary record is a bitmask of the fields the
+packet has, bit i standing for netcore.HEADERS[i + 2], followed by one value
+per field in netcore.HEADERS, with 0 for fields the packet does not have.
+diff replays a trace through a logical policy and the physical policy it was
+compiled to, a chunk at a time, and yields only the packets they treat
+differently, so memory stays flat however long the trace is.  Each chunk is
+simulated as one packet array with batch.simulate_batch, or, without NumPy, a
+packet at a time with a classifier.Classifier.
+"""
+
+import csv
+import itertools
+import struct
+import batch
+import classifier
+import netcore as nc
+from netcore import HEADERS
+
+RECORD = struct.Struct('<%dq' % (len(HEADERS) + 1))
+
+def read_csv(trace):
+    """Yield the located packets in a CSV trace file object.
+
+    The first row names the columns, which must include switch and port.
+    Empty cells are fields the packet does not have.
+    """
+    reader = csv.reader(trace)
+    columns = reader.next()
+    for row in reader:
+        fields = {}
+        for f, v in zip(columns, row):
+            if v != '':
+                fields[f] = int(v)
+        switch = fields.pop('switch')
+        port = fields.pop('port')
+        yield (nc.Packet(fields), (switch, port))
+
+def write_csv(located_packets, trace):
+    """Write located packets to a CSV trace file object."""
+    writer = csv.writer(trace)
+    writer.writerow(HEADERS)
+    for packet, (switch, port) in located_packets:
+        fields = dict(packet.items())
+        fields['switch'] = switch
+        fields['port'] = port
+        writer.writerow([fields.get(f, '') for f in HEADERS])
+
+def read_binary(trace, chunksize=4096):
+    """Yield the located packets in a binary trace file object.
+
+    Reads may return less than asked for, as from a pipe or socket, and a
+    record split between reads is joined up.
+    """
+    leftover = ''
+    while True:
+        data = trace.read(RECORD.size * chunksize)
+        if not data:
+            if leftover:
+                raise Exception('truncated trace record')
+            break
+        data = leftover + data
+        end = len(data) - len(data) % RECORD.size
+        leftover = data[end:]
+        for offset in xrange(0, end, RECORD.size):
+            values = RECORD.unpack_from(data, offset)
+            present = values[0]
+            fields = {}
+            for i, (f, v) in enumerate(zip(HEADERS[2:], values[3:])):
+                if present & (1 << i):
+                    fields[f] = v
+            yield (nc.Packet(fields), (values[1], values[2]))
+
+def write_binary(located_packets, trace):
+    """Write located packets to a binary trace file object."""
+    for packet, (switch, port) in located_packets:
+        fields = dict(packet.items())
+        present = 0
+        for i, f in enumerate(HEADERS[2:]):
+            if f in fields:
+                present |= 1 << i
+        fields['switch'] = switch
+        fields['port'] = port
+        trace.write(RECORD.pack(present, *[fields.get(f, 0) for f in HEADERS]))
+
+def chunks(iterable, size):
+    """Yield lists of up to size consecutive items of iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            break
+        yield chunk
+
+def physical_location((switch, port), switch_map, port_map):
+    """Map a logical location to a physical one.
+
+    Port 0 is an end host, and is not mapped unless port_map says so, as in
+    Header.get_physical_predicate.  Raises netcore.PhysicalException for
+    locations the maps do not cover.
+    """
+    if (switch, port) in port_map:
+        return port_map[(switch, port)]
+    elif port == 0 and switch in switch_map:
+        return (switch_map[switch], port)
+    else:
+        raise nc.PhysicalException('no physical location for switch %s port %s'
+                                   % (switch, port))
+
+def _simulator(policy):
+    """Return a function simulating policy on a list of located packets.
+
+    The function returns a list with the (located packets, observations) of
+    each packet, as netcore.simulate returns.
+    """
+    if batch.np is None:
+        cls = classifier.Classifier(policy)
+        return lambda chunk: [cls.simulate(packet, loc)
+                              for packet, loc in chunk]
+
+    def simulate(chunk):
+        index, out, observations = batch.simulate_batch(policy,
+                                                        batch.to_array(chunk))
+        results = [(set(), set()) for _ in chunk]
+        for i, located in zip(index, batch.from_array(out)):
+            results[i][0].add(located)
+        for obs, rows in observations.iteritems():
+            for i in rows:
+                results[i][1].add(obs)
+        return results
+    return simulate
+
+def _strip(packet, ignore):
+    """Return packet without the fields in ignore."""
+    if not ignore:
+        return packet
+    return nc.Packet(dict((f, v) for f, v in packet.items()
+                          if f not in ignore))
+
+def diff(located_packets, logical, physical, switch_map, port_map,
+         chunksize=1024, ignore=()):
+    """Yield the packets logical and physical treat differently.
+
+    ARGS:
+        located_packets:  iterable of logical (packet, (switch, port))
+        logical:  logical policy
+        physical:  physical policy, for instance
+            logical.get_physical_rep(switch_map, port_map) or a compiled slice
+        switch_map:  {l_switch: p_switch}
+        port_map:  {(l_switch, l_port): (p_switch, p_port)}
+        chunksize:  number of packets to read from the trace at a time
+        ignore:  fields to leave out when comparing packets, for instance
+            vlan when comparing against a sliced network
+
+    YIELDS:
+        (packet, loc, expected, actual) where loc is logical, and expected and
+        actual are physical (located packets, observations), as
+        netcore.simulate returns.  expected is what logical does, mapped to
+        the physical network.
+    """
+    simulate_logical = _simulator(logical)
+    simulate_physical = _simulator(physical)
+    for chunk in chunks(located_packets, chunksize):
+        p_chunk = [(packet, physical_location(loc, switch_map, port_map))
+                   for packet, loc in chunk]
+        logical_results = simulate_logical(chunk)
+        physical_results = simulate_physical(p_chunk)
+        for (packet, loc), (l_outputs, l_obs), (p_outputs, p_obs) in zip(
+                chunk, logical_results, physical_results):
+            expected = (set((_strip(p, ignore),
+                             physical_location(l, switch_map, port_map))
+                            for p, l in l_outputs), l_obs)
+            actual = (set((_strip(p, ignore), l) for p, l in p_outputs), p_obs)
+            if expected != actual:
+                yield (packet, loc, expected, actual)
@@ -0,0 +1,165 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+################################################################################
+# /slices/replay_test.py                                                       #
+# Tests for replay, streaming packet-trace replay                              #
+################################################################################
+import itertools
+import StringIO
+import replay
+import netcore as nc
+from netcore import inport, then
+import unittest
+
+switch_map = {1: 100, 2: 200}
+port_map = {(1, 1): (100, 10), (1, 2): (100, 20),
+            (2, 1): (200, 10), (2, 2): (200, 20)}
+
+logical = nc.nary_policy_union([
+            (inport(1, 1) & nc.Header({'srcmac': 1})) |then|
+                nc.Action(1, [2], {'vlan': 3}, obs=['a']),
+            inport(2, 1) |then| nc.Action(2, [2]),
+            nc.Header({'srcmac': 2}) |then| nc.Action(2, [1])])
+
+def trace():
+    for srcmac in range(4):
+        for switch in [1, 2]:
+            for port in [0, 1, 2]:
+                yield (nc.Packet({'srcmac': srcmac, 'vlan': 0}),
+                       (switch, port))
+
+class TestReplay(unittest.TestCase):
+    def test_csv(self):
+        located = list(trace()) + [(nc.Packet({}), (1, 1))]
+        buf = StringIO.StringIO()
+        replay.write_csv(located, buf)
+        buf.seek(0)
+        self.assertEqual(located, list(replay.read_csv(buf)))
+
+    def test_binary(self):
+        located = list(trace()) + [(nc.Packet({}), (1, 1))]
+        buf = StringIO.StringIO()
+        replay.write_binary(located, buf)
+        self.assertEqual(len(located) * replay.RECORD.size, len(buf.getvalue()))
+        buf.seek(0)
+        self.assertEqual(located, list(replay.read_binary(buf, chunksize=5)))
+
+    def test_binary_missing(self):
+        # -1 is a value like any other, not a missing field
+        located = [(nc.Packet({'srcmac': -1}), (1, 1)),
+                   (nc.Packet({'dstmac': 0}), (1, 1)),
+                   (nc.Packet({}), (1, 1))]
+        buf = StringIO.StringIO()
+        replay.write_binary(located, buf)
+        buf.seek(0)
+        self.assertEqual(located, list(replay.read_binary(buf)))
+
+    def test_physical_location(self):
+        self.assertEqual((100, 10),
+                         replay.physical_location((1, 1), switch_map, port_map))
+        self.assertEqual((200, 0),
+                         replay.physical_location((2, 0), switch_map, port_map))
+        self.assertRaises(nc.PhysicalException, replay.physical_location,
+                          (1, 3), switch_map, port_map)
+        self.assertRaises(nc.PhysicalException, replay.physical_location,
+                          (3, 0), switch_map, port_map)
+
+    def test_short_reads(self):
+        # A pipe may return part of a record
+        class Pipe(object):
+            def __init__(self, data):
+                self.data = data
+            def read(self, size):
+                data, self.data = self.data[:7], self.data[7:]
+                return data
+        located = list(trace())
+        buf = StringIO.StringIO()
+        replay.write_binary(located, buf)
+        pipe = Pipe(buf.getvalue())
+        self.assertEqual(located, list(replay.read_binary(pipe, chunksize=2)))
+        pipe = Pipe(buf.getvalue()[:-1])
+        self.assertRaises(Exception, list, replay.read_binary(pipe))
+
+    def test_chunks(self):
+        self.assertEqual([[0, 1], [2, 3], [4]],
+                         list(replay.chunks(range(5), 2)))
+
+    def test_no_diff(self):
+        physical = logical.get_physical_rep(switch_map, port_map)
+        self.assertEqual([], list(replay.diff(trace(), logical, physical,
+                                              switch_map, port_map,
+                                              chunksize=7)))
+
+    def test_diff(self):
+        physical = logical.get_physical_rep(switch_map, port_map)
+        physical = physical + (nc.Header({'srcmac': 3}) |then|
+                               nc.Action(200, [10]))
+        diffs = list(replay.diff(trace(), logical, physical, switch_map,
+                                 port_map, chunksize=7))
+        self.assertEqual(3, len(diffs))
+        for packet, (switch, port), expected, actual in diffs:
+            self.assertEqual(3, packet['srcmac'])
+            self.assertEqual(2, switch)
+            self.assertEqual(set([(packet, (200, 10))]),
+                             actual[0] - expected[0])
+
+    def test_ignore(self):
+        # Tags vlan 4 instead of 3
+        physical = nc.nary_policy_union([
+                     (inport(100, 10) & nc.Header({'srcmac': 1})) |then|
+                         nc.Action(100, [20], {'vlan': 4}, obs=['a']),
+                     inport(200, 10) |then| nc.Action(200, [20]),
+                     nc.Header({'srcmac': 2}) |then| nc.Action(200, [10])])
+        self.assertNotEqual([], list(replay.diff(trace(), logical, physical,
+                                                 switch_map, port_map)))
+        self.assertEqual([], list(replay.diff(trace(), logical, physical,
+                                              switch_map, port_map,
+                                              ignore=['vlan'])))
+
+    def test_without_numpy(self):
+        physical = logical.get_physical_rep(switch_map, port_map)
+        physical = physical + (nc.Header({'srcmac': 3}) |then|
+                               nc.Action(200, [10]))
+        expected = list(replay.diff(trace(), logical, physical, switch_map,
+                                    port_map))
+        np, replay.batch.np = replay.batch.np, None
+        try:
+            self.assertEqual(expected,
+                             list(replay.diff(trace(), logical, physical,
+                                              switch_map, port_map)))
+        finally:
+            replay.batch.np = np
+
+    def test_streaming(self):
+        # An endless trace still yields its differences as it goes
+        endless = itertools.cycle(trace())
+        diffs = replay.diff(endless, logical, nc.BottomPolicy(), switch_map,
+                            port_map, chunksize=10)
+        self.assertEqual(5, len(list(itertools.islice(diffs, 5))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,7 +36,7 @@ No observations yet.
 """
 
 from z3.z3 import And, Or, Not, Implies, Function, ForAll
-from z3.z3 import Const, Consts, Solver, unsat, set_option, Int, Ints
+from z3.z3 import Const, Consts, Solver, unsat, set_option, Int, Ints, Bool
 from netcore import HEADERS
 import netcore as nc
 
@@ -49,6 +49,7 @@ from sat_core import HEADER_INDEX, Packet, switch, port, vlan
 from sat_core import forwards, forwards_with, observes, observes_with
 from sat_core import input, output, ingress, egress
 from sat_core import external_link, edges_ingress, on_valid_port
+from sat_core import scoped
 from verification import disjoint_observations
 
 def transfer(topo, p_out, p_in):
@@ -91,6 +92,7 @@ def explain(model, packet, headers):
     return properties
 
 # TODO(astory): make sure this is rigorous.  I think it might have holes in it.
+@scoped
 def equivalent(policy1, policy2):
     """Determine if policy1 is equivalent to policy2 under equality.
 
@@ -119,6 +121,7 @@ def equivalent(policy1, policy2):
         return (s.model(), (p1_in, p1_out, p2_in, p2_out1, p2_out2),
                 HEADER_INDEX)
 
+@scoped
 def not_empty(policy):
     """Determine if there are any packets that the policy forwards.
 
@@ -134,6 +137,7 @@ def not_empty(policy):
     else:
         return (s.model(), (p_in, p_out), HEADER_INDEX)
 
+@scoped
 def compiled_correctly(topo, orig, result, edge_policy={}):
     """Determine if result is a valid compilation of orig.
 
@@ -148,6 +152,7 @@ def compiled_correctly(topo, orig, result, edge_policy={}):
             simulates(topo, result, orig) and
             one_per_edge(topo, result) is None)
 
+@scoped
 def simulates(topo, a, b, field='vlan', edge_policy={}):
     """Determine if b simulates a up to field.
     
@@ -164,6 +169,7 @@ def simulates(topo, a, b, field='vlan', edge_policy={}):
             simulates_forwards2(topo, a, b, field=field, edge_policy=edge_policy)
                 is None)
 
+@scoped
 def simulates_forwards(topo, a, b, field='vlan', edge_policy={}):
     """Determine if b simulates a up to field on one hop."""
     p, pp = Consts('p pp', Packet)
@@ -192,6 +198,7 @@ def simulates_forwards(topo, a, b, field='vlan', edge_policy={}):
         set_option('WARNING', True)
         return solv.model(), (p, pp), HEADER_INDEX
 
+@scoped
 def simulates_observes(topo, a, b, field='vlan', edge_policy={}):
     p = Const('p', Packet)
     o, v = Ints('o v')
@@ -220,6 +227,7 @@ def simulates_observes(topo, a, b, field='vlan', edge_policy={}):
         set_option('WARNING', True)
         return solv.model(), (p), HEADER_INDEX
 
+@scoped
 def simulates_forwards2(topo, a, b, field='vlan', edge_policy={}):
     """Determine if b simulates a up to field on two hop on topo."""
     p, pp, q, qq = Consts('p pp q qq', Packet)
@@ -259,6 +267,7 @@ def simulates_forwards2(topo, a, b, field='vlan', edge_policy={}):
         set_option('WARNING', True)
         return solv.model(), (p, pp), HEADER_INDEX
 
+@scoped
 def one_per_edge(topo, pol, field='vlan'):
     """Determine if pol only uses one value of field on each internal edge.
     
@@ -283,6 +292,7 @@ def one_per_edge(topo, pol, field='vlan'):
     else:
         return solv.model(), (p, pp), HEADER_INDEX
 
+@scoped
 def separate(topo, policy1, policy2):
     return (shared_io(topo, policy1, policy2) is None) and\
            (shared_io(topo, policy2, policy1) is None) and\
@@ -291,10 +301,12 @@ def separate(topo, policy1, policy2):
            (shared_outputs(policy1, policy2) is None) and\
            (shared_outputs(policy2, policy1) is None)
 
+@scoped
 def unshared_portals(topo, policy1, policy2):
     return (disjoint_observations(policy1, policy2) and
             shared_transit(topo, policy1, policy2) is None)
 
+@scoped
 def shared_io(topo, policy1, policy2):
     """Try to find output of policy1 in the inputs of policy2."""
     p, pp, q, qq = Consts('p pp q qq', Packet)
@@ -310,6 +322,7 @@ def shared_io(topo, policy1, policy2):
     else:
         return solv.model(), (p, pp, q, qq), HEADER_INDEX
 
+@scoped
 def shared_inputs(policy1, policy2):
     """Try to find packet in input of policy1 and ingress of policy2."""
     p, pp, qq = Consts('p pp qq', Packet)
@@ -324,6 +337,7 @@ def shared_inputs(policy1, policy2):
     else:
         return solv.model(), (p, pp, qq), HEADER_INDEX
 
+@scoped
 def shared_outputs(policy1, policy2):
     """Try to find packet in output of policy1 and egress of slice2."""
     p, q, pp = Consts('p q pp', Packet)
@@ -337,7 +351,119 @@ def shared_outputs(policy1, policy2):
     else:
         return solv.model(), (p, pp), HEADER_INDEX
 
+class Session(object):
+    """Incremental solver for many isolation checks over the same policies.
+
+    Each policy is encoded once, as named definitions over packets of its own:
+    a Bool that holds when the policy forwards its input packet to its output
+    packet, one that holds when it observes its input packet, and, with a
+    topology, one that holds when its output packet crosses a link to its next
+    packet.  Queries link these packets with equalities between a push and a
+    pop, so checking many pairs costs one encoding per policy plus the
+    incremental solves.
+
+    The queries answer like the functions of the same name.
+    """
+    def __init__(self, topo=None):
+        """
+        ARGS:
+            topo:  topology for shared_io and separate, if they are used
+        """
+        self.topo = topo
+        self.solver = Solver()
+        # {policy: (forwards, observes, transfers, p_in, p_out, p_next, obs)}
+        self.encodings = {}
+
+    @scoped
+    def add(self, policy):
+        """Encode policy, unless it already is, and return its encoding."""
+        encoding = self.encodings.get(policy)
+        if encoding is not None:
+            return encoding
+        i = len(self.encodings)
+        p_in, p_out, p_next = Consts('in%d out%d next%d' % (i, i, i), Packet)
+        obs = Int('obs%d' % i)
+        fwd = Bool('forwards%d' % i)
+        obsv = Bool('observes%d' % i)
+        self.solver.add(fwd == forwards(policy, p_in, p_out))
+        self.solver.add(obsv == observes(policy, p_in, obs))
+        if self.topo is not None:
+            trans = Bool('transfers%d' % i)
+            self.solver.add(trans == transfer(self.topo, p_out, p_next))
+        else:
+            trans = None
+        encoding = (fwd, obsv, trans, p_in, p_out, p_next, obs)
+        self.encodings[policy] = encoding
+        return encoding
+
+    def _check(self, constraints, packets):
+        self.solver.push()
+        try:
+            for constraint in constraints:
+                self.solver.add(constraint)
+            if self.solver.check() == unsat:
+                return None
+            else:
+                return self.solver.model(), packets, HEADER_INDEX
+        finally:
+            self.solver.pop()
+
+    @scoped
+    def shared_io(self, policy1, policy2):
+        """Try to find output of policy1 in the inputs of policy2."""
+        if self.topo is None:
+            raise Exception('shared_io needs a session with a topology')
+        if policy1 == policy2:
+            # Both sides would share the same packets
+            return shared_io(self.topo, policy1, policy2)
+        fwd1, _, trans1, p, pp, p_next, _ = self.add(policy1)
+        fwd2, obsv2, _, q, qq, _, _ = self.add(policy2)
+        return self._check([fwd1, trans1, p_next == q, Or(fwd2, obsv2)],
+                           (p, pp, q, qq))
+
+    @scoped
+    def shared_inputs(self, policy1, policy2):
+        """Try to find packet in input of policy1 and ingress of policy2."""
+        if policy1 == policy2:
+            return shared_inputs(policy1, policy2)
+        fwd1, obsv1, _, p, pp, _, _ = self.add(policy1)
+        fwd2, obsv2, _, q, qq, _, _ = self.add(policy2)
+        return self._check([Or(fwd1, obsv1), p == q, vlan(q) == 0,
+                            Or(fwd2, obsv2)],
+                           (p, pp, qq))
+
+    @scoped
+    def shared_outputs(self, policy1, policy2):
+        """Try to find packet in output of policy1 and egress of policy2."""
+        if policy1 == policy2:
+            return shared_outputs(policy1, policy2)
+        fwd1, _, _, p, pp, _, _ = self.add(policy1)
+        fwd2, _, _, _, qq, _, _ = self.add(policy2)
+        return self._check([fwd1, fwd2, pp == qq, vlan(qq) == 0], (p, pp))
+
+    @scoped
+    def separate(self, policy1, policy2):
+        return (self.shared_io(policy1, policy2) is None and
+                self.shared_io(policy2, policy1) is None and
+                self.shared_inputs(policy1, policy2) is None and
+                self.shared_inputs(policy2, policy1) is None and
+                self.shared_outputs(policy1, policy2) is None and
+                self.shared_outputs(policy2, policy1) is None)
+
+    @scoped
+    def unseparated(self, policies):
+        """Return the pairs (i, j), i < j, of policies that are not separate."""
+        for policy in policies:
+            self.add(policy)
+        pairs = []
+        for i in range(len(policies)):
+            for j in range(i + 1, len(policies)):
+                if not self.separate(policies[i], policies[j]):
+                    pairs.append((i, j))
+        return pairs
+
 # TODO(astory): test!
+@scoped
 def shared_transit(topo, policy1, policy2):
     """Try to find packet in the border of policy1 and the border of policy2.
     
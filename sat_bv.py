@@ -0,0 +1,311 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+# /slices/sat_bv.py                                                            #
+# Bit-vector sat conversion and solving for netcore                            #
+################################################################################
+"""Bit-vector sat conversion and solving for netcore.
+
+sat_core gives every header field an uninterpreted Int function of a packet,
+so sat's simulates_* checks need ForAll quantifiers.  Here a packet is instead
+a {field: bit-vector constant} dictionary, sized per field in WIDTHS.  A
+policy only compares the field it is checked up to (usually vlan) for equality
+against its own constants, so the quantifier over that field's values is
+replaced by a conjunction over those constants and a few values it never uses.
+Every query is then quantifier-free, and runs on the QF_BV solver.
+
+The checks answer like the functions of the same name in sat, except that
+counterexamples are (model, packets) with packets {field: constant}
+dictionaries; see explain.
+"""
+
+from z3.z3 import And, Or, Not, BitVec, BitVecVal, BoolVal, SolverFor
+from z3.z3 import substitute, unsat
+from netcore import HEADERS
+import netcore as nc
+import util
+
+WIDTHS = {'switch': 64,
+          'port': 16,
+          'srcmac': 48,
+          'dstmac': 48,
+          'ethtype': 16,
+          'srcip': 32,
+          'dstip': 32,
+          'vlan': 12,
+          'protocol': 8,
+          'srcport': 16,
+          'dstport': 16}
+OBS_WIDTH = 32
+
+def value(field, v, width=None):
+    """Return the bit-vector value v of field, checking that it fits."""
+    if width is None:
+        width = WIDTHS[field]
+    if not 0 <= v < 2 ** width:
+        raise ValueError('%s value %s does not fit in %d bits'
+                         % (field, v, width))
+    return BitVecVal(v, width)
+
+def packet(name):
+    """Return a fresh packet, {field: bit-vector constant}."""
+    return dict((f, BitVec('%s_%s' % (name, f), WIDTHS[f])) for f in HEADERS)
+
+def observation(name):
+    """Return a fresh observation constant."""
+    return BitVec(name, OBS_WIDTH)
+
+def with_field(pkt, field, term):
+    """Return pkt with field replaced by term."""
+    pkt = dict(pkt)
+    pkt[field] = term
+    return pkt
+
+def explain(model, pkt):
+    """Build {field: value} from model and a packet, as sat.explain."""
+    properties = {}
+    for f, term in pkt.items():
+        prop = model.evaluate(term)
+        if 'as_long' in dir(prop):
+            properties[f] = int(prop.as_long())
+    return properties
+
+def nary_or(constraints):
+    if len(constraints) < 1:
+        return BoolVal(False)
+    else:
+        return Or(*constraints)
+
+def nary_and(constraints):
+    if len(constraints) < 1:
+        return BoolVal(True)
+    else:
+        return And(*constraints)
+
+def same_headers(p1, p2, fields):
+    """Return the constraint that p1 and p2 agree on every field but fields."""
+    return nary_and([p1[f] == p2[f] for f in HEADERS if f not in fields])
+
+def match(pred, pkt):
+    """Build the constraint for pred matching pkt."""
+    if isinstance(pred, nc.Top):
+        return BoolVal(True)
+    elif isinstance(pred, nc.Bottom):
+        return BoolVal(False)
+    elif isinstance(pred, nc.Header):
+        return nary_and([pkt[f] == value(f, v) for f, v in pred.fields.items()])
+    elif isinstance(pred, nc.Union):
+        return nary_or([match(child, pkt) for child in pred.children])
+    elif isinstance(pred, nc.Intersection):
+        return And(match(pred.left, pkt), match(pred.right, pkt))
+    elif isinstance(pred, nc.Difference):
+        return And(match(pred.left, pkt), Not(match(pred.right, pkt)))
+    else:
+        raise Exception('unknown predicate %s' % pred)
+
+def modify_packet(action, p_in, p_out):
+    """Build the constraint for action producing p_out from p_in."""
+    constraints = [p_in['switch'] == value('switch', action.switch),
+                   p_out['switch'] == value('switch', action.switch),
+                   nary_or([p_out['port'] == value('port', p)
+                            for p in action.ports])]
+    for f in HEADERS:
+        if f == 'switch' or f == 'port':
+            continue
+        elif f in action.modify:
+            constraints.append(p_out[f] == value(f, action.modify[f]))
+        else:
+            constraints.append(p_in[f] == p_out[f])
+    return nary_and(constraints)
+
+def observe_packet(action, pkt, obv):
+    """Build the constraint for action observing obv from pkt."""
+    return And(pkt['switch'] == value('switch', action.switch),
+               nary_or([obv == value('obs', o, OBS_WIDTH) for o in action.obs]))
+
+def forwards(policy, p_in, p_out):
+    """Build constraint for policy producing p_out from p_in in one hop."""
+    if isinstance(policy, nc.BottomPolicy):
+        return BoolVal(False)
+    elif isinstance(policy, nc.PrimitivePolicy):
+        return And(match(policy.predicate, p_in),
+                   nary_or([modify_packet(a, p_in, p_out)
+                            for a in policy.actions]))
+    elif isinstance(policy, nc.PolicyUnion):
+        return nary_or([forwards(child, p_in, p_out)
+                        for child in policy.children])
+    elif isinstance(policy, nc.PolicyRestriction):
+        return And(forwards(policy.policy, p_in, p_out),
+                   match(policy.predicate, p_in))
+    else:
+        raise Exception('unknown policy type: %s' % policy.__class__)
+
+def observes(policy, pkt, obv):
+    """Build constraint for policy observing obv from pkt in one hop."""
+    if isinstance(policy, nc.BottomPolicy):
+        return BoolVal(False)
+    elif isinstance(policy, nc.PrimitivePolicy):
+        return And(match(policy.predicate, pkt),
+                   nary_or([observe_packet(a, pkt, obv)
+                            for a in policy.actions]))
+    elif isinstance(policy, nc.PolicyUnion):
+        return nary_or([observes(child, pkt, obv)
+                        for child in policy.children])
+    elif isinstance(policy, nc.PolicyRestriction):
+        return And(observes(policy.policy, pkt, obv),
+                   match(policy.predicate, pkt))
+    else:
+        raise Exception('unknown policy type: %s' % policy.__class__)
+
+def transfer(topo, p_out, p_in):
+    """Build constraint for moving p_out to p_in across an edge."""
+    options = []
+    for s1, s2 in topo.edges():
+        p1 = topo.node[s1]['ports'][s2]
+        p2 = topo.node[s2]['ports'][s1]
+        for (a, pa, b, pb) in [(s1, p1, s2, p2), (s2, p2, s1, p1)]:
+            options.append(And(p_out['switch'] == value('switch', a),
+                               p_out['port'] == value('port', pa),
+                               p_in['switch'] == value('switch', b),
+                               p_in['port'] == value('port', pb)))
+    return And(nary_or(options), same_headers(p_out, p_in, ['switch', 'port']))
+
+def on_valid_port(topo, pkt):
+    constraints = []
+    for node in topo.nodes():
+        for p in topo.node[node]['port']:
+            constraints.append(And(pkt['switch'] == value('switch', node),
+                                   pkt['port'] == value('port', p)))
+    return nary_or(constraints)
+
+def external_link(edge_policy, pkt):
+    """Build predicate for being on an external link."""
+    return nary_or([And(pkt['switch'] == value('switch', s),
+                        pkt['port'] == value('port', p))
+                    for (s, p) in edge_policy])
+
+def edges_ingress(edge_policy, pkt):
+    """Build predicate for pkt being in the ingress set as defined."""
+    return nary_or([And(pkt['switch'] == value('switch', s),
+                        pkt['port'] == value('port', p),
+                        match(predicate, pkt))
+                    for ((s, p), predicate) in edge_policy.items()])
+
+def representatives(policy, field, fresh):
+    """Return values of field covering every way policy can treat it.
+
+    policy only compares field against its own constants, and values of field
+    against each other, so its own constants and fresh values it never uses
+    stand in for every value.
+    """
+    values = set(util.values_of_policy(policy, field))
+    result = [value(field, v) for v in sorted(values)]
+    v = 0
+    while fresh > 0:
+        if v not in values:
+            result.append(value(field, v))
+            fresh -= 1
+        v += 1
+    return result
+
+def _solve(constraints, packets):
+    solv = SolverFor('QF_BV')
+    for constraint in constraints:
+        solv.add(constraint)
+    if solv.check() == unsat:
+        return None
+    else:
+        return solv.model(), packets
+
+def _edge_option(edge_policy, pkt):
+    # b doesn't need to handle packets on external links that don't satisfy
+    # the ingress predicate
+    return And(external_link(edge_policy, pkt),
+               Not(edges_ingress(edge_policy, pkt)))
+
+def simulates_forwards(topo, a, b, field='vlan', edge_policy={}):
+    """Determine if b simulates a up to field on one hop."""
+    p, pp = packet('p'), packet('pp')
+    v, vv = BitVec('v', WIDTHS[field]), BitVec('vv', WIDTHS[field])
+    b_fwd = forwards(b, with_field(p, field, v), with_field(pp, field, vv))
+    values = representatives(b, field, 2)
+    # Not (Exists v, vv: b forwards), over every pair of values that matters
+    never = nary_and([Not(substitute(b_fwd, (v, x), (vv, y)))
+                      for x in values for y in values])
+    return _solve([on_valid_port(topo, p), forwards(a, p, pp),
+                   never, Not(_edge_option(edge_policy, p))], (p, pp))
+
+def simulates_observes(topo, a, b, field='vlan', edge_policy={}):
+    """Determine if b observes what a does, up to field."""
+    p = packet('p')
+    o = observation('o')
+    v = BitVec('v', WIDTHS[field])
+    b_obs = observes(b, with_field(p, field, v), o)
+    values = representatives(b, field, 1)
+    never = nary_and([Not(substitute(b_obs, (v, x))) for x in values])
+    return _solve([on_valid_port(topo, p), observes(a, p, o),
+                   never, Not(_edge_option(edge_policy, p))], (p,))
+
+def simulates_forwards2(topo, a, b, field='vlan', edge_policy={}):
+    """Determine if b simulates a up to field on two hops on topo."""
+    p, pp, q, qq = packet('p'), packet('pp'), packet('q'), packet('qq')
+    v, vv = BitVec('v', WIDTHS[field]), BitVec('vv', WIDTHS[field])
+    first = forwards(b, with_field(p, field, v), with_field(pp, field, vv))
+    second = forwards(b, with_field(q, field, v), with_field(qq, field, vv))
+    values = representatives(b, field, 3)
+    # Not (Exists v, vv, vvv: b forwards p to pp, and pp's hop q onwards).  The
+    # two hops only share vv, so for each vv, one of them must be impossible.
+    never = []
+    for y in values:
+        first_never = nary_and([Not(substitute(first, (v, x), (vv, y)))
+                                for x in values])
+        second_never = nary_and([Not(substitute(second, (v, y), (vv, z)))
+                                 for z in values])
+        never.append(Or(first_never, second_never))
+    never = nary_and(never)
+    return _solve([on_valid_port(topo, p), forwards(a, p, pp),
+                   transfer(topo, pp, q), forwards(a, q, qq),
+                   never, Not(_edge_option(edge_policy, p))], (p, pp))
+
+def simulates(topo, a, b, field='vlan', edge_policy={}):
+    """Determine if b simulates a up to field, as sat.simulates."""
+    return (simulates_forwards(topo, a, b, field, edge_policy) is None and
+            simulates_observes(topo, a, b, field, edge_policy) is None and
+            simulates_forwards2(topo, a, b, field, edge_policy) is None)
+
+def one_per_edge(topo, pol, field='vlan'):
+    """Determine if pol only uses one value of field on each internal edge."""
+    p, pp, q, qq, r, rr = [packet(n) for n in ['p', 'pp', 'q', 'qq', 'r', 'rr']]
+    return _solve([forwards(pol, p, pp), transfer(topo, pp, r),
+                   forwards(pol, r, rr), forwards(pol, q, qq),
+                   pp['switch'] == qq['switch'], pp['port'] == qq['port'],
+                   pp[field] != qq[field]], (p, pp))
+
+def compiled_correctly(topo, orig, result, edge_policy={}):
+    """Determine if result is a valid compilation of orig, as sat does."""
+    return (simulates(topo, orig, result, edge_policy=edge_policy) and
+            simulates(topo, result, orig) and
+            one_per_edge(topo, result) is None)
@@ -0,0 +1,26 @@
+#!/usr/bin/python
+import sat_bv
+import sat_test
+from sat_test import topo
+from netcore import then, Header, Action, forward
+import unittest
+
+class SatBvTest(sat_test.SatTest):
+    module_name = 'sat_bv'
+
+    def test_value_range(self):
+        o = Header({'switch': 1, 'port': 1, 'vlan': 4096}) |then| forward(1, 2)
+        self.assertRaises(ValueError, sat_bv.one_per_edge, topo, o)
+        o = Header({'switch': 1, 'port': 1, 'vlan': -1}) |then| forward(1, 2)
+        self.assertRaises(ValueError, sat_bv.one_per_edge, topo, o)
+
+    def test_representatives(self):
+        pol = (Header({'switch': 1, 'vlan': 3}) |then|
+               Action(1, [2], {'vlan': 1}))
+        values = sat_bv.representatives(pol, 'vlan', 2)
+        self.assertEqual([1, 3, 0, 2], [v.as_long() for v in values])
+        self.assertEqual([0, 1], [v.as_long() for v in
+                                  sat_bv.representatives(pol, 'srcmac', 2)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,6 +29,8 @@
 # Sat conversion for netcore.                                                  #
 ################################################################################
 
+import functools
+from contextlib import contextmanager
 from z3.z3 import And, Or, Not, Function, DeclareSort, IntSort, BoolSort
 from z3.z3 import Consts, ForAll, Exists, Int, Implies
 from netcore import HEADERS
@@ -45,6 +47,55 @@ switch = HEADER_INDEX['switch']
 port = HEADER_INDEX['port']
 vlan = HEADER_INDEX['vlan']
 
+# Built terms, {(kind, node, packets and mods): (term, key terms)}.  z3
+# hash-conses its terms, so a packet constant of the same name has the same id
+# in every query, and a check rebuilding the encoding of a policy it has already
+# encoded, in this query or an earlier one of the same check, gets the same
+# shared term back for free.  Keys hold term ids, so each entry also holds the
+# packet and mod terms of its key, which keeps z3 from reusing their ids while
+# the entry is cached.  Terms are only kept inside a term_scope, and dropped
+# when the outermost one exits, so the cache never outlives a check.
+_terms = {}
+# Number of term_scopes entered and not yet exited
+_scopes = [0]
+
+def clear_terms():
+    """Forget all built terms, to free their memory."""
+    _terms.clear()
+
+@contextmanager
+def term_scope():
+    """Cache built terms until the outermost term_scope exits.
+
+    The checks in sat, sat_split and sat.Session run in one, see scoped.
+    Outside any term_scope nothing is cached.
+    """
+    _scopes[0] += 1
+    try:
+        yield
+    finally:
+        _scopes[0] -= 1
+        if _scopes[0] == 0:
+            clear_terms()
+
+def scoped(function):
+    """Decorate function to run in a term_scope."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with term_scope():
+            return function(*args, **kwargs)
+    return wrapper
+
+def _term_id(term):
+    """Return a hashable stand-in for a z3 term or Python value."""
+    if hasattr(term, 'get_id'):
+        return ('term', term.get_id())
+    else:
+        return term
+
+def _mods_key(mods):
+    return tuple(sorted((f, _term_id(v)) for f, v in mods.iteritems()))
+
 def nary_or(constraints):
     if len(constraints) < 1:
         return False
@@ -82,6 +133,16 @@ def match(pred, pkt):
 
 def match_with(pred, pkt, mods):
     """Build the constraint for pred matching pkt."""
+    if not _scopes[0]:
+        return _match_with(pred, pkt, mods)
+    key = ('match', pred, _term_id(pkt), _mods_key(mods))
+    entry = _terms.get(key)
+    if entry is None:
+        entry = (_match_with(pred, pkt, mods), (pkt, mods.values()))
+        _terms[key] = entry
+    return entry[0]
+
+def _match_with(pred, pkt, mods):
     if isinstance(pred, nc.Top):
         return True
     elif isinstance(pred, nc.Bottom):
@@ -96,9 +157,7 @@ def match_with(pred, pkt, mods):
                 constraints.append(HEADER_INDEX[field](pkt) == value)
         return nary_and(constraints)
     elif isinstance(pred, nc.Union):
-        left = match_with(pred.left, pkt, mods)
-        right = match_with(pred.right, pkt, mods)
-        return Or(left, right)
+        return Or(*[match_with(child, pkt, mods) for child in pred.children])
     elif isinstance(pred, nc.Intersection):
         left = match_with(pred.left, pkt, mods)
         right = match_with(pred.right, pkt, mods)
@@ -183,6 +242,18 @@ def forwards_with(policy, p_in, in_mods, p_out, out_mods):
     Modifies p_in with all the fields in in_mods
     Modifies p_out with all the fields in out_mods
     """
+    if not _scopes[0]:
+        return _forwards_with(policy, p_in, in_mods, p_out, out_mods)
+    key = ('forwards', policy, _term_id(p_in), _mods_key(in_mods),
+           _term_id(p_out), _mods_key(out_mods))
+    entry = _terms.get(key)
+    if entry is None:
+        entry = (_forwards_with(policy, p_in, in_mods, p_out, out_mods),
+                 (p_in, in_mods.values(), p_out, out_mods.values()))
+        _terms[key] = entry
+    return entry[0]
+
+def _forwards_with(policy, p_in, in_mods, p_out, out_mods):
     if isinstance(policy, nc.BottomPolicy):
         # No forwarding happens, fail immediately (unless there's a union above
         # us, in which case the Or takes care of it)
@@ -201,10 +272,8 @@ def forwards_with(policy, p_in, in_mods, p_out, out_mods):
         return And(match_with(pred, p_in, in_mods),
                    action_constraints)
     elif isinstance(policy, nc.PolicyUnion):
-        left = policy.left
-        right = policy.right
-        return Or(forwards_with(left, p_in, in_mods, p_out, out_mods),
-                  forwards_with(right, p_in, in_mods, p_out, out_mods))
+        return Or(*[forwards_with(child, p_in, in_mods, p_out, out_mods)
+                    for child in policy.children])
     elif isinstance(policy, nc.PolicyRestriction):
         subpolicy = policy.policy
         pred = policy.predicate
@@ -221,6 +290,18 @@ def observes_with(policy, packet, mods, obs):
 
     Modifies packet with all the fields in mods
     """
+    if not _scopes[0]:
+        return _observes_with(policy, packet, mods, obs)
+    key = ('observes', policy, _term_id(packet), _mods_key(mods),
+           _term_id(obs))
+    entry = _terms.get(key)
+    if entry is None:
+        entry = (_observes_with(policy, packet, mods, obs),
+                 (packet, mods.values(), obs))
+        _terms[key] = entry
+    return entry[0]
+
+def _observes_with(policy, packet, mods, obs):
     if isinstance(policy, nc.BottomPolicy):
         # No observing happens, fail immediately (unless there's a union above
         # us, in which case the Or takes care of it)
@@ -237,10 +318,8 @@ def observes_with(policy, packet, mods, obs):
         # False -> x for all x
         return And(match_with(pred, packet, mods), action_constraints)
     elif isinstance(policy, nc.PolicyUnion):
-        left = policy.left
-        right = policy.right
-        return Or(observes_with(left, packet, mods, obs),
-                  observes_with(right, packet, mods, obs))
+        return Or(*[observes_with(child, packet, mods, obs)
+                    for child in policy.children])
     elif isinstance(policy, nc.PolicyRestriction):
         subpolicy = policy.policy
         pred = policy.predicate
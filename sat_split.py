@@ -0,0 +1,267 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+# /slices/sat_split.py                                                         #
+# Sat checks split into per-switch and per-link queries                        #
+################################################################################
+"""Sat checks split into per-switch and per-link queries.
+
+A packet is processed at one switch, and only by the rules with actions on
+that switch, so the one-hop checks in sat only need the rules of one switch at
+a time, and the two-hop checks only those of the two ends of one link.  The
+functions here partition policies by switch, run sat's checks once per switch
+or per link on views of the topology around them, and stop at the first
+counterexample.  Each query stays the same size as the network grows, and the
+queries can run in parallel worker processes.
+
+The checks answer like the functions of the same name in sat.
+"""
+
+import netcore as nc
+import sat
+import util
+from sat_core import scoped
+
+# Forwards nothing, like BottomPolicy, but sat encodes it instead of
+# short-circuiting on it, as simulates_forwards2 does when b is BottomPolicy.
+NOTHING = nc.PrimitivePolicy(nc.Bottom(), [])
+
+class TopoView(object):
+    """The part of a topology sat needs for queries on some switches.
+
+    Has every port of the switches, but only the links between them.
+    """
+    def __init__(self, topo, switches):
+        self.switches = list(switches)
+        self.node = dict((s, topo.node[s]) for s in self.switches)
+        self.links = [(s1, s2) for s1, s2 in topo.edges()
+                      if s1 in self.node and s2 in self.node]
+
+    def nodes(self):
+        return list(self.switches)
+
+    def edges(self):
+        return list(self.links)
+
+def _can_match_at(pred, switch):
+    locations = util.locations_of_predicate(pred)
+    return locations is None or any(s == switch for s, _ in locations)
+
+def partition(policy):
+    """Return {switch: the part of policy that acts on switch}."""
+    if isinstance(policy, nc.BottomPolicy):
+        return {}
+    elif isinstance(policy, nc.PrimitivePolicy):
+        by_switch = {}
+        for action in policy.actions:
+            by_switch.setdefault(action.switch, []).append(action)
+        parts = {}
+        for switch, actions in by_switch.iteritems():
+            if _can_match_at(policy.predicate, switch):
+                parts[switch] = nc.PrimitivePolicy(policy.predicate, actions)
+        return parts
+    elif isinstance(policy, nc.PolicyUnion):
+        children = {}
+        for child in policy.children:
+            for switch, part in partition(child).iteritems():
+                children.setdefault(switch, []).append(part)
+        return dict((switch, nc.nary_policy_union(parts))
+                    for switch, parts in children.iteritems())
+    elif isinstance(policy, nc.PolicyRestriction):
+        parts = {}
+        for switch, part in partition(policy.policy).iteritems():
+            if _can_match_at(policy.predicate, switch):
+                parts[switch] = nc.PolicyRestriction(part, policy.predicate)
+        return parts
+    else:
+        raise Exception('unknown policy type: %s' % policy.__class__)
+
+def _part(parts, switches):
+    """Return the union of the parts of a partition on switches."""
+    return nc.nary_policy_union([parts[s] for s in switches if s in parts])
+
+def _edge_part(edge_policy, switches):
+    return dict(((s, p), pred) for (s, p), pred in edge_policy.iteritems()
+                if s in switches)
+
+def _links(topo, parts1, parts2):
+    """Return the links of topo with parts1 at one end and parts2 at the other.
+
+    Packets only cross these links from a rule of one to a rule of the other.
+    """
+    return [(s1, s2) for s1, s2 in topo.edges()
+            if (s1 in parts1 and s2 in parts2) or
+               (s2 in parts1 and s1 in parts2)]
+
+def first_counterexample(queries, processes=1):
+    """Return the result of the first query that is not None, or None.
+
+    ARGS:
+        queries:  list of (function, args)
+        processes:  number of worker processes, see util.fork_map.  Models
+            cannot leave a worker, so a failing query is rerun here to get its
+            result.
+    """
+    if processes is not None and processes <= 1:
+        for function, args in queries:
+            result = function(*args)
+            if result is not None:
+                return result
+        return None
+    def fails((function, args)):
+        return function(*args) is not None
+    results = util.fork_imap(fails, queries, processes)
+    try:
+        for index, failed in results:
+            if failed:
+                function, args = queries[index]
+                return function(*args)
+    finally:
+        results.close()
+    return None
+
+def _switch_queries(function, parts1, parts2):
+    """Queries of function(policy1 at s, policy2 at s) for shared switches."""
+    return [(function, (parts1[s], parts2[s]))
+            for s in sorted(set(parts1).intersection(parts2))]
+
+def shared_io_queries(topo, policy1, policy2):
+    parts1, parts2 = partition(policy1), partition(policy2)
+    queries = []
+    for s1, s2 in _links(topo, parts1, parts2):
+        queries.append((sat.shared_io, (TopoView(topo, [s1, s2]),
+                                        _part(parts1, [s1, s2]),
+                                        _part(parts2, [s1, s2]))))
+    return queries
+
+@scoped
+def shared_io(topo, policy1, policy2, processes=1):
+    """Try to find output of policy1 in the inputs of policy2."""
+    return first_counterexample(shared_io_queries(topo, policy1, policy2),
+                                processes)
+
+@scoped
+def shared_inputs(policy1, policy2, processes=1):
+    """Try to find packet in input of policy1 and ingress of policy2."""
+    return first_counterexample(
+               _switch_queries(sat.shared_inputs, partition(policy1),
+                               partition(policy2)), processes)
+
+@scoped
+def shared_outputs(policy1, policy2, processes=1):
+    """Try to find packet in output of policy1 and egress of policy2."""
+    return first_counterexample(
+               _switch_queries(sat.shared_outputs, partition(policy1),
+                               partition(policy2)), processes)
+
+def separate_queries(topo, policy1, policy2):
+    parts1, parts2 = partition(policy1), partition(policy2)
+    # The one-switch queries are cheaper, so run them first
+    return (_switch_queries(sat.shared_inputs, parts1, parts2) +
+            _switch_queries(sat.shared_inputs, parts2, parts1) +
+            _switch_queries(sat.shared_outputs, parts1, parts2) +
+            _switch_queries(sat.shared_outputs, parts2, parts1) +
+            shared_io_queries(topo, policy1, policy2) +
+            shared_io_queries(topo, policy2, policy1))
+
+@scoped
+def separate(topo, policy1, policy2, processes=1):
+    return first_counterexample(separate_queries(topo, policy1, policy2),
+                                processes) is None
+
+def simulates_queries(topo, a, b, field='vlan', edge_policy={}):
+    """Queries for sat.simulates_forwards, _observes and _forwards2."""
+    parts_a, parts_b = partition(a), partition(b)
+    queries = []
+    # Packets must be on a port of topo, so switches outside it are skipped
+    for s in sorted(s for s in parts_a if topo.has_node(s)):
+        view = TopoView(topo, [s])
+        b_s = parts_b.get(s, NOTHING)
+        edges = _edge_part(edge_policy, [s])
+        queries.append((sat.simulates_forwards,
+                        (view, parts_a[s], b_s, field, edges)))
+        queries.append((sat.simulates_observes,
+                        (view, parts_a[s], b_s, field, edges)))
+    for s1, s2 in _links(topo, parts_a, parts_a):
+        view = TopoView(topo, [s1, s2])
+        b_link = _part(parts_b, [s1, s2])
+        if isinstance(b_link, nc.BottomPolicy):
+            b_link = NOTHING
+        queries.append((sat.simulates_forwards2,
+                        (view, _part(parts_a, [s1, s2]), b_link, field,
+                         _edge_part(edge_policy, [s1, s2]))))
+    return queries
+
+@scoped
+def simulates_forwards(topo, a, b, field='vlan', edge_policy={},
+                       processes=1):
+    """Determine if b simulates a up to field on one hop."""
+    queries = [q for q in simulates_queries(topo, a, b, field, edge_policy)
+               if q[0] is sat.simulates_forwards]
+    return first_counterexample(queries, processes)
+
+@scoped
+def simulates_observes(topo, a, b, field='vlan', edge_policy={},
+                       processes=1):
+    queries = [q for q in simulates_queries(topo, a, b, field, edge_policy)
+               if q[0] is sat.simulates_observes]
+    return first_counterexample(queries, processes)
+
+@scoped
+def simulates_forwards2(topo, a, b, field='vlan', edge_policy={},
+                        processes=1):
+    """Determine if b simulates a up to field on two hops on topo."""
+    queries = [q for q in simulates_queries(topo, a, b, field, edge_policy)
+               if q[0] is sat.simulates_forwards2]
+    return first_counterexample(queries, processes)
+
+@scoped
+def simulates(topo, a, b, field='vlan', edge_policy={}, processes=1):
+    """Determine if b simulates a up to field, as sat.simulates."""
+    return first_counterexample(
+               simulates_queries(topo, a, b, field, edge_policy),
+               processes) is None
+
+def one_per_edge_queries(topo, pol, field='vlan'):
+    parts = partition(pol)
+    return [(sat.one_per_edge, (TopoView(topo, [s1, s2]),
+                                _part(parts, [s1, s2]), field))
+            for s1, s2 in _links(topo, parts, parts)]
+
+@scoped
+def one_per_edge(topo, pol, field='vlan', processes=1):
+    """Determine if pol only uses one value of field on each internal edge."""
+    return first_counterexample(one_per_edge_queries(topo, pol, field),
+                                processes)
+
+@scoped
+def compiled_correctly(topo, orig, result, edge_policy={}, processes=1):
+    """Determine if result is a valid compilation of orig, as sat does."""
+    queries = (simulates_queries(topo, orig, result,
+                                 edge_policy=edge_policy) +
+               simulates_queries(topo, result, orig) +
+               one_per_edge_queries(topo, result))
+    return first_counterexample(queries, processes) is None
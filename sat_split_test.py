@@ -0,0 +1,39 @@
+#!/usr/bin/python
+import sat_split
+import sat_test
+from sat_test import topo
+from netcore import then, Header, Action, Top, forward
+import unittest
+
+class SatSplitTest(sat_test.SatTest):
+    module_name = 'sat_split'
+
+    def test_partition(self):
+        pol = Header({'switch': 2}) |then| [Action(2, [1]), Action(3, [1])]
+        self.assertEqual({2: Header({'switch': 2}) |then| Action(2, [1])},
+                         sat_split.partition(pol))
+        # The rule at 3 can never match, since the restriction names 2
+        pol = ((Top() |then| Action(2, [1])) +
+               (Top() |then| Action(3, [1]))) % Header({'switch': 2})
+        self.assertEqual([2], sat_split.partition(pol).keys())
+
+    def test_links(self):
+        at_2 = sat_split.partition(Header({'switch': 2}) |then| forward(2, 2))
+        at_3 = sat_split.partition(Header({'switch': 3}) |then| forward(3, 2))
+        at_4 = sat_split.partition(Header({'switch': 4}) |then| forward(4, 2))
+        self.assertEqual([set([2, 3])], [set(link) for link in
+                                         sat_split._links(topo, at_2, at_3)])
+        self.assertEqual([], sat_split._links(topo, at_2, at_4))
+        self.assertEqual([], sat_split._links(topo, at_2, at_2))
+
+    def test_one_ended_links(self):
+        # Links with rules at only one end produce no query
+        pol = Header({'switch': 2, 'port': 1, 'vlan': 1}) |then| forward(2, 2)
+        self.assertEqual([], sat_split.one_per_edge_queries(topo, pol))
+        other = Header({'switch': 4, 'port': 1}) |then| forward(4, 2)
+        self.assertEqual([], sat_split.shared_io_queries(topo, pol, other))
+        both = pol + (Header({'switch': 3, 'port': 1}) |then| forward(3, 2))
+        self.assertEqual(1, len(sat_split.one_per_edge_queries(topo, both)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 #!/usr/bin/python
+import importlib
 import sat
+import sat_core
 from netcore import then, Header, Action, forward, inport, BottomPolicy
 import nxtopo
+from z3.z3 import Consts
 import unittest
 
 # Basic linear testing topology
@@ -38,81 +41,90 @@ topo_host.add_link(3, 4)
 topo_host.finalize()
 
 class SatTest(unittest.TestCase):
+    # Name of the module of checks under test, subclasses test the other
+    # backends.  Only the name is kept: a reference from here would keep the
+    # module's z3 objects alive past z3's own teardown at exit.
+    module_name = 'sat'
+
+    @property
+    def module(self):
+        return importlib.import_module(self.module_name)
+
     def test_forwards(self):
         o = Header({'switch': 2}) |then| Action(2, [1])
         r = Header({'switch': 2}) |then| Action(2, [1])
-        self.assertIsNone(sat.simulates_forwards(topo, o, r))
-        self.assertIsNone(sat.simulates_forwards(topo, r, o))
+        self.assertIsNone(self.module.simulates_forwards(topo, o, r))
+        self.assertIsNone(self.module.simulates_forwards(topo, r, o))
 
         o = Header({'switch': 2, 'port': 2}) |then| Action(2, [1])
         r = Header({'switch': 2, 'port': 2}) |then| Action(2, [1])
-        self.assertIsNone(sat.simulates_forwards(topo, o, r))
-        self.assertIsNone(sat.simulates_forwards(topo, r, o))
+        self.assertIsNone(self.module.simulates_forwards(topo, o, r))
+        self.assertIsNone(self.module.simulates_forwards(topo, r, o))
 
         o = Header({'switch': 2, 'port': 2}) |then| Action(2, [1])
         r = Header({'switch': 2, 'port': 2, 'vlan': 2}) |then| Action(2, [1])
-        self.assertIsNone(sat.simulates_forwards(topo, o, r))
-        self.assertIsNone(sat.simulates_forwards(topo, r, o))
+        self.assertIsNone(self.module.simulates_forwards(topo, o, r))
+        self.assertIsNone(self.module.simulates_forwards(topo, r, o))
 
         o = Header({'switch': 2, 'port': 2}) |then| forward(2, 1)
         r = Header({'switch': 2, 'port': 2, 'vlan': 2}) |then| Action(2, [1], {'vlan': 2})
-        self.assertIsNone(sat.simulates_forwards(topo, o, r))
-        self.assertIsNone(sat.simulates_forwards(topo, r, o))
+        self.assertIsNone(self.module.simulates_forwards(topo, o, r))
+        self.assertIsNone(self.module.simulates_forwards(topo, r, o))
 
         o = Header({'switch': 0, 'port': 1}) |then| Action(0, [1])
         r = Header({'switch': 0, 'port': 1, 'vlan': 1}) |then| Action(0, [1], {'vlan': 1})
-        self.assertIsNone(sat.simulates_forwards(topo, o, r))
-        self.assertIsNone(sat.simulates_forwards(topo, r, o))
+        self.assertIsNone(self.module.simulates_forwards(topo, o, r))
+        self.assertIsNone(self.module.simulates_forwards(topo, r, o))
 
         o = Header({'switch': 0, 'port': 1, 'srcmac': 32432, 'dstmac': 324322}) |then| Action(0, [1])
         r = Header({'switch': 0, 'port': 1, 'srcmac': 32432, 'dstmac': 324322, 'vlan': 1}) |then| Action(0, [1], {'vlan': 1})
-        self.assertIsNone(sat.simulates_forwards(topo, o, r))
-        self.assertIsNone(sat.simulates_forwards(topo, r, o))
+        self.assertIsNone(self.module.simulates_forwards(topo, o, r))
+        self.assertIsNone(self.module.simulates_forwards(topo, r, o))
 
     def test_observes(self):
         o = BottomPolicy()
         r = BottomPolicy()
-        self.assertIsNone(sat.simulates_observes(topo, o, r))
+        self.assertIsNone(self.module.simulates_observes(topo, o, r))
 
         o = Header({'switch': 1, 'port': 1}) |then| Action(1, [2], obs=[0])
         r = Header({'switch': 1, 'port': 1, 'vlan': 1}) |then|\
             Action(1, [2], obs=[0])
-        self.assertIsNone(sat.simulates_observes(topo, o, r))
+        self.assertIsNone(self.module.simulates_observes(topo, o, r))
 
         o = Header({'switch': 1, 'port': 1}) |then| Action(1, [2])
         r = Header({'switch': 1, 'port': 1, 'vlan': 1}) |then|\
             Action(1, [2], obs=[0])
-        self.assertIsNone(sat.simulates_observes(topo, o, r))
+        self.assertIsNone(self.module.simulates_observes(topo, o, r))
 
         o = Header({'switch': 1, 'port': 1}) |then| Action(1, [2], obs=[0])
         r = Header({'switch': 1, 'port': 1, 'vlan': 1}) |then|\
             Action(1, [2])
-        self.assertIsNotNone(sat.simulates_observes(topo, o, r))
+        self.assertIsNotNone(self.module.simulates_observes(topo, o, r))
 
     def test_compiled_correctly(self):
         o = Header({'switch': 2, 'port': 2, 'vlan': 2}) |then| Action(2, [1])
         r = Header({'switch': 2, 'port': 2, 'vlan': 2}) |then| Action(2, [1])
-        self.assertTrue(sat.compiled_correctly(topo, o, r))
+        self.assertTrue(self.module.compiled_correctly(topo, o, r))
 
         o = Header({'switch': 2, 'port': 2}) |then| Action(2, [1])
         r = Header({'switch': 2, 'port': 2, 'vlan': 2}) |then| Action(2, [1])
-        self.assertTrue(sat.compiled_correctly(topo, o, r))
+        self.assertTrue(self.module.compiled_correctly(topo, o, r))
 
         o = Header({'switch': 2, 'port': 2}) |then| forward(2, 1)
         r = Header({'switch': 2, 'port': 2, 'vlan': 2})\
             |then| Action(2, [1], {'vlan': 2})
-        self.assertTrue(sat.compiled_correctly(topo, o, r))
+        self.assertTrue(self.module.compiled_correctly(topo, o, r))
 
         o = Header({'switch': 1, 'port': 1}) |then| Action(1, [1])
         r = Header({'switch': 1, 'port': 1, 'vlan': 1}) |then|\
             Action(1, [1], {'vlan': 1})
-        self.assertTrue(sat.compiled_correctly(topo, o, r))
+        self.assertTrue(self.module.compiled_correctly(topo, o, r))
 
         o = Header({'switch': 1, 'port': 1, 'srcmac': 33, 'dstmac': 32})\
             |then| Action(1, [1])
         r = Header({'switch': 1, 'port': 1, 'srcmac': 33, 'dstmac': 32, 'vlan': 1})\
             |then| Action(1, [1], {'vlan': 1})
-        self.assertTrue(sat.compiled_correctly(topo, o, r))
+        self.assertTrue(self.module.compiled_correctly(topo, o, r))
     
     def test_input_restriction(self):
         edge_policy = {(1, 1): Header({'dstip': 80}),
@@ -120,7 +132,7 @@ class SatTest(unittest.TestCase):
         o = (Header({'switch': 1, 'port': 1}) |then| Action(1, [2], obs=[1]))
         r = Header({'switch': 1, 'port': 1, 'dstip': 80})\
             |then| Action(1, [2], obs=[1])
-        self.assertTrue(sat.compiled_correctly(topo_host, o, r, edge_policy=edge_policy))
+        self.assertTrue(self.module.compiled_correctly(topo_host, o, r, edge_policy=edge_policy))
 
         o = (Header({'switch': 1, 'port': 1}) |then| Action(1, [2], obs=[1])) +\
             (Header({'switch': 3, 'port': 1}) |then| Action(3, [2], obs=[2]))
@@ -128,31 +140,31 @@ class SatTest(unittest.TestCase):
              |then| Action(1, [2], {'vlan': 1}, obs=[1])) +\
             (Header({'switch': 3, 'port': 1, 'vlan': 1})
              |then| Action(3, [2], {'vlan': 0}, obs=[2]))
-        self.assertTrue(sat.compiled_correctly(topo_host, o, r, edge_policy=edge_policy))
+        self.assertTrue(self.module.compiled_correctly(topo_host, o, r, edge_policy=edge_policy))
 
     def test_compiled_badly(self):
         o = Header({'switch': 2, 'port': 1}) |then| Action(2, [1])
         r = BottomPolicy()
-        self.assertFalse(sat.compiled_correctly(topo, o, r))
+        self.assertFalse(self.module.compiled_correctly(topo, o, r))
 
         o = Header({'switch': 2, 'port': 1}) |then| Action(2, [1])
         r = Header({'switch': 1, 'port': 1}) |then| Action(2, [1])
-        self.assertFalse(sat.compiled_correctly(topo, o, r))
+        self.assertFalse(self.module.compiled_correctly(topo, o, r))
 
     def test_simulates_forwards2(self):
         o = (Header({'switch': 2, 'port': 1}) |then| forward(2, 2))+\
             (Header({'switch': 3, 'port': 1}) |then| forward(3, 2))
         r = (Header({'switch': 2, 'port': 1, 'vlan': 2}) |then| forward(2, 2))+\
             (Header({'switch': 3, 'port': 1, 'vlan': 2}) |then| forward(3, 2))
-        self.assertIsNone(sat.simulates_forwards2(topo, o, r))
-        self.assertIsNotNone(sat.simulates_forwards2(topo, o, r, field='srcmac'))
+        self.assertIsNone(self.module.simulates_forwards2(topo, o, r))
+        self.assertIsNotNone(self.module.simulates_forwards2(topo, o, r, field='srcmac'))
 
         o = (Header({'switch': 2, 'port': 1, 'vlan': 1}) |then| forward(2, 2))+\
             (Header({'switch': 3, 'port': 1, 'vlan': 1}) |then| forward(3, 2))
         r = (Header({'switch': 2, 'port': 1, 'vlan': 2}) |then| forward(2, 2))+\
             (Header({'switch': 3, 'port': 1, 'vlan': 2}) |then| forward(3, 2))
-        self.assertIsNone(sat.simulates_forwards2(topo, o, r))
-        self.assertIsNotNone(sat.simulates_forwards2(topo, o, r, field='srcmac'))
+        self.assertIsNone(self.module.simulates_forwards2(topo, o, r))
+        self.assertIsNotNone(self.module.simulates_forwards2(topo, o, r, field='srcmac'))
 
         # This is the corner case that demonstrates that we need to restrict
         # compiled policies to only one vlan per slice.
@@ -163,14 +175,14 @@ class SatTest(unittest.TestCase):
             (Header({'switch': 3, 'port': 1, 'vlan': 1}) |then| forward(3, 2))+\
             (Header({'switch': 3, 'port': 1, 'vlan': 2}) |then| forward(3, 2))+\
             (Header({'switch': 4, 'port': 1, 'vlan': 2}) |then| forward(4, 2))
-        self.assertIsNone(sat.simulates_forwards(topo, o, r))
+        self.assertIsNone(self.module.simulates_forwards(topo, o, r))
         # NOTE: We would really like this to be a failure, but it isn't.
         # Therefore, for compiler correctness, we also need one vlan per edge.
-        self.assertIsNone(sat.simulates_forwards2(topo, o, r))
-        self.assertIsNotNone(sat.simulates_forwards2(topo, o, r, field='srcmac'))
+        self.assertIsNone(self.module.simulates_forwards2(topo, o, r))
+        self.assertIsNotNone(self.module.simulates_forwards2(topo, o, r, field='srcmac'))
 
         # And verify that the compilation test finds this failure
-        self.assertFalse(sat.compiled_correctly(topo, o, r))
+        self.assertFalse(self.module.compiled_correctly(topo, o, r))
 
     def test_one_per_edge(self):
         topo = nxtopo.NXTopo()
@@ -188,15 +200,48 @@ class SatTest(unittest.TestCase):
 
         r = (Header({'switch': 2, 'port': 1, 'vlan': 2}) |then| forward(2, 2))+\
             (Header({'switch': 3, 'port': 1, 'vlan': 2}) |then| forward(3, 2))
-        self.assertIsNone(sat.one_per_edge(topo, r))
-        self.assertIsNotNone(sat.one_per_edge(topo, r, field='srcmac'))
+        self.assertIsNone(self.module.one_per_edge(topo, r))
+        self.assertIsNotNone(self.module.one_per_edge(topo, r, field='srcmac'))
 
         r = (Header({'switch': 2, 'port': 1, 'vlan': 1}) |then| forward(2, 2))+\
             (Header({'switch': 3, 'port': 1, 'vlan': 1}) |then| forward(3, 2))+\
             (Header({'switch': 3, 'port': 1, 'vlan': 2}) |then| forward(3, 2))+\
             (Header({'switch': 4, 'port': 1, 'vlan': 2}) |then| forward(4, 2))
-        self.assertIsNotNone(sat.one_per_edge(topo, r))
-        self.assertIsNotNone(sat.one_per_edge(topo, r, field='srcmac'))
+        self.assertIsNotNone(self.module.one_per_edge(topo, r))
+        self.assertIsNotNone(self.module.one_per_edge(topo, r, field='srcmac'))
+
+class SatCoreTest(unittest.TestCase):
+    def test_term_cache(self):
+        p, pp = Consts('p pp', sat_core.Packet)
+        r = (Header({'switch': 2, 'port': 1, 'vlan': 2}) |then| forward(2, 2))+\
+            (Header({'switch': 3, 'port': 1, 'vlan': 2}) |then| forward(3, 2))
+        # Nothing is cached outside a scope
+        self.assertIsNot(sat_core.forwards(r, p, pp),
+                         sat_core.forwards(r, p, pp))
+        with sat_core.term_scope():
+            term = sat_core.forwards(r, p, pp)
+            with sat_core.term_scope():
+                self.assertIs(term, sat_core.forwards(r, p, pp))
+            self.assertIs(term, sat_core.forwards(r, p, pp))
+            self.assertIsNot(term, sat_core.forwards(r, pp, p))
+            # Each entry keeps the terms its key names by id alive
+            for key, (_, keep) in sat_core._terms.items():
+                if key[0] == 'forwards':
+                    self.assertEqual(key[2], sat_core._term_id(keep[0]))
+                    self.assertEqual(key[4], sat_core._term_id(keep[2]))
+        self.assertEqual({}, sat_core._terms)
+        rebuilt = sat_core.forwards(r, p, pp)
+        self.assertIsNot(term, rebuilt)
+        self.assertTrue(term.eq(rebuilt))
+
+    def test_checks_clear_terms(self):
+        r = (Header({'switch': 2, 'port': 1, 'vlan': 2}) |then| forward(2, 2))+\
+            (Header({'switch': 3, 'port': 1, 'vlan': 2}) |then| forward(3, 2))
+        self.assertTrue(sat.compiled_correctly(topo, r, r))
+        self.assertEqual({}, sat_core._terms)
+        session = sat.Session(topo)
+        self.assertEqual([], session.unseparated([r]))
+        self.assertEqual({}, sat_core._terms)
 
 if __name__ == '__main__':
     unittest.main()
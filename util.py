@@ -30,6 +30,7 @@
 ################################################################################
 """Tools for slicing."""
 
+import multiprocessing
 import netcore as nc
 
 def id_map(items):
@@ -97,8 +98,12 @@ def fields_of_predicate(pred):
         return set([])
     elif isinstance(pred, nc.Header):
         return set(pred.fields.keys())
-    elif (isinstance(pred, nc.Union) or
-          isinstance(pred, nc.Intersection) or
+    elif isinstance(pred, nc.Union):
+        fields = set()
+        for child in pred.children:
+            fields.update(fields_of_predicate(child))
+        return fields
+    elif (isinstance(pred, nc.Intersection) or
           isinstance(pred, nc.Difference)):
         return fields_of_predicate(pred.left).union(
                fields_of_predicate(pred.right))
@@ -118,12 +123,52 @@ def fields_of_policy(pol):
             fields.update(fields_of_action(a))
         return fields
     elif isinstance(pol, nc.PolicyUnion):
-        return fields_of_policy(pol.left).union(
-               fields_of_policy(pol.right))
+        fields = set()
+        for child in pol.children:
+            fields.update(fields_of_policy(child))
+        return fields
     elif isinstance(pol, nc.PolicyRestriction):
         return fields_of_policy(pol.policy).union(
                fields_of_predicate(pol.predicate))
 
+def values_of_predicate(pred, field):
+    """Return the set of values pred matches field against."""
+    if isinstance(pred, nc.Header):
+        if field in pred.fields:
+            return set([pred.fields[field]])
+        else:
+            return set()
+    elif isinstance(pred, nc.Union):
+        values = set()
+        for child in pred.children:
+            values.update(values_of_predicate(child, field))
+        return values
+    elif (isinstance(pred, nc.Intersection) or
+          isinstance(pred, nc.Difference)):
+        return values_of_predicate(pred.left, field).union(
+               values_of_predicate(pred.right, field))
+    else:
+        return set()
+
+def values_of_policy(pol, field):
+    """Return the set of values pol matches field against or sets it to."""
+    if isinstance(pol, nc.BottomPolicy):
+        return set()
+    elif isinstance(pol, nc.PrimitivePolicy):
+        values = values_of_predicate(pol.predicate, field)
+        for a in pol.actions:
+            if field in a.modify:
+                values.add(a.modify[field])
+        return values
+    elif isinstance(pol, nc.PolicyUnion):
+        values = set()
+        for child in pol.children:
+            values.update(values_of_policy(child, field))
+        return values
+    elif isinstance(pol, nc.PolicyRestriction):
+        return values_of_policy(pol.policy, field).union(
+               values_of_predicate(pol.predicate, field))
+
 def observations(policy):
     """Return set of observations policy may emit."""
     if isinstance(policy, nc.BottomPolicy):
@@ -134,8 +179,127 @@ def observations(policy):
             obs.update(a.obs)
         return obs
     elif isinstance(policy, nc.PolicyUnion):
-        left = observations(policy.left)
-        left.update(observations(policy.right))
-        return left
+        obs = set()
+        for child in policy.children:
+            obs.update(observations(child))
+        return obs
     elif isinstance(policy, nc.PolicyRestriction):
         return observations(policy.policy)
+
+def locations_of_predicate(pred):
+    """Over-approximate the locations at which pred can match.
+
+    RETURNS:
+        None if pred may match anywhere, otherwise a set of (switch, port)
+        where port is None if pred may match on any port of switch.  pred never
+        matches a packet at a location not covered by the result.
+    """
+    if isinstance(pred, nc.Top):
+        return None
+    elif isinstance(pred, nc.Bottom):
+        return set()
+    elif isinstance(pred, nc.Header):
+        if 'switch' in pred.fields:
+            return set([(pred.fields['switch'], pred.fields.get('port'))])
+        else:
+            return None
+    elif isinstance(pred, nc.Union):
+        locations = set()
+        for child in pred.children:
+            child_locations = locations_of_predicate(child)
+            if child_locations is None:
+                return None
+            locations.update(child_locations)
+        return locations
+    elif isinstance(pred, nc.Intersection):
+        return intersect_locations(locations_of_predicate(pred.left),
+                                   locations_of_predicate(pred.right))
+    elif isinstance(pred, nc.Difference):
+        return locations_of_predicate(pred.left)
+    else:
+        raise Exception('unknown predicate %s' % pred)
+
+def intersect_locations(left, right):
+    """Intersect two results of locations_of_predicate."""
+    if left is None:
+        return right
+    elif right is None:
+        return left
+    locations = set()
+    for (s1, p1) in left:
+        for (s2, p2) in right:
+            if s1 == s2 and (p1 is None or p2 is None or p1 == p2):
+                locations.add((s1, p2 if p1 is None else p1))
+    return locations
+
+# (function, items) for the pool this worker belongs to, set by _fork_init.
+# Only workers set it, so pools in the parent cannot disturb each other.
+_fork_work = None
+
+def _fork_init(function, items):
+    """Set the work of a newly forked worker.
+
+    Pool passes its initializer arguments to each worker as it is forked, so
+    function and items are inherited rather than pickled.
+    """
+    global _fork_work
+    _fork_work = (function, items)
+
+def _fork_call(index):
+    """Run the inherited fork_map function on its index-th item."""
+    function, items = _fork_work
+    return function(items[index])
+
+def _fork_indexed(index):
+    """Run the inherited fork_imap function on its index-th item."""
+    function, items = _fork_work
+    return (index, function(items[index]))
+
+def fork_map(function, items, processes=1, chunksize=1):
+    """Return [function(item) for item in items], using a pool of processes.
+
+    The workers are forked with function and items as their initializer
+    arguments, so they inherit both rather than receiving pickled copies; only
+    item indices go out and results come back.  function may therefore be a closure or lambda, but
+    its results must be picklable.  Results are in the order of items.
+
+    ARGS:
+        function:  function of one argument to apply
+        items:  iterable of arguments
+        processes:  number of worker processes, None for one per CPU.  With 1,
+            everything runs in this process.
+        chunksize:  number of items to send to a worker at a time
+
+    Needs a platform that forks (not Windows).
+    """
+    items = list(items)
+    if (processes is not None and processes <= 1) or len(items) <= 1:
+        return [function(item) for item in items]
+    pool = multiprocessing.Pool(processes, _fork_init, (function, items))
+    try:
+        return pool.map(_fork_call, range(len(items)), chunksize)
+    finally:
+        pool.terminate()
+        pool.join()
+
+def fork_imap(function, items, processes=1, chunksize=1):
+    """Yield (index, function(items[index])) as each result is ready.
+
+    Like fork_map, but results come back in the order they finish.  Closing
+    the generator, or abandoning it, stops the workers.  Several of these
+    generators may be open at once.  With processes=1,
+    everything runs in this process, in order.
+    """
+    items = list(items)
+    if (processes is not None and processes <= 1) or len(items) <= 1:
+        for index, item in enumerate(items):
+            yield (index, function(item))
+        return
+    pool = multiprocessing.Pool(processes, _fork_init, (function, items))
+    try:
+        for result in pool.imap_unordered(_fork_indexed, range(len(items)),
+                                          chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -30,23 +30,45 @@
 ################################################################################
 """Tools to assign vlan tags to network slices."""
 
+import heapq
 from util import edges_of_topo, map_edges
 
+MAX_VLAN = 255
+MIN_VLAN = 1
+
 class VlanException(Exception):
     """Exception to represent failure to map to VLAN tags."""
     pass
 
 def sequential(slices):
     """Assign vlans to slices assuming they all overlap, sequentially."""
-    if len(slices) > 255:
-        raise VlanException('More than 255 slices, cannot naively assign vlans')
-    vlan = 1
+    if len(slices) > MAX_VLAN:
+        raise VlanException('More than %d slices, cannot naively assign vlans'
+                            % MAX_VLAN)
+    vlan = MIN_VLAN
     output = {}
     for slic in slices:
         output[slic] = vlan
         vlan += 1
     return output
 
+def lowest_free(used, limit=MAX_VLAN):
+    """Return the lowest tag from MIN_VLAN up that is not in used.
+
+    limit: largest usable tag, or None for no limit
+    """
+    tag = MIN_VLAN
+    while tag in used:
+        tag += 1
+    if limit is not None and tag > limit:
+        raise VlanException('All %d vlans are in use' % limit)
+    return tag
+
+def slice_edges(slic):
+    """Return the set of physical edges a slice uses, in both directions."""
+    return set(map_edges(edges_of_topo(slic.l_topo),
+                         slic.node_map, slic.port_map))
+
 # TODO(astory): deal with unidirectional ports.  This should really be done by
 # just looking at incoming ports, but it gets a bit more complicated because now
 # you have to assign vlans in a unified way to everything incident to that port
@@ -54,36 +76,201 @@ def edge_in(edge, slic, memo=None):
     """Determine whether a slice uses a given physical edge"""
     if memo is not None:
         if slic not in memo:
-            memo[slic] = set(map_edges(edges_of_topo(slic.l_topo),
-                                       slic.node_map, slic.port_map))
+            memo[slic] = slice_edges(slic)
         return edge in memo[slic]
     else:
-        return edge in set(map_edges(edges_of_topo(slic.l_topo),
-                                       slic.node_map, slic.port_map))
+        return edge in slice_edges(slic)
 
 def share_edge(s1, s2):
     """Determine whether two slices share a physical edge."""
     # This is only correct if we have a guarantee that the topologies are sane,
     # and only give us real internal edges.
-    s1_ls = set(map_edges(edges_of_topo(s1.l_topo), s1.node_map, s1.port_map))
-    s2_ls = set(map_edges(edges_of_topo(s2.l_topo), s2.node_map, s2.port_map))
-    return not s1_ls.isdisjoint(s2_ls)
+    return not slice_edges(s1).isdisjoint(slice_edges(s2))
+
+def slice_conflicts(slices):
+    """Return [(s1, s2)] for all pairs of slices that share a physical edge.
+
+    Pairs are ordered as in slices, s1 before s2.  Each slice's edges are
+    computed once and collected into an index from edge to slices, so only
+    pairs that do share an edge are ever looked at.  A pair is looked at once
+    per edge it shares, so the cost is the sum of k * k over edges, with k the
+    number of slices on the edge, plus sorting the p distinct pairs, p log p.
+    """
+    edge_slices = {}
+    for i, slic in enumerate(slices):
+        for edge in slice_edges(slic):
+            edge_slices.setdefault(edge, []).append(i)
+    pairs = set()
+    for indices in edge_slices.itervalues():
+        for a in range(len(indices)):
+            for b in range(a + 1, len(indices)):
+                pairs.add((indices[a], indices[b]))
+    return [(slices[i], slices[j]) for (i, j) in sorted(pairs)]
+
+def slice_optimal(slices, processes=1):
+    """Return the minimum per-slice vlan assignment.
 
-def slice_optimal(slices):
-    """Return the minimum per-slice vlan assignment."""
-    # Import here because optimize has hard-to-install dependencies
+    Each connected component of the conflict graph is solved separately, in
+    processes worker processes.
+    """
+    # Import here because optimize imports this module
     import optimize
-    conflicts = []
-    for i in range(0, len(slices)):
-        for j in range(i+1, len(slices)):
-            if share_edge(slices[i], slices[j]):
-                conflicts.append((slices[i], slices[j]))
-    solution = optimize.assign_vlans(slices, conflicts)
+    conflicts = slice_conflicts(slices)
+    solution = optimize.assign_vlans_by_component(slices, conflicts,
+                                                  processes=processes)
     if solution is not None:
         return solution
     else:
         raise VlanException('Could not assign vlan tags - too many slices')
 
+def slice_dsatur(slices, max_backtracks=10000, verbose=False):
+    """Return a small per-slice vlan assignment, without a solver.
+
+    Colors the slice conflict graph with color_graph, see there for details.
+    Optimal if the coloring reaches the lower bound.
+
+    max_backtracks: work budget for improving on the DSatur coloring
+    verbose: print the number of vlans used and the lower bound
+
+    RETURNS: ({slice: vlan}, lower_bound), where lower_bound is a proven lower
+        bound on the number of vlans any assignment needs
+    """
+    colors, lower_bound = color_graph(slices, slice_conflicts(slices),
+                                      max_backtracks=max_backtracks)
+    used = max(colors.values()) if colors else 0
+    if verbose:
+        print '%d vlans used, at least %d needed.' % (used, lower_bound)
+    if used > MAX_VLAN - MIN_VLAN + 1:
+        raise VlanException('Could not assign vlan tags - %d needed' % used)
+    return (dict((slic, color + MIN_VLAN - 1)
+                 for slic, color in colors.items()), lower_bound)
+
+def color_graph(nodes, conflicts, max_backtracks=0):
+    """Color a graph with few colors.
+
+    First colors the graph with DSatur, then, while the budget lasts, searches
+    for colorings with fewer colors by backtracking.  The search visits the
+    nodes of a large clique first, then the rest in DSatur order, and only
+    ever uses one color more than the largest so far, so that colorings that
+    only differ by renaming colors are only tried once.
+
+    ARGS:
+        nodes:  list of hashable nodes
+        conflicts:  pairs of nodes that must get different colors
+        max_backtracks:  total number of backtracking steps allowed, 0 to just
+            use DSatur
+
+    RETURNS:
+        ({node: color}, lower_bound) with colors from 1 up.  The number of
+        colors used is optimal if it equals lower_bound, which is the size of
+        the clique, or more if the search proved that no smaller coloring
+        exists.
+    """
+    adjacency = dict((node, set()) for node in nodes)
+    for (n1, n2) in conflicts:
+        if n1 != n2:
+            adjacency[n1].add(n2)
+            adjacency[n2].add(n1)
+
+    colors, dsatur_order = _dsatur(nodes, adjacency)
+    used = max(colors.values()) if colors else 0
+    clique = greedy_clique(nodes, adjacency)
+    lower_bound = len(clique)
+
+    in_clique = set(clique)
+    order = clique + [node for node in dsatur_order if node not in in_clique]
+    budget = max_backtracks
+    while used > lower_bound and budget > 0:
+        k_colors, budget = _k_coloring(order, adjacency, used - 1, budget)
+        if k_colors is not None:
+            colors = k_colors
+            used = max(colors.values())
+        elif budget > 0:
+            # The search finished without a coloring, so none exists
+            lower_bound = used
+    return colors, lower_bound
+
+def _dsatur(nodes, adjacency):
+    """Color greedily, always picking the node with the most distinct colors
+    among its neighbors, ties broken by degree.
+
+    RETURNS: ({node: color}, [nodes in the order they were colored])
+    """
+    index = dict((node, i) for i, node in enumerate(nodes))
+    colors = {}
+    order = []
+    neighbor_colors = dict((node, set()) for node in nodes)
+    # Entries are (-saturation, -degree, index, node).  Saturation only grows,
+    # so entries with a saturation below the current one are stale.
+    heap = [(0, -len(adjacency[node]), index[node], node) for node in nodes]
+    heapq.heapify(heap)
+    while heap:
+        saturation, _, _, node = heapq.heappop(heap)
+        if node in colors or -saturation != len(neighbor_colors[node]):
+            continue
+        color = 1
+        while color in neighbor_colors[node]:
+            color += 1
+        colors[node] = color
+        order.append(node)
+        for neighbor in adjacency[node]:
+            if (neighbor not in colors and
+                    color not in neighbor_colors[neighbor]):
+                neighbor_colors[neighbor].add(color)
+                heapq.heappush(heap, (-len(neighbor_colors[neighbor]),
+                                      -len(adjacency[neighbor]),
+                                      index[neighbor], neighbor))
+    return colors, order
+
+def greedy_clique(nodes, adjacency, seeds=32):
+    """Return a large clique, grown greedily from the highest degree nodes."""
+    by_degree = sorted(nodes, key=lambda node: -len(adjacency[node]))
+    best = []
+    for seed in by_degree[:seeds]:
+        clique = [seed]
+        candidates = set(adjacency[seed])
+        for node in by_degree:
+            if node in candidates:
+                clique.append(node)
+                candidates.intersection_update(adjacency[node])
+        if len(clique) > len(best):
+            best = clique
+    return best
+
+def _k_coloring(order, adjacency, k, budget):
+    """Search for a coloring with colors 1..k, visiting nodes in order.
+
+    RETURNS: ({node: color} or None, remaining budget).  If no coloring is
+        found and budget remains, none exists.
+    """
+    n = len(order)
+    position = dict((node, i) for i, node in enumerate(order))
+    earlier = [[position[m] for m in adjacency[node] if position[m] < i]
+               for i, node in enumerate(order)]
+    colors = [0] * n
+    # highest[i] is the largest color among the first i nodes
+    highest = [0] * (n + 1)
+    i = 0
+    while 0 <= i < n:
+        used = set(colors[j] for j in earlier[i])
+        top = min(k, highest[i] + 1)
+        color = colors[i] + 1
+        while color <= top and color in used:
+            color += 1
+        if color <= top:
+            colors[i] = color
+            highest[i + 1] = max(highest[i], color)
+            i += 1
+        else:
+            colors[i] = 0
+            i -= 1
+            budget -= 1
+            if budget <= 0:
+                return None, 0
+    if i < 0:
+        return None, budget
+    return dict(zip(order, colors)), budget
+
 def edge_optimal(topo, slices, verbose=False):
     """Return the minimum per-slice-per-edge vlan assignment.
 
@@ -93,23 +280,53 @@ def edge_optimal(topo, slices, verbose=False):
         with from slices, it's much more convenient to generate.  If you want
         {slice: {edge: tag}}, there's a converter in edge_compile.py
     """
+    return dict(iter_edge_optimal(topo, slices, verbose=verbose))
+
+def iter_edge_optimal(topo, slices, verbose=False):
+    """Generate the assignment of edge_optimal one edge at a time.
+
+    A first pass over slices counts the slices that use each edge.  A second
+    pass collects the slices of each edge, and yields the edge as soon as its
+    last slice has been seen, so only the edges still waiting for slices hold
+    a list.  Each slice's edges are mapped to the physical topology once per
+    pass, so the cost is proportional to the total number of slice edges
+    rather than edges times slices.  On each edge, slices are tagged 1, 2, ...
+    in the order of slices.
+
+    verbose: print a '.' every 1000 edges produced
+
+    YIELDS: (edge, {slice: tag}) for every undirected edge of topo
+    """
     if verbose:
         import sys
         count = 0
     edges = edges_of_topo(topo, undirected=True)
-    edge_slices = {}
-    slice_edges = {}
-    for edge in edges:
-        edge_slices[edge] = set()
+    remaining = dict((edge, 0) for edge in edges)
+    for slic in slices:
+        for edge in slice_edges(slic):
+            # Only one direction of each edge is a key
+            if edge in remaining:
+                remaining[edge] += 1
+
+    def finished():
+        for edge in edges:
+            if remaining[edge] == 0:
+                yield (edge, {})
+        edge_slices = {}
         for slic in slices:
-            if edge_in(edge, slic, memo=slice_edges):
-                edge_slices[edge].add(slic)
+            for edge in slice_edges(slic):
+                if edge not in remaining:
+                    continue
+                slics = edge_slices.setdefault(edge, [])
+                slics.append(slic)
+                if len(slics) == remaining[edge]:
+                    del edge_slices[edge]
+                    yield (edge, dict(zip(slics, range(1, len(slics) + 1))))
+
+    for result in finished():
+        yield result
         if verbose:
             count +=1
             if count % 1000 == 0:
                 print '.',
                 sys.stdout.flush()
-    edge_vlans = {}
-    for (edge, slics) in edge_slices.items():
-        edge_vlans[edge] = dict(zip(slics, range(1, len(slics) + 1)))
-    return edge_vlans
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+################################################################################
+# The Frenetic Project                                                         #
+# frenetic@frenetic-lang.org                                                   #
+################################################################################
+# Licensed to the Frenetic Project by one or more contributors. See the        #
+# NOTICE file distributed with this work for additional information            #
+# regarding copyright and ownership. The Frenetic Project licenses this        #
+# file to you under the following license.                                     #
+#                                                                              #
+# Redistribution and use in source and binary forms, with or without           #
+# modification, are permitted provided the following conditions are met:       #
+# - Redistributions of source code must retain the above copyright             #
+#   notice, this list of conditions and the following disclaimer.              #
+# - Redistributions in binary form must reproduce the above copyright          #
+#   notice, this list of conditions and the following disclaimer in            #
+#   the documentation or other materials provided with the distribution.       #
+# - The names of the copyright holds and contributors may not be used to       #
+#   endorse or promote products derived from this work without specific        #
+#   prior written permission.                                                  #
+#                                                                              #
+# Unless required by applicable law or agreed to in writing, software          #
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT    #
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the     #
+# LICENSE file distributed with this work for specific language governing      #
+# permissions and limitations under the License.                               #
+################################################################################
+# /slices/vlan_benchmark.py                                                    #
+# Tools to benchmark vlan assignment.                                          #
+################################################################################
+"""Tools to benchmark vlan assignment encodings against each other."""
+
+import argparse
+import optimize
+import random
+import time
+import vlan as vl
+
+# Conflict graph generators, each returns (slices, conflicts)
+def random_conflicts(n, density, seed):
+    rng = random.Random(seed)
+    slices = range(n)
+    conflicts = [(i, j) for i in slices for j in slices
+                 if i < j and rng.random() < density]
+    return slices, conflicts
+
+def break_vlans_conflicts(n):
+    # Import here because building slices needs mininet
+    from examples import break_vlans
+    topo, slices = break_vlans.get_slices(n=n)
+    return slices, vl.slice_conflicts(slices)
+
+def run(name, assigner, slices, conflicts):
+    init = time.time()
+    vlans = assigner(slices, conflicts)
+    elapsed = time.time() - init
+    if vlans is None:
+        print '%-10s no solution   %f' % (name, elapsed)
+    else:
+        for (s1, s2) in conflicts:
+            assert vlans[s1] != vlans[s2]
+        print '%-10s %3d vlans     %f' % (name, len(set(vlans.values())),
+                                          elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vlan assignment.')
+    parser.add_argument('--slices', action='store', type=int, default=30,
+                        help='Number of slices.')
+    parser.add_argument('--density', action='store', type=float, default=0.3,
+                        help='Probability that two random slices conflict.')
+    parser.add_argument('--seed', action='store', type=int, default=0,
+                        help='Random seed for the conflict graph.')
+    parser.add_argument('--break_vlans', action='store_true', default=False,
+                        help='Use break_vlans slices instead of a random '
+                        'conflict graph.')
+    parser.add_argument('--basic', action='store_true', default=False,
+                        help='Also run the original encoding, which can take '
+                        'very long.')
+    parser.add_argument('--budget', action='store', type=float, default=1.0,
+                        help='Time budget for the anytime assigner.')
+    args = parser.parse_args()
+    if args.break_vlans:
+        slices, conflicts = break_vlans_conflicts(args.slices)
+    else:
+        slices, conflicts = random_conflicts(args.slices, args.density,
+                                             args.seed)
+    print '%d slices, %d conflicts' % (len(slices), len(conflicts))
+    colors, lower_bound = vl.color_graph(slices, conflicts)
+    print 'Lower bound: %d' % lower_bound
+    run('dsatur', lambda s, c: vl.color_graph(s, c, 10000)[0],
+        slices, conflicts)
+    run('anytime', lambda s, c: optimize.assign_vlans_anytime(s, c,
+                                                              args.budget)[0],
+        slices, conflicts)
+    if optimize.nj is None:
+        print 'Numberjack is not installed, skipping the solver encodings.'
+        return
+    run('model', optimize.assign_vlans, slices, conflicts)
+    if args.basic:
+        run('basic', optimize.assign_vlans_basic, slices, conflicts)
+
+if __name__ == '__main__':
+    main()
@@ -131,6 +131,21 @@ class TestVlanAssignment(unittest.TestCase):
         self.assertFalse(vlan.share_edge(slices[0], slices[2]))
         self.assertFalse(vlan.share_edge(slices[1], slices[2]))
 
+    def test_edge_optimal(self):
+        assignment = vlan.edge_optimal(topo, slices)
+        edges = util.edges_of_topo(topo, undirected=True)
+        self.assertItemsEqual(edges, assignment.keys())
+        for edge, tags in assignment.items():
+            expected = [s for s in slices
+                        if vlan.edge_in(edge, s)]
+            # Tagged in slice order
+            self.assertEqual(range(1, len(expected) + 1),
+                             [tags[s] for s in expected])
+            self.assertItemsEqual(expected, tags.keys())
+        streamed = list(vlan.iter_edge_optimal(topo, slices))
+        self.assertEqual(len(edges), len(streamed))
+        self.assertEqual(assignment, dict(streamed))
+
     def test_optimal(self):
         colors = vlan.slice_optimal(slices)
 
@@ -139,5 +154,68 @@ class TestVlanAssignment(unittest.TestCase):
         # 2 is disconnected, so this is 2-colorable
         self.assertEqual(2, len(set(colors.values())))
 
+    def test_slice_conflicts(self):
+        # A repeated slice conflicts with its copy
+        doubled = [slices[0], slices[1], slices[2], slices[0]]
+        expected = [(doubled[i], doubled[j])
+                    for i in range(len(doubled))
+                    for j in range(i + 1, len(doubled))
+                    if vlan.share_edge(doubled[i], doubled[j])]
+        self.assertEqual(expected, vlan.slice_conflicts(doubled))
+        self.assertEqual([(slices[0], slices[1])],
+                         vlan.slice_conflicts(slices))
+
+    def test_dsatur(self):
+        colors, lower_bound = vlan.slice_dsatur(slices)
+        self.assertNotEqual(colors[slices[0]], colors[slices[1]])
+        self.assertEqual(2, len(set(colors.values())))
+        self.assertEqual(2, lower_bound)
+        self.assertEqual(set([vlan.MIN_VLAN, vlan.MIN_VLAN + 1]),
+                         set(colors.values()))
+
+class TestColoring(unittest.TestCase):
+    def assertColoring(self, nodes, conflicts, colors):
+        self.assertItemsEqual(nodes, colors.keys())
+        for (n1, n2) in conflicts:
+            self.assertNotEqual(colors[n1], colors[n2])
+
+    def test_complete(self):
+        nodes = range(6)
+        conflicts = [(i, j) for i in nodes for j in nodes if i < j]
+        colors, lower_bound = vlan.color_graph(nodes, conflicts)
+        self.assertColoring(nodes, conflicts, colors)
+        self.assertEqual(6, max(colors.values()))
+        self.assertEqual(6, lower_bound)
+
+    def test_odd_cycle(self):
+        nodes = range(5)
+        conflicts = [(i, (i + 1) % 5) for i in nodes]
+        colors, lower_bound = vlan.color_graph(nodes, conflicts, 100)
+        self.assertColoring(nodes, conflicts, colors)
+        self.assertEqual(3, max(colors.values()))
+        # The clique is only an edge, so the search has to prove this
+        self.assertEqual(3, lower_bound)
+
+    def test_grotzsch(self):
+        # Triangle-free, but needs 4 colors
+        cycle = [(i, (i + 1) % 5) for i in range(5)]
+        conflicts = list(cycle)
+        for (i, j) in cycle:
+            conflicts.extend([(i + 5, j), (j + 5, i), (10, i + 5)])
+        nodes = range(11)
+        colors, lower_bound = vlan.color_graph(nodes, conflicts)
+        self.assertColoring(nodes, conflicts, colors)
+        self.assertEqual(2, lower_bound)
+        colors, lower_bound = vlan.color_graph(nodes, conflicts, 10000)
+        self.assertColoring(nodes, conflicts, colors)
+        self.assertEqual(4, max(colors.values()))
+        self.assertEqual(4, lower_bound)
+
+    def test_disconnected(self):
+        colors, lower_bound = vlan.color_graph(['a', 'b', 'c'], [])
+        self.assertEqual({'a': 1, 'b': 1, 'c': 1}, colors)
+        self.assertEqual(1, lower_bound)
+        self.assertEqual(({}, 0), vlan.color_graph([], []))
+
 if __name__ == '__main__':
     unittest.main()